@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app.utils.env import getenv
+
+DB_MODE = getenv("DB_MODE", "default").lower()
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", 0))
+DB_CONNECT_TIMEOUT = int(getenv("DB_CONNECT_TIMEOUT", 5))
+DB_CONNECT_RETRIES = int(getenv("DB_CONNECT_RETRIES", 3))
+DB_CONNECT_BACKOFF = float(getenv("DB_CONNECT_BACKOFF", 0.1))
+
+
+class ConnectMetrics:
+    """
+    Thread-safe statistics of the connections opened to the database.
+
+    Every connect is timed from the first attempt until the connection is established,
+    so the time includes retries and shows the overhead added by an external pooler.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._connects = 0
+            self._failures = 0
+            self._retries = 0
+            self._total = 0.0
+            self._max = 0.0
+            self._last = 0.0
+
+    def record(self, duration: float, attempts: int, succeeded: bool) -> None:
+        """
+        Records one connect.
+
+        Args:
+            duration (float): The time spent connecting, in seconds.
+            attempts (int): The number of attempts made.
+            succeeded (bool): Whether a connection was established.
+        """
+        with self._lock:
+            self._retries += attempts - 1
+
+            if not succeeded:
+                self._failures += 1
+                return
+
+            self._connects += 1
+            self._total += duration
+            self._max = max(self._max, duration)
+            self._last = duration
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the connect statistics.
+
+        Returns:
+            Dict[str, Any]: The number of connects, failed connects and retries, and the total,
+                average, maximum and last connect time in milliseconds.
+        """
+        with self._lock:
+            return {
+                "connects": self._connects,
+                "failures": self._failures,
+                "retries": self._retries,
+                "total_connect_ms": round(self._total * 1000, 3),
+                "avg_connect_ms": round(
+                    self._total * 1000 / self._connects if self._connects else 0.0, 3
+                ),
+                "max_connect_ms": round(self._max * 1000, 3),
+                "last_connect_ms": round(self._last * 1000, 3),
+            }
+
+
+def get_engine_options(url: str, mode: str = DB_MODE) -> Dict[str, Any]:
+    """
+    Returns the create_engine options for a database mode.
+
+    The "serverless" mode is meant for short-lived instances connecting through an external
+    pooler such as PgBouncer in transaction mode: connections are not pooled in the process
+    (or only DB_POOL_SIZE of them, without overflow) and, with psycopg, prepared statements
+    are disabled because they are session-level state the pooler cannot carry between
+    transactions.
+
+    Args:
+        url (str): The database URL.
+        mode (str): "default" or "serverless".
+
+    Returns:
+        Dict[str, Any]: The keyword arguments for create_engine.
+    """
+    if mode != "serverless":
+        return {}
+
+    if DB_POOL_SIZE > 0:
+        options: Dict[str, Any] = {"pool_size": DB_POOL_SIZE, "max_overflow": 0}
+    else:
+        options = {"poolclass": NullPool}
+
+    url = make_url(url)
+
+    if url.get_backend_name() == "postgresql":
+        connect_args: Dict[str, Any] = {"connect_timeout": DB_CONNECT_TIMEOUT}
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        options["connect_args"] = connect_args
+
+    return options
+
+
+def install_connect_retry(
+    engine: Engine,
+    metrics: "ConnectMetrics",
+    retries: int = DB_CONNECT_RETRIES,
+    backoff: float = DB_CONNECT_BACKOFF,
+) -> None:
+    """
+    Makes an engine retry failed connects and record their timing.
+
+    Failed attempts raising the driver's OperationalError are retried up to `retries`
+    times, sleeping a random time between 0 and backoff * 2^attempt seconds (full jitter),
+    so instances started together do not hammer the database in lockstep.
+
+    Args:
+        engine (Engine): The engine to be instrumented.
+        metrics (ConnectMetrics): The metrics connects are recorded in.
+        retries (int): The maximum number of retries of a connect.
+        backoff (float): The base of the exponential backoff in seconds.
+    """
+
+    @event.listens_for(engine, "do_connect")
+    def connect(dialect, connection_record, cargs, cparams):
+        started = time.perf_counter()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                connection = dialect.connect(*cargs, **cparams)
+            except dialect.loaded_dbapi.OperationalError:
+                if attempt > retries:
+                    metrics.record(time.perf_counter() - started, attempt, False)
+                    raise
+                time.sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
+                continue
+
+            metrics.record(time.perf_counter() - started, attempt, True)
+            return connection
+
+
+connect_metrics = ConnectMetrics()
@@ -1,10 +1,90 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import weakref
+from functools import lru_cache
+from typing import Any, Dict
 
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session as OrmSession, sessionmaker
+
+from app.db.connection import (
+    DB_CONNECT_RETRIES,
+    DB_MODE,
+    connect_metrics,
+    get_engine_options,
+    install_connect_retry,
+)
+from app.db.slow_queries import (
+    SLOW_QUERY_THRESHOLD_MS,
+    install_slow_query_log,
+    slow_query_log,
+)
 from app.utils.env import getenv
 
 DB_URL = getenv("DB_URL")
 
-engine = create_engine(DB_URL)
-conn = engine.connect()
-Session = sessionmaker(bind=engine)
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """
+    Returns the application's engine, creating it on the first call.
+
+    Creating the engine imports the database driver, so it is deferred until the first
+    session is opened. The engine connects lazily as well, when the first query runs.
+    Its pooling and connect options depend on DB_MODE, and in the "serverless" mode
+    failed connects are retried. Statements slower than SLOW_QUERY_THRESHOLD_MS are
+    recorded in slow_query_log.
+
+    Returns:
+        Engine: The SQLAlchemy engine.
+    """
+    engine = create_engine(DB_URL, **get_engine_options(DB_URL))
+    install_connect_retry(
+        engine,
+        connect_metrics,
+        retries=DB_CONNECT_RETRIES if DB_MODE == "serverless" else 0,
+    )
+
+    if SLOW_QUERY_THRESHOLD_MS > 0:
+        install_slow_query_log(engine, slow_query_log)
+
+    return engine
+
+
+class LazySession(OrmSession):
+    """
+    Session bound to the application's engine, which is created when the first session is.
+
+    Every session is tracked in live_sessions until it is garbage collected, so the memory
+    diagnostics can report the sessions, and the identity maps, that are still alive.
+    """
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_engine(), **kwargs)
+        live_sessions.add(self)
+
+
+live_sessions: "weakref.WeakSet[LazySession]" = weakref.WeakSet()
+
+
+Session = sessionmaker(class_=LazySession)
+
+
+def get_database_stats() -> Dict[str, Any]:
+    """
+    Returns the database mode, the pool status and the connect statistics.
+
+    Returns:
+        Dict[str, Any]: The statistics returned by ConnectMetrics.stats, with the mode and pool.
+    """
+    return {
+        "mode": DB_MODE,
+        "pool": get_engine().pool.status(),
+        **connect_metrics.stats(),
+    }
+
+
+def __getattr__(name: str):
+    # Keeps `from app.db.database import engine` working without creating it at import time
+    if name == "engine":
+        return get_engine()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
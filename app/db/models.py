@@ -58,3 +58,23 @@ class Note(Base):
     done = Column(Boolean, default=0)
     created_at = Column(DateTime, default=datetime.now(), nullable=False)
     updated_at = Column(DateTime)
+
+
+class ImportCheckpoint(Base):
+    """
+    Progress of a bulk import, committed together with every imported chunk so an interrupted import can be resumed.
+
+    Attributes:
+        id (String): A column in the database that uses string values. This is the primary key, the id of the import chosen by the client or generated.
+        processed (Integer): A column in the database that uses integer values. This is the number of records of the upload already processed.
+        imported (Integer): A column in the database that uses integer values. This is the number of notes created by the import.
+        rejected (Integer): A column in the database that uses integer values. This is the number of invalid records skipped by the import.
+        updated_at (DateTime): A column in the database that uses DateTime values. This is used to store the date and time of the last committed chunk.
+    """
+
+    __tablename__ = "import_checkpoints"
+    id = Column(String, primary_key=True)
+    processed = Column(Integer, default=0, nullable=False)
+    imported = Column(Integer, default=0, nullable=False)
+    rejected = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime)
@@ -0,0 +1,214 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Engine, event
+
+from app.utils.env import getenv
+from app.utils.metrics import current_operation
+
+SLOW_QUERY_THRESHOLD_MS = float(getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_LOG_SIZE = int(getenv("SLOW_QUERY_LOG_SIZE", 100))
+SLOW_QUERY_EXPLAIN_RATE = float(getenv("SLOW_QUERY_EXPLAIN_RATE", 1.0))
+SLOW_QUERY_EXPLAIN_ANALYZE = (
+    getenv("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() == "true"
+)
+
+# Only reads are explained: EXPLAIN ANALYZE executes the statement once more. A WITH
+# statement can hide an INSERT, UPDATE or DELETE in a CTE on PostgreSQL, so it is only
+# explained without ANALYZE
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_ANALYZABLE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class SlowQueryLog:
+    """
+    Thread-safe ring buffer of the latest slow SQL statements.
+
+    Attributes:
+        threshold_ms (float): The duration from which a statement is slow, in milliseconds.
+        explain_rate (float): The fraction of slow statements whose plan is captured.
+        explain_analyze (bool): Whether plans are captured with EXPLAIN ANALYZE, which
+            executes the statement again, instead of only being estimated.
+    """
+
+    def __init__(
+        self,
+        size: int = SLOW_QUERY_LOG_SIZE,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        explain_rate: float = SLOW_QUERY_EXPLAIN_RATE,
+        explain_analyze: bool = SLOW_QUERY_EXPLAIN_ANALYZE,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.explain_analyze = explain_analyze
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """
+        Adds a slow statement, dropping the oldest one if the buffer is full.
+
+        Args:
+            entry (Dict[str, Any]): The statement, as built by the engine listener.
+        """
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the recorded slow statements, the latest first.
+
+        Args:
+            limit (int, optional): The maximum number of statements returned.
+
+        Returns:
+            List[Dict[str, Any]]: The statement, the shape of its parameters, the operation
+                that executed it, its duration in milliseconds, when it was executed and
+                its plan, if one was captured.
+        """
+        with self._lock:
+            entries = list(reversed(self._entries))
+
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """
+    Describes the bound parameters of a statement by their types, without their values.
+
+    Args:
+        parameters (Any): The parameters passed to the DBAPI cursor.
+        executemany (bool): Whether they are the parameter sets of an executemany.
+
+    Returns:
+        str: The shape, e.g. "(int, str)", "{id_1: int}" or "500 x (int, str)".
+    """
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameter_shape(parameters[0]) if parameters else "()"
+        return f"{len(parameters)} x {first}"
+
+    if isinstance(parameters, dict):
+        items = ", ".join(
+            f"{key}: {type(value).__name__}" for key, value in parameters.items()
+        )
+        return f"{{{items}}}"
+
+    if isinstance(parameters, (list, tuple)):
+        return f"({', '.join(type(value).__name__ for value in parameters)})"
+
+    return "()"
+
+
+def explain(connection, statement: str, parameters: Any, analyze: bool) -> str:
+    """
+    Captures the plan the database chooses for a statement.
+
+    The plan is read through a raw cursor of the statement's own connection, so it sees
+    the same transaction and does not trigger the engine's listeners again. On PostgreSQL
+    it runs inside a savepoint, so a failing EXPLAIN does not abort the transaction.
+
+    Args:
+        connection (Connection): The connection that executed the statement.
+        statement (str): The statement, in the driver's parameter style.
+        parameters (Any): Its parameters.
+        analyze (bool): Whether to execute the statement to report its actual costs,
+            where the database supports it. WITH statements are never executed again.
+
+    Returns:
+        str: The plan, one line per row, or why it could not be captured.
+    """
+    dialect = connection.dialect.name
+    analyze = analyze and _ANALYZABLE.match(statement) is not None
+
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN"
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS)" if analyze else "EXPLAIN"
+    elif dialect in ("mysql", "mariadb"):
+        prefix = "EXPLAIN ANALYZE" if analyze else "EXPLAIN"
+    else:
+        return f"EXPLAIN is not supported on {dialect}"
+
+    if not _EXPLAINABLE.match(statement):
+        return "Only SELECT statements are explained"
+
+    cursor = connection.connection.cursor()
+    savepoint = dialect == "postgresql"
+
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(f"{prefix} {statement}", parameters)
+            rows = cursor.fetchall()
+        except Exception as error:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {error}"
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+
+    if dialect in ("mysql", "mariadb"):
+        return "\n".join("\t".join(str(value) for value in row) for row in rows)
+
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def install_slow_query_log(engine: Engine, log: "SlowQueryLog") -> None:
+    """
+    Makes an engine record its statements slower than the log's threshold in the log.
+
+    Every slow statement is recorded with the shape of its parameters and the GraphQL
+    operation that executed it; the plan of a sampled explain_rate of them is captured
+    with EXPLAIN right after they complete.
+
+    Args:
+        engine (Engine): The engine to be instrumented.
+        log (SlowQueryLog): The log slow statements are recorded in.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < log.threshold_ms:
+            return
+
+        operation = current_operation.get()
+        plan = None
+        if not executemany and random.random() < log.explain_rate:
+            plan = explain(conn, statement, parameters, log.explain_analyze)
+
+        log.record(
+            {
+                "statement": " ".join(statement.split()),
+                "parameters": parameter_shape(parameters, executemany),
+                "operation": operation.name if operation is not None else None,
+                "duration_ms": round(duration_ms, 3),
+                "executed_at": datetime.now(),
+                "plan": plan,
+            }
+        )
+
+
+slow_query_log = SlowQueryLog()
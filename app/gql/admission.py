@@ -0,0 +1,520 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from graphql import FieldNode, GraphQLError, OperationType, parse
+from graphql.utilities import get_operation_ast
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.env import getenv
+from app.utils.metrics import requests_shed
+from app.utils.serialization import FastJSONResponse
+
+ADMISSION_ENABLED = getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LIMITS = getenv("ADMISSION_LIMITS", "read=64,write=16,auth=8,listing=4")
+ADMISSION_QUEUE_TIMEOUTS = getenv(
+    "ADMISSION_QUEUE_TIMEOUTS", "read=1.0,write=1.0,auth=0.25,listing=0.1"
+)
+ADMISSION_MAX_QUEUE = int(getenv("ADMISSION_MAX_QUEUE", 100))
+ADMISSION_RETRY_AFTER = int(getenv("ADMISSION_RETRY_AFTER", 1))
+ADMISSION_LATENCY_TOLERANCE = float(getenv("ADMISSION_LATENCY_TOLERANCE", 2.0))
+ADMISSION_LATENCY_FLOOR_MS = float(getenv("ADMISSION_LATENCY_FLOOR_MS", 50))
+ADMISSION_MAX_BODY_BYTES = int(getenv("ADMISSION_MAX_BODY_BYTES", 1024 * 1024))
+
+# Root fields deciding the class of an operation; any other mutation is a write and
+# any other query or subscription a read
+AUTH_FIELDS = frozenset(("loginUser", "registerUser", "updateUser"))
+LISTING_FIELDS = frozenset(("getUsers", "getAllNotes"))
+
+# Classes of recently seen documents, keyed by a digest so the cache does not keep the
+# documents themselves alive, which can be as large as ADMISSION_MAX_BODY_BYTES
+CLASS_CACHE_SIZE = 1024
+_classes: "OrderedDict[bytes, str]" = OrderedDict()
+_classes_lock = threading.Lock()
+
+# A batch is admitted in the class of its most constrained operation
+REQUEST_CLASSES = ("auth", "listing", "write", "read")
+
+# The no-load latency is the lowest latency seen, raised by this fraction at every
+# sample so that it follows a workload that becomes slower for good
+BASELINE_DRIFT = 0.001
+
+
+def parse_classes(value: str) -> Dict[str, float]:
+    """
+    Parses per class settings written as "read=64,write=16".
+
+    Args:
+        value (str): The settings.
+
+    Returns:
+        Dict[str, float]: The setting of every class listed.
+    """
+    settings = {}
+
+    for item in value.split(","):
+        name, _, setting = item.partition("=")
+        if name.strip():
+            settings[name.strip()] = float(setting)
+
+    return settings
+
+
+def classify_query(query: str, operation_name: Optional[str]) -> str:
+    """
+    Returns the class of an operation from its root fields.
+
+    Documents that cannot be parsed are classified as reads: they are rejected by the
+    GraphQL app without executing anything. The classes of the last CLASS_CACHE_SIZE
+    documents are cached by the digest of the document and operation name.
+
+    Args:
+        query (str): The GraphQL document.
+        operation_name (str, optional): The name of the operation to be executed.
+
+    Returns:
+        str: "auth", "listing", "write" or "read".
+    """
+    key = hashlib.sha256(json.dumps([query, operation_name]).encode()).digest()
+
+    with _classes_lock:
+        request_class = _classes.get(key)
+        if request_class is not None:
+            _classes.move_to_end(key)
+            return request_class
+
+    request_class = _classify(query, operation_name)
+
+    with _classes_lock:
+        _classes[key] = request_class
+        while len(_classes) > CLASS_CACHE_SIZE:
+            _classes.popitem(last=False)
+
+    return request_class
+
+
+def _classify(query: str, operation_name: Optional[str]) -> str:
+    try:
+        operation = get_operation_ast(parse(query), operation_name)
+    except GraphQLError:
+        return "read"
+
+    if operation is None:
+        return "read"
+
+    fields = {
+        selection.name.value
+        for selection in operation.selection_set.selections
+        if isinstance(selection, FieldNode)
+    }
+
+    if operation.operation == OperationType.MUTATION:
+        return "auth" if fields & AUTH_FIELDS else "write"
+
+    return "listing" if fields & LISTING_FIELDS else "read"
+
+
+def classify_operations(operations: Any) -> str:
+    """
+    Returns the class of a request from its operation or batch of operations.
+
+    Args:
+        operations (Any): The decoded JSON body of the request.
+
+    Returns:
+        str: The class of its most constrained operation.
+    """
+    if not isinstance(operations, list):
+        operations = [operations]
+
+    classes = set()
+    for operation in operations:
+        query = operation.get("query") if isinstance(operation, dict) else None
+        if isinstance(query, str):
+            classes.add(classify_query(query, operation.get("operationName")))
+
+    return next((name for name in REQUEST_CLASSES if name in classes), "read")
+
+
+def classify_request(scope: Scope, body: bytes) -> str:
+    """
+    Returns the class of a GraphQL HTTP request.
+
+    Args:
+        scope (Scope): The ASGI scope of the request.
+        body (bytes): Its body.
+
+    Returns:
+        str: "auth", "listing", "write" or "read".
+    """
+    if scope["method"] == "GET":
+        params = QueryParams(scope.get("query_string", b""))
+        query = params.get("query")
+        return classify_query(query, params.get("operationName")) if query else "read"
+
+    content_type = Headers(scope=scope).get("Content-Type", "")
+    if content_type.startswith("multipart/form-data"):
+        return "write"
+
+    try:
+        return classify_operations(json.loads(body))
+    except ValueError:
+        return "read"
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit of a class of requests, adapted to their observed latency.
+
+    Requests over the limit wait in a FIFO queue for at most queue_timeout seconds; they
+    are shed when the wait times out or when max_queue requests are already waiting.
+    The limit follows an additive increase, multiplicative decrease rule on the latency
+    of the admitted requests: it grows by one when a request completes in time while the
+    limit was reached, and shrinks by 10% when a request takes longer than tolerance
+    times the no-load latency (and longer than latency_floor), down to min_limit and up
+    to max_limit.
+
+    The limit is only used from the event loop, so it needs no locking.
+
+    Attributes:
+        name (str): The class of requests.
+        limit (float): The current limit; int(limit) requests run at most.
+        in_flight (int): The number of admitted requests that did not complete yet.
+        baseline (float, optional): The estimated no-load latency, in seconds.
+        admitted (int): The number of admitted requests.
+        shed (int): The number of shed requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        queue_timeout: float,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        min_limit: int = 1,
+        tolerance: float = ADMISSION_LATENCY_TOLERANCE,
+        latency_floor: float = ADMISSION_LATENCY_FLOOR_MS / 1000,
+    ):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.latency_floor = latency_floor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        """
+        Admits a request, waiting for a slot if the limit is reached.
+
+        Returns:
+            bool: True if the request is admitted and has to release its slot, False if it
+                is shed.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue or self.queue_timeout <= 0:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        except BaseException:
+            # The slot may have been handed over just before the request was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self._hand_over()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        self.admitted += 1
+        return True
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """
+        Releases the slot of a completed request and adapts the limit to its latency.
+
+        Args:
+            latency (float, optional): The latency of the request in seconds, None if it
+                failed and should not be taken into account.
+        """
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+
+        if latency is not None:
+            self._adapt(latency, saturated)
+
+        self._hand_over()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "baseline_ms": round(self.baseline * 1000, 3) if self.baseline else None,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+    def _adapt(self, latency: float, saturated: bool) -> None:
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline = min(latency, self.baseline * (1 + BASELINE_DRIFT))
+
+        if latency > max(self.baseline * self.tolerance, self.latency_floor):
+            self.limit = max(float(self.min_limit), self.limit * 0.9)
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+
+    def _hand_over(self) -> None:
+        # Hands the free slots to the oldest waiters still waiting
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+
+def build_limits(
+    limits: str = ADMISSION_LIMITS, queue_timeouts: str = ADMISSION_QUEUE_TIMEOUTS
+) -> Dict[str, AdaptiveLimit]:
+    """
+    Creates the limits of every request class from their settings.
+
+    Args:
+        limits (str): The maximum concurrency per class, e.g. "read=64,listing=4".
+        queue_timeouts (str): The queue timeout per class in seconds, e.g. "read=1.0".
+
+    Returns:
+        Dict[str, AdaptiveLimit]: The limit of every class.
+    """
+    max_limits = parse_classes(limits)
+    timeouts = parse_classes(queue_timeouts)
+
+    return {
+        name: AdaptiveLimit(
+            name, int(max_limits.get(name, 64)), timeouts.get(name, 1.0)
+        )
+        for name in REQUEST_CLASSES
+    }
+
+
+def overloaded_response(request_class: str, retry_after: int) -> FastJSONResponse:
+    """
+    Returns the response of a shed request: a 503 with a GraphQL error and Retry-After.
+
+    Args:
+        request_class (str): The class of the request.
+        retry_after (int): The seconds after which the client may retry.
+
+    Returns:
+        FastJSONResponse: The response.
+    """
+    return FastJSONResponse(
+        {
+            "data": None,
+            "errors": [
+                {
+                    "message": "The server is overloaded, please retry later",
+                    "extensions": {
+                        "code": "OVERLOADED",
+                        "requestClass": request_class,
+                        "retryAfter": retry_after,
+                    },
+                }
+            ],
+        },
+        status_code=503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def payload_too_large_response(max_bytes: int) -> FastJSONResponse:
+    """
+    Returns the response of a request whose body exceeds the limit: a 413 with a GraphQL error.
+
+    Args:
+        max_bytes (int): The maximum size of a request body, in bytes.
+
+    Returns:
+        FastJSONResponse: The response.
+    """
+    return FastJSONResponse(
+        {
+            "data": None,
+            "errors": [
+                {
+                    "message": f"The request body cannot be larger than {max_bytes} bytes",
+                    "extensions": {"code": "PAYLOAD_TOO_LARGE", "maxBytes": max_bytes},
+                }
+            ],
+        },
+        status_code=413,
+    )
+
+
+class AdmissionControl:
+    """
+    ASGI middleware admitting GraphQL requests per class under adaptive concurrency limits.
+
+    Requests are classified from their root fields: authentication mutations, which
+    hash passwords, admin listings, other mutations and other reads each get their own
+    limit, so a flood of expensive listings is shed without slowing cheap reads such as
+    getNote down. Shed requests are answered at once with a 503, a GraphQL error and a
+    Retry-After header.
+
+    Resolvers run synchronously on the event loop, so the work of the other requests
+    mostly queues up in the loop rather than in the limits. An admitted request therefore
+    yields to the loop once before it is executed: requests arriving together overlap
+    and count against their limits, and a request that waited longer than the queue
+    timeout of its class since it arrived, in the limit's queue or the loop's, is shed
+    instead of being executed late. The short timeouts of logins and listings make them
+    the first to be shed when the loop falls behind, which keeps the wait of cheap reads
+    short. The limits adapt to the time requests take once executed, so one class does
+    not pay for the backlog of another. WebSocket connections and GET requests without a
+    query (the playground) are passed through.
+
+    The body of a POST request has to be read to classify it, before the request is
+    admitted, so bodies larger than max_body_bytes are rejected with a 413 as soon as
+    their Content-Length or the bytes received exceed it, instead of being buffered.
+
+    Attributes:
+        limits (Dict[str, AdaptiveLimit]): The limit of every request class.
+        retry_after (int): The Retry-After of shed requests, in seconds.
+        max_body_bytes (int): The maximum size of a request body, in bytes.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Optional[Dict[str, AdaptiveLimit]] = None,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+        max_body_bytes: int = ADMISSION_MAX_BODY_BYTES,
+    ):
+        self.app = app
+        self.limits = limits if limits is not None else build_limits()
+        self.retry_after = retry_after
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "POST"):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "GET" and b"query=" not in scope.get("query_string", b""):
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await _buffer_body(scope, receive, self.max_body_bytes)
+        if body is None:
+            response = payload_too_large_response(self.max_body_bytes)
+            await response(scope, receive, send)
+            return
+
+        limit = self.limits[classify_request(scope, body)]
+
+        arrived = time.perf_counter()
+
+        if not await limit.acquire():
+            await self._shed(limit, scope, receive, send)
+            return
+
+        latency = None
+        try:
+            await asyncio.sleep(0)
+            started = time.perf_counter()
+
+            if started - arrived > limit.queue_timeout:
+                limit.shed += 1
+                await self._shed(limit, scope, receive, send)
+                return
+
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - started
+        finally:
+            limit.release(latency)
+
+    async def _shed(
+        self, limit: AdaptiveLimit, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        requests_shed.inc(limit.name)
+        response = overloaded_response(limit.name, self.retry_after)
+        await response(scope, receive, send)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the state of the limit of every request class.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The limit, in flight and queued requests, no-load
+                latency and admitted and shed requests of every class.
+        """
+        return {name: limit.stats() for name, limit in self.limits.items()}
+
+
+async def _buffer_body(
+    scope: Scope, receive: Receive, max_bytes: int
+) -> Tuple[Optional[bytes], Receive]:
+    """
+    Reads the whole body of a request and returns it with a receive callable replaying it.
+
+    The body is None if it is larger than max_bytes, in which case it is not read further.
+    """
+    if scope["method"] == "GET":
+        return b"", receive
+
+    content_length = Headers(scope=scope).get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        return None, receive
+
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            return b"", _replay([message], receive)
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_bytes:
+            return None, receive
+        chunks.append(chunk)
+        more_body = message.get("more_body", False)
+
+    body = b"".join(chunks)
+    return body, _replay(
+        [{"type": "http.request", "body": body, "more_body": False}], receive
+    )
+
+
+def _replay(messages: Iterable[Message], receive: Receive) -> Receive:
+    pending = list(messages)
+
+    async def replay() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
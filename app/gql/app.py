@@ -0,0 +1,598 @@
+import asyncio
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from inspect import isawaitable
+from typing import Any, Dict, List, Optional
+
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    graphql,
+    graphql_sync,
+    parse,
+    validate,
+)
+from graphql.utilities import get_operation_ast
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette_graphene3 import GraphQLApp, _get_operation_from_request
+
+from app.gql.cache_control import get_cache_control
+from app.gql.coalescing import SingleFlight, coalescing_key
+from app.gql.compiler import (
+    GRAPHQL_COMPILED_EXECUTION,
+    CompiledQuery,
+    ExecutionPlanCache,
+)
+from app.gql.incremental import (
+    MULTIPART_CONTENT_TYPE,
+    encode_multipart,
+    execute_incrementally,
+    uses_incremental_delivery,
+)
+from app.utils.env import getenv
+from app.utils.memory import allocation_budget
+from app.utils.metrics import operation_label, record_errors, record_operation
+from app.utils.profiler import SamplingProfiler, profiled_response, profiling_requested
+from app.utils.serialization import FastJSONResponse, dumps
+from app.utils.tracing import record_span_errors, trace_operation
+
+PERSISTED_QUERIES_MAX_ENTRIES = int(getenv("PERSISTED_QUERIES_MAX_ENTRIES", 1000))
+GRAPHQL_MAX_BATCH_SIZE = int(getenv("GRAPHQL_MAX_BATCH_SIZE", 10))
+GRAPHQL_BATCH_CONCURRENT = getenv("GRAPHQL_BATCH_CONCURRENT", "false").lower() == "true"
+
+
+class PersistedQueryNotFound(Exception):
+    """
+    Raised when a client sends the hash of a persisted query that is not stored.
+    """
+
+
+class PersistedQueryStore:
+    """
+    A bounded store of persisted queries keyed by their SHA-256 hash.
+
+    It implements the automatic persisted queries protocol: clients send the hash of a query
+    in the "persistedQuery" extension and fall back to sending the full query (together with
+    the hash) when the server does not know it yet.
+
+    Attributes:
+        max_entries (int): The maximum number of stored queries.
+    """
+
+    def __init__(self, max_entries: int = PERSISTED_QUERIES_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._queries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, query: Optional[str], extensions: Optional[Dict]) -> str:
+        """
+        Returns the query text of an operation, registering or looking up its persisted hash.
+
+        Args:
+            query (str, optional): The query text sent by the client.
+            extensions (Dict, optional): The "extensions" object of the operation.
+
+        Returns:
+            str: The query text.
+
+        Raises:
+            PersistedQueryNotFound: If only a hash was sent and it is not known.
+            ValueError: If the sent hash does not match the sent query or no query was sent.
+        """
+        persisted_query = (extensions or {}).get("persistedQuery")
+
+        if not persisted_query:
+            if not query:
+                raise ValueError("Must provide a query string")
+            return query
+
+        query_hash = persisted_query.get("sha256Hash")
+
+        if not query:
+            with self._lock:
+                query = self._queries.get(query_hash)
+                if query is None:
+                    raise PersistedQueryNotFound()
+                self._queries.move_to_end(query_hash)
+            return query
+
+        if hashlib.sha256(query.encode()).hexdigest() != query_hash:
+            raise ValueError("Provided sha256Hash does not match query")
+
+        with self._lock:
+            self._queries[query_hash] = query
+            self._queries.move_to_end(query_hash)
+            while len(self._queries) > self.max_entries:
+                self._queries.popitem(last=False)
+
+        return query
+
+
+def _is_query(operation: Any) -> bool:
+    try:
+        document = parse(operation["query"], no_location=True)
+        operation_ast = get_operation_ast(document, operation.get("operationName"))
+    except (GraphQLError, KeyError, TypeError):
+        return False
+
+    return operation_ast is not None and operation_ast.operation == OperationType.QUERY
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Creates a strong ETag from a response body.
+
+    Args:
+        body (bytes): The serialized response body.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Checks if an ETag matches the value of an If-None-Match header.
+
+    Args:
+        etag (str): The ETag of the current response.
+        if_none_match (str, optional): The If-None-Match header sent by the client.
+
+    Returns:
+        bool: True if the client already has the current representation.
+    """
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+
+def _operation_names(operations: Any) -> str:
+    """
+    Describes the operations of a request by their names, for logs.
+    """
+    if isinstance(operations, list):
+        return ", ".join(
+            operation_label(operation.get("operationName"))
+            for operation in operations
+            if isinstance(operation, dict)
+        )
+
+    if isinstance(operations, dict):
+        return operation_label(operations.get("operationName"))
+
+    return operation_label(None)
+
+
+class TodoGraphQLApp(GraphQLApp):
+    """
+    GraphQL application serving the schema over POST and read-only queries over GET.
+
+    POST requests may contain a JSON array of operations, which are executed as one batch
+    and answered with an array of results in the same order.
+
+    Single queries using @defer or @stream are answered incrementally with a multipart/mixed
+    response if the client accepts it. Otherwise the directives are ignored and the whole
+    result is sent at once.
+
+    If GRAPHQL_COMPILED_EXECUTION is enabled, queries are executed by plans compiled once per
+    document instead of the stock graphql-core executor.
+
+    GET requests without a query or persisted query are handed to on_get (the playground).
+    Responses to GET queries carry an ETag and a Cache-Control header combined from the cache
+    hints of the selected fields, and requests with a matching If-None-Match are answered with
+    304 Not Modified.
+
+    Identical read operations sent with POST at the same time by the same user, or by any
+    admin for the admin listings, share one execution: the first one runs in the threadpool,
+    so the event loop keeps accepting requests while it waits for the database, and the
+    others wait for its result instead of running it again. Profiled requests are never
+    shared.
+
+    POST requests of admins sending the X-Profile header are profiled by a sampling profiler,
+    whose summary is returned in the "profile" extension. Only the samples taken while the
+    request itself runs on the event loop are recorded, not those of requests interleaved
+    with it. POST requests allocating more than
+    MEMORY_REQUEST_BUDGET_KB are logged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.persisted_queries = PersistedQueryStore()
+        self.execution_plans = ExecutionPlanCache(self.schema.graphql_schema)
+        self.single_flight = SingleFlight()
+
+    async def _get_on_get(self, request: Request) -> Optional[Response]:
+        params = request.query_params
+
+        if "query" not in params and "extensions" not in params:
+            return await super()._get_on_get(request)
+
+        return await self._handle_get_request(request)
+
+    async def _handle_http_request(self, request: Request) -> Response:
+        try:
+            operations = await _get_operation_from_request(request)
+        except ValueError as e:
+            return FastJSONResponse({"errors": [e.args[0]]}, status_code=400)
+
+        context_value = await self._get_context_value(request)
+
+        if (
+            isinstance(operations, dict)
+            and isinstance(operations.get("query"), str)
+            and uses_incremental_delivery(operations["query"])
+            and "multipart/mixed" in request.headers.get("Accept", "")
+        ):
+            return self._handle_incremental_request(operations, context_value)
+
+        with allocation_budget(_operation_names(operations)):
+            if not profiling_requested(request, context_value):
+                return await self._respond(operations, context_value)
+
+            with SamplingProfiler(frame=sys._getframe()) as profiler:
+                response = await self._respond(
+                    operations, context_value, coalesce=False
+                )
+
+        return profiled_response(response, profiler)
+
+    async def _respond(
+        self, operations: Any, context_value: Any, coalesce: bool = True
+    ) -> Response:
+        """
+        Executes an operation or a batch of operations and serializes the response.
+
+        Identical read operations in flight share one execution unless coalesce is False.
+        """
+        if isinstance(operations, list):
+            if not operations:
+                return FastJSONResponse(
+                    {"errors": ["Batch must contain at least one operation"]},
+                    status_code=400,
+                )
+
+            if len(operations) > GRAPHQL_MAX_BATCH_SIZE:
+                return FastJSONResponse(
+                    {
+                        "errors": [
+                            f"Batch cannot contain more than {GRAPHQL_MAX_BATCH_SIZE} operations"
+                        ]
+                    },
+                    status_code=400,
+                )
+
+            response = await self._execute_batch(operations, context_value, coalesce)
+        else:
+            try:
+                response = await self._execute_operation(
+                    operations, context_value, coalesce=coalesce
+                )
+            except ValueError as e:
+                return FastJSONResponse({"errors": [e.args[0]]}, status_code=400)
+
+        return FastJSONResponse(
+            response,
+            status_code=200,
+            background=context_value.get("background"),
+        )
+
+    async def _execute_batch(
+        self, operations: List[Any], context_value: Any, coalesce: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Executes a batch of operations sharing one context, and therefore one authentication.
+
+        Operations run one after another in the order they were sent. If GRAPHQL_BATCH_CONCURRENT
+        is enabled and the batch contains only queries, the operations run concurrently in
+        worker threads instead.
+        """
+
+        async def execute_operation(operation: Any, in_thread: bool) -> Dict[str, Any]:
+            try:
+                return await self._execute_operation(
+                    operation, context_value, in_thread=in_thread, coalesce=coalesce
+                )
+            except ValueError as e:
+                return {"errors": [e.args[0]]}
+
+        if GRAPHQL_BATCH_CONCURRENT and all(map(_is_query, operations)):
+            return list(
+                await asyncio.gather(
+                    *(execute_operation(operation, True) for operation in operations)
+                )
+            )
+
+        return [await execute_operation(operation, False) for operation in operations]
+
+    async def _execute_operation(
+        self,
+        operation: Any,
+        context_value: Any,
+        in_thread: bool = False,
+        coalesce: bool = True,
+    ) -> Dict[str, Any]:
+        if not isinstance(operation, dict):
+            raise ValueError("Operation must be an Object")
+
+        try:
+            query = self.persisted_queries.resolve(
+                operation.get("query"), operation.get("extensions")
+            )
+        except PersistedQueryNotFound:
+            return _PERSISTED_QUERY_NOT_FOUND
+
+        operation_name = operation.get("operationName")
+        key = (
+            coalescing_key(
+                query, operation_name, operation.get("variables"), context_value
+            )
+            if coalesce and isinstance(query, str)
+            else None
+        )
+
+        if key is None:
+            return await self._run_operation(query, operation, context_value, in_thread)
+
+        # The shared execution runs in the threadpool, so identical requests arriving
+        # while it waits for the database can join it
+        return await self.single_flight.do(
+            key,
+            lambda: self._run_operation(query, operation, context_value, True),
+            operation_label(operation_name),
+        )
+
+    async def _run_operation(
+        self, query: Any, operation: Dict[str, Any], context_value: Any, in_thread: bool
+    ) -> Dict[str, Any]:
+        """
+        Executes an operation, on the event loop or in the threadpool, and formats its result.
+        """
+        operation_name = operation.get("operationName")
+        plan = self._get_execution_plan(query, operation_name)
+
+        with record_operation(operation_name), trace_operation(
+            operation_name, context_value
+        ) as span:
+            if plan is not None:
+                kwargs = dict(
+                    root_value=self.root_value,
+                    context_value=context_value,
+                    variable_values=operation.get("variables"),
+                )
+                if in_thread:
+                    result = await run_in_threadpool(plan, **kwargs)
+                else:
+                    result = plan(**kwargs)
+            else:
+                kwargs = dict(
+                    source=query,
+                    context_value=context_value,
+                    root_value=self.root_value,
+                    middleware=self.middleware,
+                    variable_values=operation.get("variables"),
+                    operation_name=operation_name,
+                    execution_context_class=self.execution_context_class,
+                )
+
+                if in_thread:
+                    result = await run_in_threadpool(
+                        graphql_sync, self.schema.graphql_schema, **kwargs
+                    )
+                else:
+                    result = await graphql(self.schema.graphql_schema, **kwargs)
+
+            record_span_errors(span, result.errors)
+
+        record_errors(operation_name, result.errors)
+
+        return self._format_result(result)
+
+    def _handle_incremental_request(
+        self, operation: Dict[str, Any], context_value: Any
+    ) -> Response:
+        """
+        Executes a query with @defer or @stream and streams its payloads as multipart/mixed parts.
+
+        Every payload is written as soon as it is ready, so the client can render the initial
+        data while deferred fragments and streamed list items are still being resolved.
+        """
+        try:
+            document = parse(operation["query"])
+        except GraphQLError as error:
+            return FastJSONResponse(
+                {"data": None, "errors": [self.error_formatter(error)]},
+                status_code=400,
+            )
+
+        errors = validate(self.schema.graphql_schema, document)
+
+        if errors:
+            return FastJSONResponse(
+                {"data": None, "errors": [self.error_formatter(e) for e in errors]},
+                status_code=400,
+            )
+
+        context_value["incremental"] = True
+        payloads = execute_incrementally(
+            self.schema.graphql_schema,
+            document,
+            root_value=self.root_value,
+            context_value=context_value,
+            variable_values=operation.get("variables"),
+            operation_name=operation.get("operationName"),
+            middleware=self.middleware,
+        )
+
+        operation_name = operation.get("operationName")
+
+        def count_errors(payload: Dict[str, Any]) -> Dict[str, Any]:
+            record_errors(operation_name, payload.get("errors"))
+            for incremental in payload.get("incremental", ()):
+                record_errors(operation_name, incremental.get("errors"))
+            return payload
+
+        async def body():
+            # Resolvers are synchronous and run on the event loop like in graphql(),
+            # so a streamed cursor is never used from another thread
+            with record_operation(operation_name), trace_operation(
+                operation_name, context_value
+            ):
+                for chunk in encode_multipart(
+                    dumps(count_errors(payload)) for payload in payloads
+                ):
+                    yield chunk
+                    await asyncio.sleep(0)
+
+        return StreamingResponse(
+            body(),
+            media_type=MULTIPART_CONTENT_TYPE,
+            background=context_value.get("background"),
+        )
+
+    async def _handle_get_request(self, request: Request) -> Response:
+        params = request.query_params
+
+        try:
+            variables = json.loads(params.get("variables") or "null")
+            extensions = json.loads(params.get("extensions") or "null")
+            query = self.persisted_queries.resolve(params.get("query"), extensions)
+        except PersistedQueryNotFound:
+            return FastJSONResponse(_PERSISTED_QUERY_NOT_FOUND)
+        except ValueError as e:
+            return FastJSONResponse({"errors": [e.args[0]]}, status_code=400)
+
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            return FastJSONResponse(
+                {"data": None, "errors": [self.error_formatter(error)]},
+                status_code=400,
+            )
+
+        operation = get_operation_ast(document, params.get("operationName"))
+
+        if operation is None:
+            return FastJSONResponse(
+                {"errors": ["Could not determine the operation to execute"]},
+                status_code=400,
+            )
+
+        if operation.operation != OperationType.QUERY:
+            return FastJSONResponse(
+                {"errors": ["Only query operations can be executed over GET"]},
+                status_code=405,
+                headers={"Allow": "POST"},
+            )
+
+        errors = validate(self.schema.graphql_schema, document)
+
+        if errors:
+            return FastJSONResponse(
+                {"data": None, "errors": [self.error_formatter(e) for e in errors]},
+                status_code=400,
+            )
+
+        context_value = await self._get_context_value(request)
+        operation_name = params.get("operationName")
+        plan = self._get_execution_plan(query, operation_name)
+
+        with record_operation(operation_name), trace_operation(
+            operation_name, context_value
+        ) as span:
+            if plan is not None:
+                result = plan(self.root_value, context_value, variables)
+            else:
+                result = execute(
+                    self.schema.graphql_schema,
+                    document,
+                    root_value=self.root_value,
+                    context_value=context_value,
+                    variable_values=variables,
+                    operation_name=operation_name,
+                    middleware=self.middleware,
+                    execution_context_class=self.execution_context_class,
+                )
+
+            if isawaitable(result):
+                result = await result
+
+            record_span_errors(span, result.errors)
+
+        record_errors(operation_name, result.errors)
+
+        response = FastJSONResponse(
+            self._format_result(result),
+            background=context_value.get("background"),
+        )
+
+        if result.errors:
+            response.headers["Cache-Control"] = "no-store"
+            return response
+
+        etag = make_etag(response.body)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": get_cache_control(
+                self.schema.graphql_schema, document, operation
+            ),
+            "Vary": "Authorization",
+        }
+
+        if etag_matches(etag, request.headers.get("If-None-Match")):
+            return Response(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+        return response
+
+    def _get_execution_plan(
+        self, query: str, operation_name: Optional[str]
+    ) -> Optional[CompiledQuery]:
+        # Custom middleware and execution contexts only apply to the stock executor
+        if (
+            not GRAPHQL_COMPILED_EXECUTION
+            or self.middleware
+            or self.execution_context_class
+        ):
+            return None
+
+        return self.execution_plans.get(query, operation_name)
+
+    def _format_result(self, result: ExecutionResult) -> Dict[str, Any]:
+        response: Dict[str, Any] = {"data": result.data}
+
+        if result.errors:
+            for error in result.errors:
+                if error.original_error:
+                    self.logger.error(
+                        "An exception occurred in resolvers",
+                        exc_info=error.original_error,
+                    )
+            response["errors"] = [
+                self.error_formatter(error) for error in result.errors
+            ]
+
+        return response
+
+
+_PERSISTED_QUERY_NOT_FOUND = {
+    "errors": [
+        {
+            "message": "PersistedQueryNotFound",
+            "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+        }
+    ]
+}
@@ -0,0 +1,120 @@
+from typing import Callable, NamedTuple, Optional
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    get_named_type,
+)
+
+PUBLIC = "public"
+PRIVATE = "private"
+
+
+class CacheHint(NamedTuple):
+    """
+    Cache hint of a single GraphQL field.
+
+    Attributes:
+        max_age (int): The number of seconds the field's value may be reused for.
+        scope (str): PUBLIC if the value may be stored by shared caches, PRIVATE otherwise.
+    """
+
+    max_age: int
+    scope: str = PRIVATE
+
+
+def cache_hint(max_age: int, scope: str = PRIVATE):
+    """
+    Decorator attaching a cache hint to a resolver.
+
+    The hints of all fields selected by an operation are combined into the response's
+    Cache-Control header by get_cache_control.
+
+    Args:
+        max_age (int): The number of seconds the field's value may be reused for.
+        scope (str, optional): PUBLIC or PRIVATE (default is PRIVATE).
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable):
+        func.cache_hint = CacheHint(max_age, scope)
+        return func
+
+    return decorator
+
+
+def get_cache_control(
+    schema: GraphQLSchema, document: DocumentNode, operation: OperationDefinitionNode
+) -> str:
+    """
+    Combines the cache hints of the fields selected by a query into a Cache-Control header value.
+
+    The resulting max-age is the lowest max-age of all hinted fields and the scope is private
+    if any hinted field is private. Root fields without a hint are not cacheable, in which case
+    clients have to revalidate every response with its ETag.
+
+    Args:
+        schema (GraphQLSchema): The executable schema.
+        document (DocumentNode): The parsed request document.
+        operation (OperationDefinitionNode): The executed query operation.
+
+    Returns:
+        str: The Cache-Control header value.
+    """
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if not isinstance(definition, OperationDefinitionNode)
+    }
+    hints = []
+
+    def collect(
+        selection_set: Optional[SelectionSetNode],
+        parent_type: GraphQLObjectType,
+        is_root: bool,
+    ) -> None:
+        if selection_set is None:
+            return
+
+        for selection in selection_set.selections:
+            if isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    collect(fragment.selection_set, parent_type, is_root)
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set, parent_type, is_root)
+            elif isinstance(selection, FieldNode):
+                field = parent_type.fields.get(selection.name.value)
+                if field is None:
+                    continue
+
+                hint = getattr(field.resolve, "cache_hint", None)
+                if hint is not None:
+                    hints.append(hint)
+                elif is_root:
+                    hints.append(CacheHint(0))
+
+                field_type = get_named_type(field.type)
+                if isinstance(field_type, GraphQLObjectType):
+                    collect(selection.selection_set, field_type, False)
+
+    collect(operation.selection_set, schema.query_type, True)
+
+    if not hints:
+        return "no-cache"
+
+    max_age = min(hint.max_age for hint in hints)
+    scope = PRIVATE if any(hint.scope == PRIVATE for hint in hints) else PUBLIC
+
+    if max_age <= 0:
+        return f"{scope}, no-cache"
+
+    return f"{scope}, max-age={max_age}"
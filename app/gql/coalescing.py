@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Optional
+
+from graphql import FieldNode, GraphQLError, OperationType, parse
+from graphql.utilities import get_operation_ast
+
+from app.utils.cache import make_cache_key
+from app.utils.env import getenv
+from app.utils.metrics import coalesced_executions
+from app.utils.user import get_authenticated_user
+
+GRAPHQL_COALESCE_READS = getenv("GRAPHQL_COALESCE_READS", "true").lower() == "true"
+
+# Root fields returning the same data to every admin, so the operations selecting only
+# them are shared between all admins rather than per user
+ADMIN_SHARED_FIELDS = frozenset(("getUsers", "getAllNotes"))
+
+# Root fields of recently seen query documents, keyed by a digest so the cache does not
+# keep the documents themselves alive
+READ_FIELDS_CACHE_SIZE = 1024
+_read_fields: "OrderedDict[bytes, Optional[FrozenSet[str]]]" = OrderedDict()
+_read_fields_lock = threading.Lock()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent executions of the same call into one.
+
+    The first call for a key starts the function as a task of its own; calls with the same
+    key arriving while it runs await the same task and get its result, or its error,
+    instead of running it again. Since the task does not belong to any of the callers, a
+    caller that is cancelled, e.g. because its client disconnected, does not cancel it for
+    the others. Nothing is kept once the task is over, so later calls run the function anew.
+
+    The calls have to be made from the same event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._executions = 0
+        self._collapsed = 0
+
+    async def do(
+        self, key: Hashable, func: Callable[[], Awaitable[Any]], operation: str = ""
+    ) -> Any:
+        """
+        Runs a coroutine function, or waits for the execution in flight with the same key.
+
+        Args:
+            key (Hashable): The key identifying the call.
+            func (Callable[[], Awaitable[Any]]): The coroutine function.
+            operation (str, optional): The name of the operation, used in the metrics.
+
+        Returns:
+            Any: The result of the function.
+        """
+        task = self._calls.get(key)
+
+        if task is None or task.done():
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._executions += 1
+        else:
+            self._collapsed += 1
+            coalesced_executions.inc(operation)
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the statistics of the collapsed executions.
+
+        Returns:
+            Dict[str, int]: The executions in flight, the executions run and the collapsed ones.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "executions": self._executions,
+            "collapsed": self._collapsed,
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+def read_fields(query: str, operation_name: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Returns the root fields of an operation if it is a query.
+
+    Args:
+        query (str): The GraphQL document.
+        operation_name (str, optional): The name of the operation to be executed.
+
+    Returns:
+        FrozenSet[str], optional: The names of the root fields, "..." standing for the
+            fields selected through fragments, or None if the operation is a mutation or a
+            subscription, or cannot be found in the document.
+    """
+    key = hashlib.sha256(json.dumps([query, operation_name]).encode()).digest()
+
+    with _read_fields_lock:
+        if key in _read_fields:
+            _read_fields.move_to_end(key)
+            return _read_fields[key]
+
+    try:
+        operation = get_operation_ast(parse(query, no_location=True), operation_name)
+    except GraphQLError:
+        operation = None
+
+    fields = None
+    if operation is not None and operation.operation == OperationType.QUERY:
+        fields = frozenset(
+            selection.name.value if isinstance(selection, FieldNode) else "..."
+            for selection in operation.selection_set.selections
+        )
+
+    with _read_fields_lock:
+        _read_fields[key] = fields
+        while len(_read_fields) > READ_FIELDS_CACHE_SIZE:
+            _read_fields.popitem(last=False)
+
+    return fields
+
+
+def coalescing_key(
+    query: str, operation_name: Optional[str], variables: Any, context: Any
+) -> Optional[str]:
+    """
+    Returns the key under which identical executions of a read operation are collapsed.
+
+    Executions are identical when they run the same document and operation with the same
+    variables within the same authorization scope: the authenticated user, or all admins
+    for operations selecting only ADMIN_SHARED_FIELDS. Mutations, subscriptions and
+    operations of clients that cannot be authenticated are never collapsed.
+
+    Args:
+        query (str): The GraphQL document.
+        operation_name (str, optional): The name of the operation to be executed.
+        variables (Any): The variables of the operation.
+        context (Any): The context the operation is executed with.
+
+    Returns:
+        str, optional: The key, or None if the execution is not to be collapsed.
+    """
+    if not GRAPHQL_COALESCE_READS or not isinstance(context, dict):
+        return None
+
+    fields = read_fields(query, operation_name)
+    if fields is None:
+        return None
+
+    try:
+        user, _ = get_authenticated_user(context)
+    except GraphQLError:
+        return None
+
+    scope = (
+        "admin" if user.is_admin is True and fields <= ADMIN_SHARED_FIELDS else user.id
+    )
+
+    return make_cache_key(
+        query, {"operationName": operation_name, "variables": variables}, scope
+    )
@@ -0,0 +1,537 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from graphene.types.resolver import dict_or_attr_resolver
+from graphql import (
+    DocumentNode,
+    ExecutionContext,
+    ExecutionResult,
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLError,
+    GraphQLField,
+    GraphQLObjectType,
+    GraphQLOutputType,
+    GraphQLResolveInfo,
+    GraphQLSchema,
+    OperationDefinitionNode,
+    OperationType,
+    VariableNode,
+    default_field_resolver,
+    is_abstract_type,
+    is_leaf_type,
+    is_list_type,
+    is_non_null_type,
+    located_error,
+    parse,
+    validate,
+    visit,
+    Visitor,
+)
+from graphql.execution.collect_fields import collect_fields, collect_sub_fields
+from graphql.execution.values import get_argument_values, get_variable_values
+from graphql.pyutils import Path, Undefined, inspect, is_awaitable
+from graphql.type.scalars import GRAPHQL_MAX_INT, GRAPHQL_MIN_INT
+from graphql.utilities import get_operation_ast
+
+from app.utils.env import getenv
+
+GRAPHQL_COMPILED_EXECUTION = (
+    getenv("GRAPHQL_COMPILED_EXECUTION", "false").lower() == "true"
+)
+COMPILED_PLANS_MAX_ENTRIES = int(getenv("COMPILED_PLANS_MAX_ENTRIES", 1000))
+
+# A field executor is called with the execution state, the parent value and the parent path
+FieldExecutor = Callable[["_Execution", Any, Optional[Path]], Any]
+# A value completer is called with the execution state, the resolved value and its path
+Completer = Callable[["_Execution", Any, Path], Any]
+
+
+class CompilationError(Exception):
+    """
+    Raised when an operation uses a feature the compiler does not support.
+    """
+
+
+class _Execution:
+    __slots__ = (
+        "plan",
+        "root_value",
+        "context",
+        "variable_values",
+        "errors",
+        "_arguments",
+    )
+
+    def __init__(
+        self,
+        plan: "CompiledQuery",
+        root_value: Any,
+        context: Any,
+        variable_values: Dict[str, Any],
+    ):
+        self.plan = plan
+        self.root_value = root_value
+        self.context = context
+        self.variable_values = variable_values
+        self.errors: List[GraphQLError] = []
+        self._arguments: Dict[int, Dict[str, Any]] = {}
+
+    def arguments(self, field_def: GraphQLField, node: FieldNode) -> Dict[str, Any]:
+        # Arguments only depend on the variables, so every field node is coerced once
+        arguments = self._arguments.get(id(node))
+        if arguments is None:
+            arguments = get_argument_values(field_def, node, self.variable_values)
+            self._arguments[id(node)] = arguments
+        return arguments
+
+    def info(
+        self,
+        field_name: str,
+        field_nodes: List[FieldNode],
+        return_type: GraphQLOutputType,
+        parent_type: GraphQLObjectType,
+        path: Path,
+    ) -> GraphQLResolveInfo:
+        return GraphQLResolveInfo(
+            field_name,
+            field_nodes,
+            return_type,
+            parent_type,
+            path,
+            self.plan.schema,
+            self.plan.fragments,
+            self.root_value,
+            self.plan.operation,
+            self.variable_values,
+            self.context,
+            is_awaitable,
+        )
+
+
+class CompiledQuery:
+    """
+    A query operation compiled into a tree of specialized field executors.
+
+    Field collection, fragment expansion and the lookup of field definitions, resolvers and
+    serializers happen once at compile time. Fields resolved by graphene's default resolver
+    are read from their source directly, without building a resolve info or calling the
+    resolver. Results are built as plain dicts and lists.
+
+    Calling the plan executes the operation and returns the same ExecutionResult as the
+    stock executor would. Resolvers have to be synchronous.
+
+    Attributes:
+        schema (GraphQLSchema): The schema the query was compiled against.
+        document (DocumentNode): The parsed and validated request document.
+        operation (OperationDefinitionNode): The compiled operation.
+        fragments (Dict[str, FragmentDefinitionNode]): The fragments of the document.
+    """
+
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        document: DocumentNode,
+        operation: OperationDefinitionNode,
+    ):
+        self.schema = schema
+        self.document = document
+        self.operation = operation
+        self.fragments: Dict[str, FragmentDefinitionNode] = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+        root_type = schema.query_type
+        fields = collect_fields(
+            schema, self.fragments, {}, root_type, operation.selection_set
+        )
+        self._root_fields = self._compile_fields(root_type, fields)
+
+    def __call__(
+        self,
+        root_value: Any = None,
+        context_value: Any = None,
+        variable_values: Optional[Dict[str, Any]] = None,
+    ) -> ExecutionResult:
+        coerced = get_variable_values(
+            self.schema,
+            self.operation.variable_definitions or (),
+            variable_values or {},
+        )
+        if isinstance(coerced, list):
+            return ExecutionResult(data=None, errors=coerced)
+
+        execution = _Execution(self, root_value, context_value, coerced)
+
+        try:
+            data = {
+                key: execute(execution, root_value, None)
+                for key, execute in self._root_fields
+            }
+        except GraphQLError as error:
+            execution.errors.append(error)
+            data = None
+
+        return ExecutionContext.build_response(data, execution.errors)
+
+    def _compile_fields(
+        self, parent_type: GraphQLObjectType, fields: Dict[str, List[FieldNode]]
+    ) -> List[Tuple[str, FieldExecutor]]:
+        return [
+            (key, self._compile_field(parent_type, key, field_nodes))
+            for key, field_nodes in fields.items()
+        ]
+
+    def _compile_field(
+        self, parent_type: GraphQLObjectType, key: str, field_nodes: List[FieldNode]
+    ) -> FieldExecutor:
+        field_name = field_nodes[0].name.value
+
+        if field_name == "__typename":
+            type_name = parent_type.name
+            return lambda execution, source, path: type_name
+
+        if field_name.startswith("__"):
+            raise CompilationError("Introspection is not compiled")
+
+        field_def = parent_type.fields[field_name]
+        return_type = field_def.type
+        non_null = is_non_null_type(return_type)
+        complete = self._compile_value(
+            return_type, parent_type, field_name, field_nodes
+        )
+        resolve = field_def.resolve
+        node = field_nodes[0]
+
+        if (
+            isinstance(resolve, partial)
+            and resolve.func is dict_or_attr_resolver
+            and not node.arguments
+        ):
+            attname, default_value = resolve.args
+
+            def execute_attribute(execution, source, parent_path):
+                try:
+                    if isinstance(source, dict):
+                        value = source.get(attname, default_value)
+                    else:
+                        value = getattr(source, attname, default_value)
+                    return complete(
+                        execution, value, Path(parent_path, key, parent_type.name)
+                    )
+                except Exception as raw_error:
+                    path = Path(parent_path, key, parent_type.name)
+                    error = located_error(raw_error, field_nodes, path.as_list())
+                    if non_null:
+                        raise error
+                    execution.errors.append(error)
+                    return None
+
+            if is_leaf_type(_named_type(return_type)):
+                # Leaf values do not need their path unless they fail to serialize
+                def execute_leaf_attribute(execution, source, parent_path):
+                    try:
+                        if isinstance(source, dict):
+                            value = source.get(attname, default_value)
+                        else:
+                            value = getattr(source, attname, default_value)
+                        return complete(execution, value, None)
+                    except Exception:
+                        return execute_attribute(execution, source, parent_path)
+
+                return execute_leaf_attribute
+
+            return execute_attribute
+
+        resolve = resolve or default_field_resolver
+
+        def execute_field(execution, source, parent_path):
+            path = Path(parent_path, key, parent_type.name)
+            try:
+                info = execution.info(
+                    field_name, field_nodes, return_type, parent_type, path
+                )
+                value = resolve(source, info, **execution.arguments(field_def, node))
+                if is_awaitable(value):
+                    value.close()
+                    raise GraphQLError("Compiled queries cannot await resolvers")
+                return complete(execution, value, path)
+            except Exception as raw_error:
+                error = located_error(raw_error, field_nodes, path.as_list())
+                if non_null:
+                    raise error
+                execution.errors.append(error)
+                return None
+
+        return execute_field
+
+    def _compile_value(
+        self,
+        return_type: GraphQLOutputType,
+        parent_type: GraphQLObjectType,
+        field_name: str,
+        field_nodes: List[FieldNode],
+    ) -> Completer:
+        if is_non_null_type(return_type):
+            complete_inner = self._compile_value(
+                return_type.of_type, parent_type, field_name, field_nodes
+            )
+            message = (
+                "Cannot return null for non-nullable field"
+                f" {parent_type.name}.{field_name}."
+            )
+
+            def complete_non_null(execution, value, path):
+                completed = complete_inner(execution, value, path)
+                if completed is None:
+                    raise TypeError(message)
+                return completed
+
+            return complete_non_null
+
+        if is_list_type(return_type):
+            return self._compile_list(return_type, parent_type, field_name, field_nodes)
+
+        if is_leaf_type(return_type):
+            return _compile_leaf(return_type)
+
+        if is_abstract_type(return_type):
+            raise CompilationError("Abstract types are not compiled")
+
+        return self._compile_object(return_type, field_nodes)
+
+    def _compile_list(self, return_type, parent_type, field_name, field_nodes):
+        item_type = return_type.of_type
+        complete_item = self._compile_value(
+            item_type, parent_type, field_name, field_nodes
+        )
+        item_non_null = is_non_null_type(item_type)
+        message = (
+            "Expected Iterable, but did not find one for field"
+            f" '{parent_type.name}.{field_name}'."
+        )
+
+        def complete_list(execution, value, path):
+            if value is None or value is Undefined:
+                return None
+            if isinstance(value, Exception):
+                raise value
+            if isinstance(value, (str, bytes, dict)) or not isinstance(value, Iterable):
+                raise GraphQLError(message)
+
+            completed = []
+            append = completed.append
+
+            for index, item in enumerate(value):
+                item_path = Path(path, index, None)
+                try:
+                    append(complete_item(execution, item, item_path))
+                except Exception as raw_error:
+                    error = located_error(raw_error, field_nodes, item_path.as_list())
+                    if item_non_null:
+                        raise error
+                    execution.errors.append(error)
+                    append(None)
+
+            return completed
+
+        return complete_list
+
+    def _compile_object(
+        self, return_type: GraphQLObjectType, field_nodes: List[FieldNode]
+    ) -> Completer:
+        fields = collect_sub_fields(
+            self.schema, self.fragments, {}, return_type, field_nodes
+        )
+        if return_type.is_type_of is not None:
+            raise CompilationError("Types with is_type_of are not compiled")
+
+        executors = self._compile_fields(return_type, fields)
+
+        def complete_object(execution, value, path):
+            if value is None or value is Undefined:
+                return None
+            if isinstance(value, Exception):
+                raise value
+
+            return {key: execute(execution, value, path) for key, execute in executors}
+
+        return complete_object
+
+
+def _named_type(type_: GraphQLOutputType) -> GraphQLOutputType:
+    while hasattr(type_, "of_type"):
+        type_ = type_.of_type
+    return type_
+
+
+def _compile_leaf(return_type) -> Completer:
+    serialize = return_type.serialize
+
+    # Skip the generic coercion of the built-in scalars for values of their exact type
+    if return_type.name == "Int":
+
+        def is_exact(value):
+            return type(value) is int and GRAPHQL_MIN_INT <= value <= GRAPHQL_MAX_INT
+
+    elif return_type.name == "String":
+
+        def is_exact(value):
+            return type(value) is str
+
+    elif return_type.name == "Boolean":
+
+        def is_exact(value):
+            return type(value) is bool
+
+    else:
+
+        def is_exact(value):
+            return False
+
+    def complete_leaf(execution, value, path):
+        if value is None or value is Undefined:
+            return None
+        if is_exact(value):
+            return value
+        if isinstance(value, Exception):
+            raise value
+
+        serialized = serialize(value)
+        if serialized is Undefined:
+            raise TypeError(
+                f"Expected `{inspect(return_type)}.serialize({inspect(value)})`"
+                f" to return non-nullable value, returned: {inspect(serialized)}"
+            )
+        return serialized
+
+    return complete_leaf
+
+
+class _VariableDirectiveFinder(Visitor):
+    def __init__(self):
+        super().__init__()
+        self.found = False
+
+    def enter_directive(self, node, *_):
+        if node.name.value in ("skip", "include") and any(
+            isinstance(argument.value, VariableNode) for argument in node.arguments
+        ):
+            self.found = True
+            return self.BREAK
+
+
+def compile_query(
+    schema: GraphQLSchema, document: DocumentNode, operation_name: Optional[str] = None
+) -> CompiledQuery:
+    """
+    Compiles a query operation of a validated document.
+
+    Args:
+        schema (GraphQLSchema): The executable schema.
+        document (DocumentNode): The parsed and validated request document.
+        operation_name (str, optional): The name of the operation to compile.
+
+    Returns:
+        CompiledQuery: The compiled execution plan.
+
+    Raises:
+        CompilationError: If the operation is not a query or uses a feature that is not compiled
+            (introspection, abstract types, @skip/@include depending on variables).
+    """
+    operation = get_operation_ast(document, operation_name)
+
+    if operation is None or operation.operation != OperationType.QUERY:
+        raise CompilationError("Only query operations are compiled")
+
+    finder = _VariableDirectiveFinder()
+    visit(document, finder)
+    if finder.found:
+        raise CompilationError(
+            "@skip and @include depending on variables are not compiled"
+        )
+
+    return CompiledQuery(schema, document, operation)
+
+
+class ExecutionPlanCache:
+    """
+    A bounded cache of compiled query plans keyed by the query text and operation name.
+
+    Queries are parsed, validated and compiled only on their first execution. Documents that
+    cannot be compiled (invalid documents, mutations, unsupported features) are remembered as
+    well, so they are handed to the stock executor without compiling them again.
+
+    Attributes:
+        schema (GraphQLSchema): The schema queries are compiled against.
+        max_entries (int): The maximum number of cached documents.
+    """
+
+    def __init__(
+        self, schema: GraphQLSchema, max_entries: int = COMPILED_PLANS_MAX_ENTRIES
+    ):
+        self.schema = schema
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[Tuple[str, Optional[str]], Optional[CompiledQuery]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(
+        self, source: str, operation_name: Optional[str] = None
+    ) -> Optional[CompiledQuery]:
+        """
+        Returns the compiled plan of a query, compiling it on the first call.
+
+        Args:
+            source (str): The query text.
+            operation_name (str, optional): The name of the operation to execute.
+
+        Returns:
+            CompiledQuery, optional: The plan or None if the stock executor has to be used.
+        """
+        key = (source, operation_name)
+
+        with self._lock:
+            if key in self._plans:
+                self._hits += 1
+                self._plans.move_to_end(key)
+                return self._plans[key]
+            self._misses += 1
+
+        plan = None
+
+        try:
+            document = parse(source)
+            if not validate(self.schema, document):
+                plan = compile_query(self.schema, document, operation_name)
+        except (GraphQLError, CompilationError):
+            pass
+
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache statistics.
+
+        Returns:
+            Dict[str, int]: The number of hits, misses and cached plans.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "entries": len(self._plans),
+                "compiled": sum(plan is not None for plan in self._plans.values()),
+            }
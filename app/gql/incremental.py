@@ -0,0 +1,489 @@
+from inspect import isawaitable
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from graphql import (
+    DirectiveLocation,
+    DocumentNode,
+    ExecutionContext,
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLArgument,
+    GraphQLBoolean,
+    GraphQLDirective,
+    GraphQLError,
+    GraphQLInt,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLOutputType,
+    GraphQLResolveInfo,
+    GraphQLSchema,
+    GraphQLString,
+    OperationType,
+    SelectionSetNode,
+    is_non_null_type,
+    located_error,
+)
+from graphql.execution.collect_fields import (
+    does_fragment_condition_match,
+    get_field_entry_key,
+    should_include_node,
+)
+from graphql.execution.values import get_directive_values
+from graphql.pyutils import Path
+from sqlalchemy.orm import Query, joinedload
+
+from app.db.database import Session
+from app.db.models import Note, User
+from app.utils.env import getenv
+
+STREAM_BATCH_SIZE = int(getenv("STREAM_BATCH_SIZE", 100))
+
+GraphQLDeferDirective = GraphQLDirective(
+    name="defer",
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+    },
+    description="Delivers the fragment after the rest of the response.",
+)
+
+GraphQLStreamDirective = GraphQLDirective(
+    name="stream",
+    locations=[DirectiveLocation.FIELD],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+        "initialCount": GraphQLArgument(GraphQLInt, default_value=0),
+    },
+    description="Delivers the items of a list after the rest of the response.",
+)
+
+MULTIPART_BOUNDARY = "-"
+MULTIPART_CONTENT_TYPE = f'multipart/mixed; boundary="{MULTIPART_BOUNDARY}"'
+
+# Marks a stream record whose next item has not been read from its iterator yet
+_NO_ITEM = object()
+
+
+class DeferRecord(NamedTuple):
+    parent_type: GraphQLObjectType
+    source: Any
+    path: Optional[Path]
+    selection_set: SelectionSetNode
+    label: Optional[str]
+
+
+class StreamRecord(NamedTuple):
+    iterator: Iterator[Any]
+    next_index: int
+    item_type: GraphQLOutputType
+    field_nodes: List[FieldNode]
+    info: GraphQLResolveInfo
+    path: Path
+    label: Optional[str]
+    head: Any = _NO_ITEM
+
+
+class IncrementalExecutionContext(ExecutionContext):
+    """
+    Execution context implementing the @defer and @stream directives.
+
+    Fragments marked with @defer are left out of the selection they belong to and the
+    remaining items of lists marked with @stream are left uncompleted. Both are recorded
+    as pending work, which execute_incrementally delivers as subsequent payloads.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending: List[Any] = []
+
+    @property
+    def errors(self) -> List[GraphQLError]:
+        return self.collected_errors.errors
+
+    def execute_operation(self, operation, root_value):
+        root_type = self.schema.get_root_type(operation.operation)
+
+        if root_type is None or operation.operation != OperationType.QUERY:
+            return super().execute_operation(operation, root_value)
+
+        fields = self.collect_deferrable_fields(
+            root_type, operation.selection_set, root_value, None
+        )
+
+        return self.execute_fields(root_type, root_value, None, fields)
+
+    def complete_object_value(self, return_type, field_nodes, info, path, result):
+        if return_type.is_type_of and not return_type.is_type_of(result, info):
+            return super().complete_object_value(
+                return_type, field_nodes, info, path, result
+            )
+
+        fields: Dict[str, List[FieldNode]] = {}
+        for node in field_nodes:
+            if node.selection_set:
+                self.collect_deferrable_fields(
+                    return_type, node.selection_set, result, path, fields
+                )
+
+        return self.execute_fields(return_type, result, path, fields)
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        stream = get_directive_values(
+            GraphQLStreamDirective, field_nodes[0], self.variable_values
+        )
+
+        if not stream or not stream["if"] or not isinstance(result, Iterable):
+            return super().complete_list_value(
+                return_type, field_nodes, info, path, result
+            )
+
+        iterator = iter(result)
+        initial_count = stream["initialCount"]
+        initial_items = list(islice(iterator, initial_count))
+
+        self.pending.append(
+            StreamRecord(
+                iterator,
+                initial_count,
+                return_type.of_type,
+                field_nodes,
+                info,
+                path,
+                stream.get("label"),
+            )
+        )
+
+        return super().complete_list_value(
+            return_type, field_nodes, info, path, initial_items
+        )
+
+    def collect_deferrable_fields(
+        self,
+        runtime_type: GraphQLObjectType,
+        selection_set: SelectionSetNode,
+        source: Any,
+        path: Optional[Path],
+        fields: Optional[Dict[str, List[FieldNode]]] = None,
+        visited_fragment_names: Optional[set] = None,
+    ) -> Dict[str, List[FieldNode]]:
+        """
+        Collects the fields of a selection set, recording fragments marked with @defer as pending.
+        """
+        fields = {} if fields is None else fields
+        visited_fragment_names = (
+            set() if visited_fragment_names is None else visited_fragment_names
+        )
+
+        for selection in selection_set.selections:
+            if not should_include_node(self.variable_values, selection):
+                continue
+
+            if isinstance(selection, FieldNode):
+                fields.setdefault(get_field_entry_key(selection), []).append(selection)
+                continue
+
+            if isinstance(selection, FragmentSpreadNode):
+                if selection.name.value in visited_fragment_names:
+                    continue
+                visited_fragment_names.add(selection.name.value)
+                fragment = self.fragments.get(selection.name.value)
+            else:
+                fragment = selection
+
+            if fragment is None or not does_fragment_condition_match(
+                self.schema, fragment, runtime_type
+            ):
+                continue
+
+            defer = get_directive_values(
+                GraphQLDeferDirective, selection, self.variable_values
+            )
+
+            if defer and defer["if"]:
+                self.pending.append(
+                    DeferRecord(
+                        runtime_type,
+                        source,
+                        path,
+                        fragment.selection_set,
+                        defer.get("label"),
+                    )
+                )
+                continue
+
+            self.collect_deferrable_fields(
+                runtime_type,
+                fragment.selection_set,
+                source,
+                path,
+                fields,
+                visited_fragment_names,
+            )
+
+        return fields
+
+    def execute_pending(self, record: Any) -> Dict[str, Any]:
+        """
+        Executes a piece of pending work and returns its incremental result.
+
+        A stream record completes at most STREAM_BATCH_SIZE items and is re-queued if the
+        list has more items; the item following the batch is read ahead, so a list ending
+        exactly at a batch boundary is not followed by an empty payload. Errors raised while
+        executing a deferred fragment or reading the streamed list are reported in the
+        payload's errors instead of ending the response.
+        """
+        errors_before = len(self.errors)
+
+        if isinstance(record, DeferRecord):
+            path = record.path.as_list() if record.path else []
+            try:
+                fields = self.collect_deferrable_fields(
+                    record.parent_type,
+                    record.selection_set,
+                    record.source,
+                    record.path,
+                )
+                data = self.execute_fields(
+                    record.parent_type, record.source, record.path, fields
+                )
+            except Exception as raw_error:
+                self.collected_errors.add(
+                    located_error(raw_error, None, path), record.path
+                )
+                data = None
+
+            incremental = {"data": data, "path": path}
+        else:
+            items = []
+            index = record.next_index
+            following = _NO_ITEM
+
+            if record.head is _NO_ITEM:
+                batch = islice(record.iterator, STREAM_BATCH_SIZE)
+            else:
+                batch = chain(
+                    (record.head,), islice(record.iterator, STREAM_BATCH_SIZE - 1)
+                )
+
+            try:
+                for item in batch:
+                    item_path = record.path.add_key(index, None)
+                    try:
+                        items.append(
+                            self.complete_value(
+                                record.item_type,
+                                record.field_nodes,
+                                record.info,
+                                item_path,
+                                item,
+                            )
+                        )
+                    except Exception as raw_error:
+                        error = located_error(
+                            raw_error, record.field_nodes, item_path.as_list()
+                        )
+                        self.collected_errors.add(error, item_path)
+                        if is_non_null_type(record.item_type):
+                            # A null cannot be inserted into the list, so the stream ends
+                            items = None
+                            break
+                        items.append(None)
+                    index += 1
+
+                if items is not None and len(items) == STREAM_BATCH_SIZE:
+                    following = next(record.iterator, _NO_ITEM)
+            except Exception as raw_error:
+                # Reading the list failed, e.g. the database connection was lost
+                self.collected_errors.add(
+                    located_error(raw_error, record.field_nodes, record.path.as_list()),
+                    record.path,
+                )
+
+            if following is not _NO_ITEM:
+                self.pending.append(record._replace(next_index=index, head=following))
+            else:
+                close_iterator(record.iterator)
+
+            incremental = {
+                "items": items,
+                "path": record.path.add_key(record.next_index, None).as_list(),
+            }
+
+        if record.label is not None:
+            incremental["label"] = record.label
+
+        errors = self.errors[errors_before:]
+        if errors:
+            incremental["errors"] = [error.formatted for error in errors]
+
+        return incremental
+
+
+def execute_incrementally(
+    schema: GraphQLSchema,
+    document: DocumentNode,
+    root_value: Any = None,
+    context_value: Any = None,
+    variable_values: Optional[Dict[str, Any]] = None,
+    operation_name: Optional[str] = None,
+    middleware: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Executes a validated query and yields its initial and subsequent payloads.
+
+    The first payload holds the data without deferred fragments and streamed items,
+    every following payload holds one incremental result. The last payload has hasNext
+    set to False. Resolvers have to be synchronous.
+
+    Args:
+        schema (GraphQLSchema): The executable schema.
+        document (DocumentNode): The parsed and validated request document.
+        root_value (Any, optional): The root value of the operation.
+        context_value (Any, optional): The context passed to resolvers.
+        variable_values (Dict[str, Any], optional): The operation's variables.
+        operation_name (str, optional): The name of the operation to execute.
+        middleware (Any, optional): The graphql-core middleware.
+
+    Yields:
+        Dict[str, Any]: The payloads of the incremental response.
+    """
+    context = IncrementalExecutionContext.build(
+        schema,
+        document,
+        root_value,
+        context_value,
+        variable_values,
+        operation_name,
+        middleware=middleware,
+    )
+
+    if isinstance(context, list):
+        yield {"data": None, "errors": [error.formatted for error in context]}
+        return
+
+    try:
+        data = context.execute_operation(context.operation, root_value)
+        if isawaitable(data):
+            raise GraphQLError("Incremental delivery requires synchronous resolvers")
+    except GraphQLError as error:
+        context.collected_errors.add(error, None)
+        data = None
+
+    initial: Dict[str, Any] = {"data": data}
+    if context.errors:
+        initial["errors"] = [error.formatted for error in context.errors]
+    initial["hasNext"] = data is not None and bool(context.pending)
+    yield initial
+
+    if data is None:
+        return
+
+    try:
+        while context.pending:
+            incremental = context.execute_pending(context.pending.pop(0))
+            yield {"incremental": [incremental], "hasNext": bool(context.pending)}
+    finally:
+        # Streams left unfinished, e.g. because the client disconnected, release
+        # their cursors right away
+        for record in context.pending:
+            if isinstance(record, StreamRecord):
+                close_iterator(record.iterator)
+
+
+def close_iterator(iterator: Iterator[Any]) -> None:
+    """
+    Closes an iterator if it is a generator, releasing the resources it holds.
+
+    Args:
+        iterator (Iterator[Any]): The iterator.
+    """
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+def uses_incremental_delivery(query: str) -> bool:
+    """
+    Cheaply checks if a query may use the @defer or @stream directives.
+
+    Args:
+        query (str): The query text.
+
+    Returns:
+        bool: True if the query mentions one of the directives.
+    """
+    return "@defer" in query or "@stream" in query
+
+
+def encode_multipart(payloads: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Frames serialized payloads as the parts of a multipart/mixed response.
+
+    Args:
+        payloads (Iterable[bytes]): The serialized JSON payloads.
+
+    Yields:
+        bytes: The chunks of the response body.
+    """
+    delimiter = f"\r\n--{MULTIPART_BOUNDARY}".encode()
+    headers = b"\r\nContent-Type: application/json; charset=utf-8\r\n\r\n"
+
+    for payload in payloads:
+        yield delimiter + headers + payload
+
+    yield delimiter + b"--\r\n"
+
+
+def is_streamed(info: GraphQLResolveInfo) -> bool:
+    """
+    Checks if the list resolved by a resolver is delivered with @stream.
+
+    Args:
+        info (GraphQLResolveInfo): The resolve info of the list field.
+
+    Returns:
+        bool: True if the field has an active @stream directive and the request is incremental.
+    """
+    context = info.context
+    if not isinstance(context, dict) or not context.get("incremental"):
+        return False
+
+    stream = get_directive_values(
+        GraphQLStreamDirective, info.field_nodes[0], info.variable_values
+    )
+    return bool(stream and stream["if"])
+
+
+def stream_rows(info: GraphQLResolveInfo, query: Query) -> Iterable[Note]:
+    """
+    Returns the notes selected by a query, streaming them from a server-side cursor if the field is streamed.
+
+    Streamed notes are fetched in batches of STREAM_BATCH_SIZE rows, with a session of their
+    own that is closed, releasing the cursor and its connection, as soon as the iterator is
+    exhausted or closed. The owner's notes collection is not eagerly loaded for them,
+    because joined collections cannot be combined with a server-side cursor.
+
+    Args:
+        info (GraphQLResolveInfo): The resolve info of the list field.
+        query (Query): The notes query.
+
+    Returns:
+        Iterable[Note]: A list of notes, or an iterator over the cursor if the field is streamed.
+    """
+    if not is_streamed(info):
+        return query.all()
+
+    return _stream_query(query)
+
+
+def _stream_query(query: Query) -> Iterator[Note]:
+    with Session() as session:
+        yield from (
+            query.with_session(session)
+            .options(joinedload(Note.owner).lazyload(User.notes))
+            .execution_options(stream_results=True)
+            .yield_per(STREAM_BATCH_SIZE)
+        )
@@ -0,0 +1,307 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from graphene.utils.str_converters import to_snake_case
+from graphql import FieldNode, FragmentSpreadNode, GraphQLResolveInfo, SelectionSetNode
+from sqlalchemy import null, select
+
+from app.db.database import Session
+from app.db.models import Note, User
+from app.gql.incremental import STREAM_BATCH_SIZE, is_streamed
+
+# A requested selection: snake_case field names mapped to their own selections
+Selection = Dict[str, "Selection"]
+
+
+class UserRow(NamedTuple):
+    """
+    Read-only projection of a user, without the password hash.
+    """
+
+    id: int
+    username: Optional[str] = None
+    email: Optional[str] = None
+    is_admin: Optional[bool] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+    notes: Tuple["NoteRow", ...] = ()
+
+
+class NoteRow(NamedTuple):
+    """
+    Read-only projection of a note.
+    """
+
+    id: int
+    owner_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    done: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    owner: Optional[UserRow] = None
+
+
+USER_COLUMNS = UserRow._fields[:-1]
+NOTE_COLUMNS = NoteRow._fields[:-1]
+
+
+def get_selection(info: GraphQLResolveInfo) -> Selection:
+    """
+    Returns the fields requested below the field being resolved.
+
+    Fragments are expanded regardless of their directives, so the selection may contain
+    more fields than are finally executed but never fewer.
+
+    Args:
+        info (GraphQLResolveInfo): The resolve info of the field.
+
+    Returns:
+        Selection: The requested fields by their snake_case name.
+    """
+    selection: Selection = {}
+
+    for node in info.field_nodes:
+        _collect(node.selection_set, info.fragments, selection)
+
+    return selection
+
+
+def _collect(
+    selection_set: Optional[SelectionSetNode],
+    fragments: Dict[str, Any],
+    into: Selection,
+) -> None:
+    if selection_set is None:
+        return
+
+    for node in selection_set.selections:
+        if isinstance(node, FieldNode):
+            _collect(
+                node.selection_set,
+                fragments,
+                into.setdefault(to_snake_case(node.name.value), {}),
+            )
+        elif isinstance(node, FragmentSpreadNode):
+            fragment = fragments.get(node.name.value)
+            if fragment is not None:
+                _collect(fragment.selection_set, fragments, into)
+        else:
+            _collect(node.selection_set, fragments, into)
+
+
+def _is_projectable(selection: Selection, columns: Tuple[str, ...]) -> bool:
+    return all(
+        name in columns or name == "__typename" for name in selection.keys()
+    ) and not any(selection[name] for name in columns if name in selection)
+
+
+def _columns(model, columns: Tuple[str, ...], selection: Selection, required=()):
+    # Columns that are not requested are selected as NULL, so every row lines up
+    # with the fields of its projection and can be passed to it positionally
+    return [
+        getattr(model, name)
+        if name in selection or name in required
+        else null().label(name)
+        for name in columns
+    ]
+
+
+def project_notes(
+    info: GraphQLResolveInfo, *criteria: Any
+) -> Optional[Iterable[NoteRow]]:
+    """
+    Selects the notes matching the criteria as NoteRow tuples holding only the requested columns.
+
+    If the field is streamed with @stream, the rows are read from the cursor in
+    STREAM_BATCH_SIZE batches.
+
+    Args:
+        info (GraphQLResolveInfo): The resolve info of the notes field.
+        *criteria (Any): The WHERE criteria of the notes.
+
+    Returns:
+        Iterable[NoteRow], optional: The notes or None if the selection cannot be projected
+            and the ORM has to be used.
+    """
+    return select_notes(get_selection(info), *criteria, stream=is_streamed(info))
+
+
+def project_users(info: GraphQLResolveInfo, *criteria: Any) -> Optional[List[UserRow]]:
+    """
+    Selects the users matching the criteria as UserRow tuples holding only the requested columns.
+
+    Args:
+        info (GraphQLResolveInfo): The resolve info of the users field.
+        *criteria (Any): The WHERE criteria of the users.
+
+    Returns:
+        List[UserRow], optional: The users or None if the selection cannot be projected
+            and the ORM has to be used.
+    """
+    return select_users(get_selection(info), *criteria)
+
+
+def select_notes(
+    selection: Selection, *criteria: Any, stream: bool = False
+) -> Optional[Iterable[NoteRow]]:
+    """
+    Selects the requested columns of the notes matching the criteria.
+
+    The owner is selected with the same query when it is requested; notes without an owner
+    are kept, with None as their owner.
+
+    Args:
+        selection (Selection): The requested fields of the notes.
+        *criteria (Any): The WHERE criteria of the notes.
+        stream (bool): Whether to return an iterator reading the rows from the cursor in batches.
+
+    Returns:
+        Iterable[NoteRow], optional: The notes or None if the selection reaches further than
+            the owner's columns.
+    """
+    selection = dict(selection)
+    owner_selection = selection.pop("owner", None)
+
+    if not _is_projectable(selection, NOTE_COLUMNS):
+        return None
+    if owner_selection is not None and not _is_projectable(
+        owner_selection, USER_COLUMNS
+    ):
+        return None
+
+    columns = _columns(Note, NOTE_COLUMNS, selection, required=("id", "owner_id"))
+
+    if owner_selection is None:
+        statement = select(*columns).where(*criteria)
+    else:
+        columns += _columns(User, USER_COLUMNS, owner_selection, required=("id",))
+        statement = select(*columns).outerjoin(Note.owner).where(*criteria)
+
+    def make_notes(rows: Iterable[Any]) -> Iterator[NoteRow]:
+        if owner_selection is None:
+            for row in rows:
+                yield NoteRow(*row)
+            return
+
+        owners: Dict[int, UserRow] = {}
+        width = len(NOTE_COLUMNS)
+
+        for row in rows:
+            if row[width] is None:
+                yield NoteRow(*row[:width])
+                continue
+
+            owner = owners.get(row[width])
+            if owner is None:
+                owner = owners[row[width]] = UserRow(*row[width:])
+            yield NoteRow(*row[:width], owner)
+
+    if stream:
+        return _stream(statement, make_notes)
+
+    with Session() as session:
+        return list(make_notes(session.execute(statement)))
+
+
+def select_users(selection: Selection, *criteria: Any) -> Optional[List[UserRow]]:
+    """
+    Selects the requested columns of the users matching the criteria.
+
+    Their notes are selected with one additional query when they are requested.
+
+    Args:
+        selection (Selection): The requested fields of the users.
+        *criteria (Any): The WHERE criteria of the users.
+
+    Returns:
+        List[UserRow], optional: The users or None if the selection reaches further than
+            the notes' columns.
+    """
+    selection = dict(selection)
+    notes_selection = selection.pop("notes", None)
+
+    if not _is_projectable(selection, USER_COLUMNS):
+        return None
+    if notes_selection is not None and not _is_projectable(
+        notes_selection, NOTE_COLUMNS
+    ):
+        return None
+
+    with Session() as session:
+        users = session.execute(
+            select(*_columns(User, USER_COLUMNS, selection, required=("id",))).where(
+                *criteria
+            )
+        ).all()
+
+        if notes_selection is None or not users:
+            return [UserRow(*user) for user in users]
+
+        notes: Dict[int, List[NoteRow]] = {}
+        note_rows = session.execute(
+            select(
+                *_columns(
+                    Note, NOTE_COLUMNS, notes_selection, required=("id", "owner_id")
+                )
+            )
+            .where(Note.owner_id.in_(select(User.id).where(*criteria)))
+            .order_by(Note.id)
+        )
+        for row in note_rows:
+            note = NoteRow(*row)
+            notes.setdefault(note.owner_id, []).append(note)
+
+    return [UserRow(*user, tuple(notes.get(user.id, ()))) for user in users]
+
+
+def to_rows(value: Any, selection: Selection) -> Any:
+    """
+    Copies users and notes into UserRow and NoteRow tuples holding the selected fields.
+
+    Relationships are copied as deep as they are selected, so the rows can be served without
+    the session the ORM objects were loaded with. Rows and other values are returned as is.
+
+    Args:
+        value (Any): A user, a note, a list of them or a result that is already projected.
+        selection (Selection): The requested fields of the users or notes.
+
+    Returns:
+        Any: The detached rows.
+    """
+    if isinstance(value, User):
+        notes = selection.get("notes")
+        return UserRow(
+            *_values(value, USER_COLUMNS, selection, required=("id",)),
+            tuple(to_rows(list(value.notes), notes)) if notes is not None else (),
+        )
+    if isinstance(value, Note):
+        owner = selection.get("owner")
+        return NoteRow(
+            *_values(value, NOTE_COLUMNS, selection, required=("id", "owner_id")),
+            to_rows(value.owner, owner) if owner is not None else None,
+        )
+    if isinstance(value, list):
+        return [to_rows(item, selection) for item in value]
+
+    return value
+
+
+def _values(obj, columns: Tuple[str, ...], selection: Selection, required=()):
+    return [
+        getattr(obj, name) if name in selection or name in required else None
+        for name in columns
+    ]
+
+
+def _stream(statement, make_rows) -> Iterator[Any]:
+    # The session stays open while the response is streamed and is closed when the
+    # iterator is exhausted or discarded
+    with Session() as session:
+        result = session.execute(
+            statement.execution_options(
+                stream_results=True, yield_per=STREAM_BATCH_SIZE
+            )
+        )
+        yield from make_rows(result)
@@ -4,9 +4,20 @@ from typing import Optional
 from graphene import ObjectType, Field, Int, List
 from graphql import GraphQLError
 
-from app.db.database import Session
+from app.db.database import Session, get_database_stats
+from app.db.slow_queries import slow_query_log
 from app.db.models import User, Note
-from app.gql.types import UserObject, NoteObject
+from app.gql.cache_control import cache_hint
+from app.gql.incremental import stream_rows
+from app.gql.projections import project_notes, project_users
+from app.gql.types import (
+    UserObject,
+    NoteObject,
+    CacheStatsObject,
+    DatabaseStatsObject,
+    SlowQueryObject,
+)
+from app.utils.cache import cached_resolver, get_cache_stats, user_tags
 from app.utils.decorators import admin_user, logged_in
 from app.utils.user import get_authenticated_user
 
@@ -19,13 +30,23 @@ class Query(ObjectType):
     get_all_user_notes = List(NoteObject, user_id=Int(required=True))
     get_note = Field(NoteObject, user_id=Int(required=True), note_id=Int(required=True))
 
+    get_cache_stats = Field(CacheStatsObject)
+    get_database_stats = Field(DatabaseStatsObject)
+    get_slow_queries = List(SlowQueryObject, limit=Int())
+
     @staticmethod
     @admin_user
     def resolve_get_users(root, info) -> Optional[typing.List[UserObject]]:
+        users = project_users(info)
+        if users is not None:
+            return users
+
         return Session().query(User).all()
 
     @staticmethod
+    @cache_hint(max_age=30)
     @logged_in
+    @cached_resolver(tags=user_tags)
     def resolve_get_user(root, info, user_id: int) -> Optional[UserObject]:
         user = get_authenticated_user(info.context)[0]
         if not user or (user.is_admin is not True and user.id != user_id):
@@ -33,15 +54,25 @@ class Query(ObjectType):
                 "Cannot authenticate user or you cannot query other users"
             )
 
+        users = project_users(info, User.id == user_id)
+        if users is not None:
+            return users[0] if users else None
+
         return Session().query(User).filter_by(id=user_id).first()
 
     @staticmethod
     @admin_user
     def resolve_get_all_notes(root, info) -> Optional[typing.List[NoteObject]]:
-        return Session().query(Note).all()
+        notes = project_notes(info)
+        if notes is not None:
+            return notes
+
+        return stream_rows(info, Session().query(Note))
 
     @staticmethod
+    @cache_hint(max_age=5)
     @logged_in
+    @cached_resolver(tags=user_tags)
     def resolve_get_all_user_notes(
         root, info, user_id: int
     ) -> Optional[typing.List[NoteObject]]:
@@ -51,10 +82,16 @@ class Query(ObjectType):
                 "Cannot authenticate user or you cannot query other users' notes"
             )
 
-        return Session().query(Note).filter_by(owner_id=user_id).all()
+        notes = project_notes(info, Note.owner_id == user_id)
+        if notes is not None:
+            return notes
+
+        return stream_rows(info, Session().query(Note).filter_by(owner_id=user_id))
 
     @staticmethod
+    @cache_hint(max_age=5)
     @logged_in
+    @cached_resolver(tags=lambda user_id, note_id: user_tags(user_id))
     def resolve_get_note(
         root, info, user_id: int, note_id: int
     ) -> Optional[NoteObject]:
@@ -64,4 +101,25 @@ class Query(ObjectType):
                 "Cannot authenticate user or you cannot query other users' notes"
             )
 
+        notes = project_notes(info, Note.owner_id == user_id, Note.id == note_id)
+        if notes is not None:
+            return notes[0] if notes else None
+
         return Session().query(Note).filter_by(owner_id=user_id, id=note_id).first()
+
+    @staticmethod
+    @admin_user
+    def resolve_get_cache_stats(root, info) -> Optional[CacheStatsObject]:
+        return get_cache_stats()
+
+    @staticmethod
+    @admin_user
+    def resolve_get_database_stats(root, info) -> Optional[DatabaseStatsObject]:
+        return get_database_stats()
+
+    @staticmethod
+    @admin_user
+    def resolve_get_slow_queries(
+        root, info, limit: Optional[int] = None
+    ) -> typing.List[SlowQueryObject]:
+        return slow_query_log.entries(limit)
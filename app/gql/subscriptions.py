@@ -0,0 +1,22 @@
+from graphene import ObjectType, Field, Int
+from graphql import GraphQLError
+
+from app.gql.types import NoteChangedObject
+from app.utils.decorators import logged_in
+from app.utils.pubsub import Subscription as BrokerSubscription, broker, note_channel
+from app.utils.user import get_authenticated_user
+
+
+class Subscription(ObjectType):
+    note_changed = Field(NoteChangedObject, user_id=Int(required=True))
+
+    @staticmethod
+    @logged_in
+    def subscribe_note_changed(root, info, user_id: int) -> BrokerSubscription:
+        user = get_authenticated_user(info.context)[0]
+        if not user or (user.is_admin is not True and user.id != user_id):
+            raise GraphQLError(
+                "Cannot authenticate user or you cannot subscribe to other users' notes"
+            )
+
+        return broker.subscribe(note_channel(user_id))
@@ -1,4 +1,9 @@
-from graphene import ObjectType, Int, String, Boolean, DateTime, Field, List
+from graphene import ObjectType, Int, String, Boolean, DateTime, Field, List, Float
+from sqlalchemy import inspect
+
+from app.db.models import Note
+from app.gql.incremental import is_streamed, stream_rows
+from app.utils.last_login import last_login_buffer
 
 
 class UserObject(ObjectType):
@@ -12,8 +17,20 @@ class UserObject(ObjectType):
 
     notes = List(lambda: NoteObject)
 
+    @staticmethod
+    def resolve_last_login(root, info):
+        # A login not written by the write-behind buffer yet is newer than the stored one
+        return last_login_buffer.get(root.id) or root.last_login
+
     @staticmethod
     def resolve_notes(root, info):
+        state = inspect(root, raiseerr=False)
+
+        if is_streamed(info) and state and state.session and "notes" in state.unloaded:
+            return stream_rows(
+                info, state.session.query(Note).filter_by(owner_id=root.id)
+            )
+
         return root.notes
 
 
@@ -31,3 +48,42 @@ class NoteObject(ObjectType):
     @staticmethod
     def resolve_owner(root, info):
         return root.owner
+
+
+class NoteChangedObject(ObjectType):
+    action = String()
+    note = Field(NoteObject)
+
+
+class CacheStatsObject(ObjectType):
+    hits = Int()
+    misses = Int()
+    hit_rate = Float()
+    entries = Int()
+    bytes = Int()
+    max_bytes = Int()
+    evictions = Int()
+    invalidations = Int()
+    invalidated_entries = Int()
+    invalidation_fan_out = Float()
+
+
+class DatabaseStatsObject(ObjectType):
+    mode = String()
+    pool = String()
+    connects = Int()
+    failures = Int()
+    retries = Int()
+    total_connect_ms = Float()
+    avg_connect_ms = Float()
+    max_connect_ms = Float()
+    last_connect_ms = Float()
+
+
+class SlowQueryObject(ObjectType):
+    statement = String()
+    parameters = String()
+    operation = String()
+    duration_ms = Float()
+    executed_at = DateTime()
+    plan = String()
@@ -1,11 +1,41 @@
 from fastapi import FastAPI
 from graphene import Schema
+from graphql import specified_directives
 from starlette.middleware.cors import CORSMiddleware
-from starlette_graphene3 import GraphQLApp, make_playground_handler
+from starlette_graphene3 import make_playground_handler
 
+from app.gql.admission import ADMISSION_ENABLED, AdmissionControl
+from app.gql.app import TodoGraphQLApp
+from app.gql.incremental import GraphQLDeferDirective, GraphQLStreamDirective
 from app.gql.mutations import Mutation
 from app.gql.queries import Query
-from app.utils.database import create_database
+from app.gql.subscriptions import Subscription
+from app.utils.bulk_import import router as import_router
+from app.utils.compression import CompressionMiddleware
+from app.utils.database import create_database, ensure_database
+from app.utils.env import getenv
+from app.utils.export import router as export_router
+from app.utils.last_login import last_login_buffer
+from app.utils.memory import router as memory_router
+from app.utils.memory import start_allocation_tracing
+from app.utils.metrics import (
+    METRICS_ENABLED,
+    SQL_N_PLUS_ONE_THRESHOLD,
+    install_sql_metrics,
+    instrument_resolvers,
+)
+from app.utils.metrics_router import router as metrics_router
+from app.utils.profiler import router as profiler_router
+from app.utils.tracing import (
+    TRACING_ENABLED,
+    configure_tracing,
+    install_sql_tracing,
+    shutdown_tracing,
+    trace_resolvers,
+)
+
+STARTUP_MODE = getenv("STARTUP_MODE", "development").lower()
+DB_SCHEMA_CHECK = getenv("DB_SCHEMA_CHECK", "true").lower() == "true"
 
 app = FastAPI()
 
@@ -16,13 +46,65 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+schema = Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    directives=(*specified_directives, GraphQLDeferDirective, GraphQLStreamDirective),
+)
+
+
+@app.on_event("startup")
+def prepare_database() -> None:
+    """
+    Prepares the database for the configured STARTUP_MODE.
+
+    In development the schema is recreated and the default admin seeded on every start.
+    In production nothing is dropped: the schema is only checked and missing tables are
+    created (unless DB_SCHEMA_CHECK is disabled, in which case the first connection is
+    deferred until the first request).
+    """
+    if STARTUP_MODE != "production":
+        create_database()
+        return
+
+    if DB_SCHEMA_CHECK:
+        ensure_database()
+
+
+@app.on_event("shutdown")
+def flush_last_logins() -> None:
+    """
+    Writes the last logins still buffered in memory before the process exits.
+    """
+    last_login_buffer.stop()
+
 
-schema = Schema(query=Query, mutation=Mutation)
+@app.on_event("shutdown")
+def flush_spans() -> None:
+    """
+    Exports the spans still queued in memory before the process exits.
+    """
+    shutdown_tracing()
 
 
-@app.on_event("startup")  # TODO: Remove that on production
-def test() -> None:
-    create_database()
+if METRICS_ENABLED or SQL_N_PLUS_ONE_THRESHOLD > 0:
+    install_sql_metrics()
+if METRICS_ENABLED:
+    instrument_resolvers(schema.graphql_schema)
+if TRACING_ENABLED:
+    configure_tracing()
+    install_sql_tracing()
+    trace_resolvers(schema.graphql_schema)
+start_allocation_tracing()
 
+app.include_router(export_router)
+app.include_router(import_router)
+app.include_router(metrics_router)
+app.include_router(profiler_router)
+app.include_router(memory_router)
 
-app.mount("/", GraphQLApp(schema=schema, on_get=make_playground_handler()))
+graphql_app = TodoGraphQLApp(schema=schema, on_get=make_playground_handler())
+app.mount("/", AdmissionControl(graphql_app) if ADMISSION_ENABLED else graphql_app)
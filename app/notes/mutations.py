@@ -7,7 +7,10 @@ from graphql import GraphQLError
 from app.db.database import Session
 from app.db.models import Note
 from app.gql.types import NoteObject
+from app.utils.cache import invalidate_user_notes
 from app.utils.decorators import logged_in
+from app.utils.idempotency import idempotent
+from app.utils.pubsub import broker, note_channel
 from app.utils.user import get_authenticated_user
 
 
@@ -19,6 +22,7 @@ class CreateNote(Mutation):
         title (String): A string representing the title of the note (required).
         description (String): A string representing the description of the note (optional).
         done (Boolean): A boolean representing the completion status of the note (optional).
+        idempotency_key (String): A key making retries return the first result instead of running again (optional).
         note (Field): A field that holds the NoteObject.
 
     Methods:
@@ -29,11 +33,13 @@ class CreateNote(Mutation):
         title = String(required=True)
         description = String()
         done = Boolean()
+        idempotency_key = String()
 
     note = Field(NoteObject)
 
     @staticmethod
     @logged_in
+    @idempotent
     def mutate(
         root, info, title: str, description: Optional[str] = None, done: bool = False
     ) -> Type["CreateNote"]:
@@ -69,6 +75,9 @@ class CreateNote(Mutation):
         session.refresh(note)
         session.close()
 
+        invalidate_user_notes(note.owner_id)
+        broker.publish(note_channel(note.owner_id), {"action": "CREATED", "note": note})
+
         return CreateNote(note=note)
 
 
@@ -81,6 +90,7 @@ class EditNote(Mutation):
         title (String): A string representing the title of the note (optional).
         description (String): A string representing the description of the note (optional).
         done (Boolean): A boolean representing the completion status of the note (optional).
+        idempotency_key (String): A key making retries return the first result instead of running again (optional).
         note (Field): A field that holds the NoteObject.
 
     Methods:
@@ -92,11 +102,13 @@ class EditNote(Mutation):
         title = String()
         description = String()
         done = Boolean()
+        idempotency_key = String()
 
     note = Field(NoteObject)
 
     @staticmethod
     @logged_in
+    @idempotent
     def mutate(
         root,
         info,
@@ -152,6 +164,9 @@ class EditNote(Mutation):
         session.refresh(note)
         session.close()
 
+        invalidate_user_notes(note.owner_id)
+        broker.publish(note_channel(note.owner_id), {"action": "UPDATED", "note": note})
+
         return EditNote(note=note)
 
 
@@ -161,6 +176,7 @@ class DeleteNote(Mutation):
 
     Attributes:
         note_id (Int): An integer representing the ID of the note (required).
+        idempotency_key (String): A key making retries return the first result instead of running again (optional).
         success (Field): A field that holds a boolean value indicating whether the deletion was successful.
 
     Methods:
@@ -169,11 +185,13 @@ class DeleteNote(Mutation):
 
     class Arguments:
         note_id = Int(required=True)
+        idempotency_key = String()
 
     success = Field(Boolean)
 
     @staticmethod
     @logged_in
+    @idempotent
     def mutate(root, info, note_id: int) -> Type["DeleteNote"]:
         """
         Deletes an existing note with the given note_id.
@@ -206,8 +224,13 @@ class DeleteNote(Mutation):
         if note.owner_id != user.id and user.is_admin is False:
             raise GraphQLError("You're not authorized to perform this action")
 
+        owner_id = note.owner_id
+
         session.delete(note)
         session.commit()
         session.close()
 
+        invalidate_user_notes(owner_id)
+        broker.publish(note_channel(owner_id), {"action": "DELETED", "note": note})
+
         return DeleteNote(success=True)
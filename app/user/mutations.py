@@ -1,4 +1,3 @@
-from datetime import datetime
 from typing import Type, Optional
 
 from graphene import Mutation, String, Field, Int
@@ -7,10 +6,18 @@ from graphql import GraphQLError
 from app.db.database import Session
 from app.db.models import User
 from app.gql.types import UserObject
+from app.utils.cache import invalidate_user
 from app.utils.decorators import logged_in
 from app.utils.email import is_valid_email
+from app.utils.idempotency import idempotent
 from app.utils.jwt import generate_jwt, regenerate_jwt
+from app.utils.last_login import last_login_buffer
 from app.utils.password import is_password_safe, hash_password, verify_password
+from app.utils.rate_limit import (
+    login_limiter,
+    password_change_limiter,
+    register_limiter,
+)
 from app.utils.user import get_authenticated_user
 
 
@@ -22,6 +29,8 @@ class RegisterUser(Mutation):
         username (String): The username of the new user.
         email (String): The email of the new user.
         password (String): The password of the new user.
+        idempotency_key (String): A key making retries return the first result instead of
+            registering again.
         user (Field): The newly created user object.
     """
 
@@ -29,10 +38,12 @@ class RegisterUser(Mutation):
         username = String(required=True)
         email = String(required=True)
         password = String(required=True)
+        idempotency_key = String()
 
     user = Field(UserObject)
 
     @staticmethod
+    @idempotent
     def mutate(
         root, info, username: str, email: str, password: str
     ) -> Type["RegisterUser"]:
@@ -50,8 +61,10 @@ class RegisterUser(Mutation):
             RegisterUser: A RegisterUser object with the newly created user.
 
         Raises:
-            GraphQLError: If the username or email already exists.
+            GraphQLError: If the username or email already exists, or if too many users were
+                registered from the client's IP.
         """
+        register_limiter.check(info.context, email)
 
         session = Session()
 
@@ -125,8 +138,11 @@ class LoginUser(Mutation):
             LoginUser: A LoginUser object with the generated JWT token and UserObject.
 
         Raises:
-            GraphQLError: If the email or password is invalid.
+            GraphQLError: If the email or password is invalid, or if there were too many
+                attempts for the email or from the client's IP.
         """
+        login_limiter.check(info.context, email)
+
         session = Session()
         user = session.query(User).filter(User.email == email).first()
 
@@ -142,12 +158,10 @@ class LoginUser(Mutation):
 
         token = generate_jwt(email)
 
-        user.last_login = datetime.now()
-
-        session.commit()
-        session.refresh(user)
         session.close()
 
+        user.last_login = last_login_buffer.record(user.id)
+
         return LoginUser(token=token, user=user)
 
 
@@ -157,11 +171,13 @@ class UpdateUser(Mutation):
         username = String()
         email = String()
         password = String()
+        idempotency_key = String()
 
     user = Field(UserObject)
 
     @staticmethod
     @logged_in
+    @idempotent
     def mutate(
         root,
         info,
@@ -177,6 +193,9 @@ class UpdateUser(Mutation):
         else:
             raise GraphQLError("Cannot authenticate user")
 
+        if password:
+            password_change_limiter.check(info.context, user.email)
+
         session = Session()
 
         if user_id:
@@ -218,6 +237,8 @@ class UpdateUser(Mutation):
                 session.refresh(changed_user)
                 session.close()
 
+                invalidate_user(changed_user.id)
+
                 return UpdateUser(user=changed_user)
 
             elif (user_id != user.id) and user.is_admin is False:
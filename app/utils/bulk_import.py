@@ -0,0 +1,405 @@
+import codecs
+import csv
+import io
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import anyio.from_thread
+from fastapi import APIRouter, HTTPException, Query, Request
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session as OrmSession
+
+from app.db.database import Session
+from app.db.models import ImportCheckpoint, Note, User
+from app.utils.cache import invalidate_user_notes
+from app.utils.env import getenv
+from app.utils.export import require_admin
+
+IMPORT_CHUNK_SIZE = int(getenv("IMPORT_CHUNK_SIZE", 5000))
+IMPORT_MAX_ERRORS = int(getenv("IMPORT_MAX_ERRORS", 100))
+
+NOTE_IMPORT_COLUMNS = ("owner_id", "title", "description", "done", "created_at")
+
+BOOLEANS = {"true": True, "1": True, "false": False, "0": False, "": False}
+
+router = APIRouter(prefix="/import")
+
+
+class InvalidRecord(ValueError):
+    """
+    Raised when a record of an import cannot be turned into a note.
+    """
+
+
+def iterate_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Splits a stream of UTF-8 encoded chunks into lines, keeping their line endings.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks of the upload.
+
+    Yields:
+        str: The lines.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+
+    for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def parse_records(lines: Iterable[str], import_format: str) -> Iterator[Any]:
+    """
+    Parses the records of an NDJSON or CSV upload one by one.
+
+    NDJSON lines that are not valid JSON are yielded as InvalidRecord errors, so they are
+    rejected like any other invalid record instead of aborting the import. Empty NDJSON
+    lines are ignored.
+
+    Args:
+        lines (Iterable[str]): The lines of the upload.
+        import_format (str): "ndjson" or "csv", whose first line is the header.
+
+    Yields:
+        Any: The parsed records or InvalidRecord errors.
+    """
+    if import_format == "csv":
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield InvalidRecord(f"Invalid JSON: {error}")
+
+
+def validate_record(record: Any) -> Dict[str, Any]:
+    """
+    Validates a parsed record and converts it into the values of a note.
+
+    The owner is given either by "owner_id" or by "owner_email" and is resolved later.
+    Values of CSV records are strings, so numbers, booleans and dates are parsed from them.
+
+    Args:
+        record (Any): The parsed record.
+
+    Returns:
+        Dict[str, Any]: The title, description, done, created_at and owner_id or owner_email.
+
+    Raises:
+        InvalidRecord: If the record is not valid.
+    """
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("Record is not an object")
+
+    title = record.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise InvalidRecord("Missing title")
+
+    description = record.get("description") or None
+    if description is not None and not isinstance(description, str):
+        raise InvalidRecord("Description is not a string")
+
+    done = record.get("done") or False
+    if isinstance(done, str):
+        if done.strip().lower() not in BOOLEANS:
+            raise InvalidRecord(f"Invalid done value: {done!r}")
+        done = BOOLEANS[done.strip().lower()]
+    if not isinstance(done, bool):
+        raise InvalidRecord(f"Invalid done value: {done!r}")
+
+    created_at = record.get("created_at") or None
+    if created_at is None:
+        created_at = datetime.now()
+    else:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"Invalid created_at value: {created_at!r}")
+
+    values = {
+        "title": title,
+        "description": description,
+        "done": done,
+        "created_at": created_at,
+    }
+
+    owner_id = record.get("owner_id")
+    owner_email = record.get("owner_email")
+
+    if owner_id not in (None, ""):
+        try:
+            values["owner_id"] = int(owner_id)
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"Invalid owner_id value: {owner_id!r}")
+    elif isinstance(owner_email, str) and owner_email:
+        values["owner_email"] = owner_email
+    else:
+        raise InvalidRecord("Missing owner_id or owner_email")
+
+    return values
+
+
+class OwnerResolver:
+    """
+    Resolves the owners of imported notes in batches, remembering the owners already seen.
+    """
+
+    def __init__(self):
+        self.ids: Set[int] = set()
+        self.emails: Dict[str, int] = {}
+
+    def resolve(self, session: OrmSession, rows: List[Dict[str, Any]]) -> None:
+        """
+        Looks up the owners not seen yet with one query per kind of reference and sets the
+        owner_id of every row whose owner exists.
+
+        Args:
+            session (Session): The session of the import.
+            rows (List[Dict[str, Any]]): The validated rows of a chunk.
+        """
+        ids = {row["owner_id"] for row in rows if "owner_id" in row} - self.ids
+        emails = {row["owner_email"] for row in rows if "owner_email" in row}
+        emails -= self.emails.keys()
+
+        if ids:
+            self.ids.update(session.scalars(select(User.id).where(User.id.in_(ids))))
+        if emails:
+            self.emails.update(
+                session.execute(
+                    select(User.email, User.id).where(User.email.in_(emails))
+                )
+                .tuples()
+                .all()
+            )
+
+        for row in rows:
+            if "owner_email" in row:
+                owner_id = self.emails.get(row.pop("owner_email"))
+                if owner_id is not None:
+                    row["owner_id"] = owner_id
+            elif row["owner_id"] not in self.ids:
+                del row["owner_id"]
+
+
+def load_rows(session: OrmSession, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts the rows of a chunk in the session's transaction.
+
+    On PostgreSQL the rows are sent with COPY, on other databases with a single executemany.
+
+    Args:
+        session (Session): The session of the import.
+        rows (List[Dict[str, Any]]): The values of the notes.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        session.execute(insert(Note), rows)
+        return
+
+    statement = (
+        f"COPY {Note.__table__.name} ({', '.join(NOTE_IMPORT_COLUMNS)}) FROM STDIN"
+    )
+    cursor = session.connection().connection.driver_connection.cursor()
+
+    try:
+        if hasattr(cursor, "copy"):
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in NOTE_IMPORT_COLUMNS])
+        else:
+            # psycopg2
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                [row[column] for column in NOTE_IMPORT_COLUMNS] for row in rows
+            )
+            buffer.seek(0)
+            cursor.copy_expert(f"{statement} WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def import_notes(
+    lines: Iterable[str],
+    import_format: str = "ndjson",
+    import_id: Optional[str] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    Imports notes from the lines of an NDJSON or CSV upload.
+
+    Records are parsed and validated one by one and loaded in chunks of chunk_size records,
+    each in its own transaction committing the import's checkpoint as well. When an import
+    is interrupted, sending the same upload again with the same import_id skips the records
+    of the committed chunks and resumes after them. Invalid records and records whose owner
+    does not exist are rejected without stopping the import.
+
+    Args:
+        lines (Iterable[str]): The lines of the upload.
+        import_format (str): "ndjson" or "csv".
+        import_id (str, optional): The id of the import to be resumed, generated if not given.
+        chunk_size (int): The number of records loaded per transaction.
+
+    Returns:
+        Dict[str, Any]: The import_id, the record the import resumed from, the totals of
+            processed, imported and rejected records, the first IMPORT_MAX_ERRORS errors,
+            and the duration and throughput in rows per second of this run.
+    """
+    started = time.perf_counter()
+    import_id = import_id or uuid.uuid4().hex
+    errors: List[Dict[str, Any]] = []
+    owners = OwnerResolver()
+    imported = 0
+
+    with Session(expire_on_commit=False) as session:
+        checkpoint = session.get(ImportCheckpoint, import_id) or ImportCheckpoint(
+            id=import_id, processed=0, imported=0, rejected=0
+        )
+        resumed_from = checkpoint.processed
+
+        def reject(index: int, error: str) -> None:
+            checkpoint.rejected += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"record": index, "error": error})
+
+        def commit(chunk: List[Tuple[int, Any]]) -> int:
+            rows = []
+            rejected = []
+            for index, record in chunk:
+                try:
+                    rows.append((index, validate_record(record)))
+                except InvalidRecord as error:
+                    rejected.append((index, str(error)))
+
+            owners.resolve(session, [row for _, row in rows])
+
+            valid = []
+            for index, row in rows:
+                if "owner_id" in row:
+                    valid.append(row)
+                else:
+                    rejected.append((index, "Unknown owner"))
+
+            for index, error in sorted(rejected):
+                reject(index, error)
+
+            if valid:
+                load_rows(session, valid)
+
+            checkpoint.processed = chunk[-1][0]
+            checkpoint.imported += len(valid)
+            checkpoint.updated_at = datetime.now()
+            session.add(checkpoint)
+            session.commit()
+
+            for owner_id in {row["owner_id"] for row in valid}:
+                invalidate_user_notes(owner_id)
+
+            return len(valid)
+
+        chunk: List[Tuple[int, Any]] = []
+
+        for index, record in enumerate(parse_records(lines, import_format), 1):
+            if index <= resumed_from:
+                continue
+
+            chunk.append((index, record))
+
+            if len(chunk) >= chunk_size:
+                imported += commit(chunk)
+                chunk = []
+
+        if chunk:
+            imported += commit(chunk)
+
+        seconds = time.perf_counter() - started
+
+        return {
+            "import_id": import_id,
+            "resumed_from": resumed_from,
+            "processed": checkpoint.processed,
+            "imported": checkpoint.imported,
+            "rejected": checkpoint.rejected,
+            "errors": errors,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(imported / seconds) if seconds else 0,
+        }
+
+
+def iterate_body(request: Request) -> Iterator[bytes]:
+    """
+    Reads the body of a request from a worker thread, chunk by chunk.
+
+    Every chunk is received on the event loop only when the import asks for it, so the
+    upload is never buffered whole and a slow database slows the client down.
+
+    Args:
+        request (Request): The request being handled in the threadpool.
+
+    Yields:
+        bytes: The chunks of the body.
+    """
+    stream = request.stream()
+
+    async def receive() -> Optional[bytes]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    while True:
+        chunk = anyio.from_thread.run(receive)
+        if chunk is None:
+            return
+        yield chunk
+
+
+@router.post("/notes")
+def import_notes_endpoint(
+    request: Request,
+    import_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    import_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Imports notes from an NDJSON or CSV request body.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+        import_format (str): "ndjson" or "csv", sent as the "format" query parameter.
+        import_id (str, optional): The id of an interrupted import to be resumed.
+
+    Returns:
+        Dict[str, Any]: The report returned by import_notes.
+
+    Raises:
+        HTTPException: 500 if the database fails, after the last committed chunk.
+    """
+    require_admin(request)
+
+    import_id = import_id or uuid.uuid4().hex
+
+    try:
+        return import_notes(
+            iterate_lines(iterate_body(request)), import_format, import_id
+        )
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Import {import_id} was interrupted, "
+            "send the same upload with its import_id to resume it",
+        )
@@ -0,0 +1,358 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, Set, Tuple
+
+from app.gql.projections import get_selection, to_rows
+from app.utils.env import getenv
+from app.utils.user import get_authenticated_user
+
+RESPONSE_CACHE_MAX_BYTES = int(getenv("RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+RESPONSE_CACHE_TTL_SECONDS = float(getenv("RESPONSE_CACHE_TTL_SECONDS", 30))
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimates the memory footprint of a value in bytes.
+
+    The function walks containers and plain objects (including SQLAlchemy model instances) and sums
+    the sizes reported by sys.getsizeof. Internal SQLAlchemy state and objects that were already
+    counted are skipped, so relationship cycles such as Note.owner -> User.notes are counted once.
+
+    Args:
+        value (Any): The value to be measured.
+
+    Returns:
+        int: The estimated size of the value in bytes.
+    """
+    seen: Set[int] = set()
+    stack = [value]
+    size = 0
+
+    while stack:
+        obj = stack.pop()
+
+        if obj is None or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, (str, bytes, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.extend(
+                attr for name, attr in vars(obj).items() if not name.startswith("_sa_")
+            )
+
+    return size
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache for resolver results with a byte budget and tag-based invalidation.
+
+    Every entry is stored together with a set of tags (for example "notes:1"). Invalidating a tag
+    removes every entry carrying it, regardless of which principal the entry belongs to.
+    Entries also expire ttl seconds after they were stored, which bounds how long writes that
+    do not invalidate any tag, such as bulk imports, can go unnoticed.
+
+    Attributes:
+        max_bytes (int): The maximum estimated size of all stored values in bytes.
+        ttl (float): The number of seconds an entry is served for.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Any, int, Set[str], float]]" = (
+            OrderedDict()
+        )
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._invalidated_entries = 0
+        self._expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the value stored under the given key and marks it as recently used.
+
+        Expired entries are removed and reported as misses.
+
+        Args:
+            key (str): The cache key.
+            default (Any, optional): The value returned when the key is not cached (default is None).
+
+        Returns:
+            Any: The cached value or the default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[3] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        """
+        Stores a value under the given key, evicting least recently used entries to stay within the budget.
+
+        Values larger than the whole budget are not stored at all.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value to be stored.
+            tags (Iterable[str], optional): Tags used to invalidate the entry later.
+        """
+        size = estimate_size(value)
+        tags = set(tags)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+            self._entries[key] = (value, size, tags, time.monotonic() + self.ttl)
+            self._bytes += size
+
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, *tags: str) -> int:
+        """
+        Removes every entry carrying at least one of the given tags.
+
+        Args:
+            *tags (str): The tags to be invalidated.
+
+        Returns:
+            int: The number of removed entries (the invalidation fan-out).
+        """
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.pop(tag, ()))
+
+            for key in keys:
+                self._remove(key)
+
+            self._invalidations += 1
+            self._invalidated_entries += len(keys)
+
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._invalidations = 0
+            self._invalidated_entries = 0
+            self._expirations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache statistics.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, hit rate, stored entries and bytes, evictions,
+                            expirations, invalidations and the average invalidation fan-out.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "invalidated_entries": self._invalidated_entries,
+                "invalidation_fan_out": (
+                    self._invalidated_entries / self._invalidations
+                    if self._invalidations
+                    else 0.0
+                ),
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        _, size, tags, _ = entry
+        self._bytes -= size
+
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache()
+
+
+def make_cache_key(operation: str, variables: Dict[str, Any], principal: Any) -> str:
+    """
+    Builds a cache key from the operation, its variables and the authenticated principal.
+
+    Args:
+        operation (str): The name of the cached operation, e.g. "Query.get_note".
+        variables (Dict[str, Any]): The arguments the operation was called with.
+        principal (Any): The identifier of the authenticated user.
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request.
+    """
+    payload = json.dumps(
+        [operation, variables, principal], sort_keys=True, default=str
+    ).encode()
+
+    return hashlib.sha256(payload).hexdigest()
+
+
+def user_tags(user_id: int) -> Tuple[str, str]:
+    """
+    Returns the cache tags of everything that depends on the given user and their notes.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Tuple[str, str]: The user tag and the user's notes tag.
+    """
+    return f"user:{user_id}", f"notes:{user_id}"
+
+
+def invalidate_user(user_id: int) -> int:
+    """
+    Invalidates cached responses that depend on the given user's profile.
+
+    Args:
+        user_id (int): The ID of the user that has changed.
+
+    Returns:
+        int: The number of invalidated entries.
+    """
+    return response_cache.invalidate(f"user:{user_id}")
+
+
+def invalidate_user_notes(user_id: int) -> int:
+    """
+    Invalidates cached responses that depend on the given user's notes.
+
+    Args:
+        user_id (int): The ID of the user whose notes have changed.
+
+    Returns:
+        int: The number of invalidated entries.
+    """
+    return response_cache.invalidate(f"notes:{user_id}")
+
+
+def cached_resolver(tags: Callable[..., Iterable[str]]):
+    """
+    Decorator caching the result of a resolver per field, arguments, selection and authenticated user.
+
+    Entries are keyed by the resolved field rather than by the whole operation, so different
+    operations selecting the same fields of e.g. getNote share them. Results are cached as
+    detached UserRow and NoteRow tuples holding the selected fields, never as ORM objects, so
+    later requests do not load anything through the session of the request that cached them.
+
+    The decorator has to be applied below the authentication decorators, so only requests
+    that have already been authorized can read or populate the cache. Each entry is tagged with
+    the tags returned by `tags` (called with the resolver's arguments) and with the principal's
+    own user tag, so changing the principal invalidates everything it has cached.
+
+    Args:
+        tags (Callable[..., Iterable[str]]): A function returning the tags for the resolver's arguments.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable):
+        @wraps(func)
+        def wrapper(root, info, **kwargs):
+            user = get_authenticated_user(info.context)[0]
+            operation = f"{info.parent_type.name}.{info.field_name}"
+            selection = get_selection(info)
+            key = make_cache_key(
+                operation, {"arguments": kwargs, "selection": selection}, user.id
+            )
+
+            result = response_cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
+
+            result = func(root, info, **kwargs)
+
+            if isinstance(result, Iterator):
+                # Results streamed from a database cursor can only be consumed once
+                return result
+
+            result = to_rows(result, selection)
+            response_cache.set(key, result, (*tags(**kwargs), f"user:{user.id}"))
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Returns the statistics of the shared response cache.
+
+    Returns:
+        Dict[str, Any]: The statistics returned by ResponseCache.stats.
+    """
+    return response_cache.stats()
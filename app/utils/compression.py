@@ -0,0 +1,170 @@
+import logging
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.env import getenv
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is an optional speedup
+    brotli = None
+    logger.warning("brotli is not installed, responses are only compressed with gzip")
+
+COMPRESSION_MINIMUM_SIZE = int(getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_LEVEL = int(getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(getenv("BROTLI_QUALITY", 4))
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Picks the best supported content coding from an Accept-Encoding header.
+
+    Brotli is preferred over gzip when the brotli package is installed and the client
+    accepts both with the same quality.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header sent by the client.
+
+    Returns:
+        str, optional: "br", "gzip" or None if the response should not be compressed.
+    """
+    qualities = {}
+
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+
+        qualities[coding.strip().lower()] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [
+        (qualities.get(coding, qualities.get("*", 0.0)), -index, coding)
+        for index, coding in enumerate(supported)
+    ]
+    quality, _, coding = max(candidates)
+
+    return coding if quality > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing HTTP responses with brotli or gzip.
+
+    Complete responses are compressed when they are at least minimum_size bytes long.
+    Streaming responses are always compressed and every chunk is flushed immediately,
+    so compression does not delay the delivery of streamed data. Responses that already
+    have a Content-Encoding are passed through untouched. Strong ETags are weakened for
+    clients accepting compression, because they are computed from the uncompressed body
+    and a strong validator has to differ between content codings; small responses and 304s
+    get the same weak ETag, so it does not depend on whether a body was compressed.
+
+    Attributes:
+        minimum_size (int): The smallest body size in bytes worth compressing.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        initial_message: Message = {}
+        compressor: Optional[_Compressor] = None
+        started = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal initial_message, compressor, started
+
+            if message["type"] == "http.response.start":
+                initial_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if not started:
+                started = True
+                headers = MutableHeaders(raw=initial_message["headers"])
+
+                if "content-encoding" in headers:
+                    await send(initial_message)
+                    await send(message)
+                    return
+
+                etag = headers.get("ETag")
+                if etag is not None and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+
+                if not more_body and len(body) < self.minimum_size:
+                    await send(initial_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+
+                if more_body:
+                    del headers["Content-Length"]
+                    message["body"] = compressor.compress(body)
+                else:
+                    message["body"] = compressor.finish(body)
+                    headers["Content-Length"] = str(len(message["body"]))
+
+                await send(initial_message)
+                await send(message)
+                return
+
+            if compressor is not None:
+                message["body"] = (
+                    compressor.compress(body) if more_body else compressor.finish(body)
+                )
+
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,15 +1,54 @@
-from app.db.database import Session, engine
+from sqlalchemy import inspect
+
+from app.db.database import Session, get_engine
 from app.db.models import Base, User
 from app.utils.password import hash_password
 
+ADMIN_EMAIL = "admin@admin.com"
+
 
 def create_database() -> None:
+    """
+    Recreates the schema from scratch and seeds the default admin.
+
+    Every table is dropped first, so all data is lost. Meant for development only.
+    """
+    engine = get_engine()
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
 
+    _create_admin()
+
+
+def ensure_database(seed_admin: bool = False) -> None:
+    """
+    Creates the missing tables without touching existing tables or data.
+
+    The check is idempotent: running it against an up-to-date schema only reads the
+    list of tables.
+
+    Args:
+        seed_admin (bool): Whether to create the default admin if it does not exist.
+    """
+    engine = get_engine()
+    existing_tables = set(inspect(engine).get_table_names())
+
+    if not existing_tables.issuperset(Base.metadata.tables):
+        Base.metadata.create_all(engine, checkfirst=True)
+
+    if seed_admin:
+        session = Session()
+        admin_exists = session.query(User.id).filter_by(email=ADMIN_EMAIL).first()
+        session.close()
+
+        if admin_exists is None:
+            _create_admin()
+
+
+def _create_admin() -> None:
     user = User(
         username="Admin",
-        email="admin@admin.com",
+        email=ADMIN_EMAIL,
         password_hash=hash_password("12345678"),
         is_admin=True,
         is_active=True,
@@ -0,0 +1,270 @@
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from graphql import GraphQLError
+from sqlalchemy import Select, select
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from app.db.database import Session
+from app.db.models import Note, User
+from app.utils.env import getenv
+from app.utils.serialization import dumps
+from app.utils.user import get_authenticated_user
+
+EXPORT_BATCH_SIZE = int(getenv("EXPORT_BATCH_SIZE", 1000))
+
+NOTE_EXPORT_COLUMNS = (
+    Note.id,
+    Note.owner_id,
+    Note.title,
+    Note.description,
+    Note.done,
+    Note.created_at,
+    Note.updated_at,
+)
+USER_EXPORT_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.is_admin,
+    User.is_active,
+    User.created_at,
+    User.last_login,
+)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+router = APIRouter(prefix="/export")
+
+
+def iterate_batches(
+    statement: Select, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[Sequence[Any]]:
+    """
+    Reads the rows of a statement from a server-side cursor in batches.
+
+    Only plain rows are fetched, so no ORM entities pile up in the session and the memory
+    used stays bounded by the batch size whatever the size of the table.
+
+    Args:
+        statement (Select): The statement to be read.
+        batch_size (int): The number of rows fetched from the cursor at once.
+
+    Yields:
+        Sequence[Any]: The batches of rows.
+    """
+    with Session() as session:
+        result = session.execute(
+            statement.execution_options(stream_results=True, yield_per=batch_size)
+        )
+        yield from result.partitions()
+
+
+def encode_ndjson(
+    fields: Sequence[str], batches: Iterator[Sequence[Any]]
+) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as newline-delimited JSON, one chunk per batch.
+
+    Args:
+        fields (Sequence[str]): The names of the columns.
+        batches (Iterator[Sequence[Any]]): The batches of rows.
+
+    Yields:
+        bytes: The encoded batches.
+    """
+    for batch in batches:
+        yield b"".join(dumps(dict(zip(fields, row))) + b"\n" for row in batch)
+
+
+def encode_csv(
+    fields: Sequence[str], batches: Iterator[Sequence[Any]]
+) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as CSV with a header line, one chunk per batch.
+
+    Args:
+        fields (Sequence[str]): The names of the columns.
+        batches (Iterator[Sequence[Any]]): The batches of rows.
+
+    Yields:
+        bytes: The encoded header and batches.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(fields)
+    yield flush()
+
+    for batch in batches:
+        writer.writerows(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in batch
+        )
+        yield flush()
+
+
+ENCODERS: Dict[str, Callable] = {"ndjson": encode_ndjson, "csv": encode_csv}
+
+
+async def stream_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Streams the chunks of a blocking iterator without blocking the event loop.
+
+    Every chunk is produced in the threadpool only after the previous one has been sent,
+    so a slow client holds the export back instead of it being buffered in memory. The
+    iterator is closed (and its database session with it) when the client disconnects.
+
+    Args:
+        chunks (Iterator[bytes]): The chunks of the response.
+
+    Yields:
+        bytes: The chunks.
+    """
+    try:
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_in_threadpool(chunks.close)
+
+
+def export_response(
+    statement: Select, fields: Sequence[str], export_format: str, filename: str
+) -> StreamingResponse:
+    """
+    Returns a response streaming the rows of a statement in an export format.
+
+    Args:
+        statement (Select): The statement selecting the exported rows.
+        fields (Sequence[str]): The names of the exported columns.
+        export_format (str): "ndjson" or "csv".
+        filename (str): The name of the downloaded file, without the extension.
+
+    Returns:
+        StreamingResponse: The export.
+    """
+    encode = ENCODERS[export_format]
+
+    return StreamingResponse(
+        stream_chunks(encode(fields, iterate_batches(statement))),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
+
+
+def require_admin(request: Request) -> User:
+    """
+    Authenticates an admin from the Authorization header of an HTTP request.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        User: The admin.
+
+    Raises:
+        HTTPException: 401 if the user cannot be authenticated, 403 if they are not an admin.
+    """
+    try:
+        user, _ = get_authenticated_user({"request": request})
+    except GraphQLError as error:
+        raise HTTPException(status_code=401, detail=error.message)
+
+    if user.is_admin is not True:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to perform this action"
+        )
+
+    return user
+
+
+@router.get("/notes")
+def export_notes(
+    request: Request,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    owner_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> StreamingResponse:
+    """
+    Streams all notes, optionally only those of one owner or created in a date range.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+        export_format (str): "ndjson" or "csv", sent as the "format" query parameter.
+        owner_id (int, optional): The id of the owner of the exported notes.
+        created_after (datetime, optional): The earliest creation date of the exported notes.
+        created_before (datetime, optional): The creation date the exported notes precede.
+
+    Returns:
+        StreamingResponse: The export.
+    """
+    require_admin(request)
+
+    statement = select(*NOTE_EXPORT_COLUMNS).order_by(Note.id)
+    if owner_id is not None:
+        statement = statement.where(Note.owner_id == owner_id)
+    if created_after is not None:
+        statement = statement.where(Note.created_at >= created_after)
+    if created_before is not None:
+        statement = statement.where(Note.created_at < created_before)
+
+    return export_response(
+        statement,
+        [column.key for column in NOTE_EXPORT_COLUMNS],
+        export_format,
+        "notes",
+    )
+
+
+@router.get("/users")
+def export_users(
+    request: Request,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> StreamingResponse:
+    """
+    Streams all users without their password hashes, optionally only those created in a date range.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+        export_format (str): "ndjson" or "csv", sent as the "format" query parameter.
+        created_after (datetime, optional): The earliest creation date of the exported users.
+        created_before (datetime, optional): The creation date the exported users precede.
+
+    Returns:
+        StreamingResponse: The export.
+    """
+    require_admin(request)
+
+    statement = select(*USER_EXPORT_COLUMNS).order_by(User.id)
+    if created_after is not None:
+        statement = statement.where(User.created_at >= created_after)
+    if created_before is not None:
+        statement = statement.where(User.created_at < created_before)
+
+    return export_response(
+        statement,
+        [column.key for column in USER_EXPORT_COLUMNS],
+        export_format,
+        "users",
+    )
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from graphql import GraphQLError
+
+from app.utils.env import getenv
+from app.utils.metrics import idempotent_replays
+from app.utils.user import get_authenticated_user
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = float(getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+IDEMPOTENCY_MAX_ENTRIES = int(getenv("IDEMPOTENCY_MAX_ENTRIES", 10_000))
+IDEMPOTENCY_WAIT_TIMEOUT = float(getenv("IDEMPOTENCY_WAIT_TIMEOUT", 30))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+# Fingerprints hash the arguments, passwords included, so they are keyed per process
+_FINGERPRINT_KEY = secrets.token_bytes(32)
+
+
+def fingerprint(arguments: Dict[str, Any]) -> str:
+    """
+    Hashes the arguments of a mutation, so a key reused for different ones is detected.
+
+    Args:
+        arguments (Dict[str, Any]): The arguments of the mutation.
+
+    Returns:
+        str: The keyed hash of the arguments.
+    """
+    payload = json.dumps(arguments, sort_keys=True, default=str).encode()
+
+    return hashlib.blake2b(payload, key=_FINGERPRINT_KEY).hexdigest()
+
+
+class _Entry:
+    """
+    The execution of a mutation under an idempotency key, in flight or completed.
+    """
+
+    __slots__ = ("fingerprint", "expires_at", "done", "result", "error")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class IdempotencyStore:
+    """
+    A thread-safe, bounded store of mutation results keyed by idempotency key.
+
+    The first execution under a key runs the mutation and stores its result; retries get the
+    stored result without running it again, and duplicates arriving while it runs wait for it.
+    Failed executions are not stored, so a retry after an error runs the mutation again.
+    Entries expire ttl seconds after their first execution started; since the ttl is the same
+    for all of them, they are kept in insertion order and the expired ones are always the
+    oldest. Beyond max_entries the oldest entries are evicted.
+
+    The results are the mutations' return values, SQLAlchemy objects included, so they only
+    live in the memory of the worker that ran the mutation: retries reach it in single-worker
+    deployments or behind a load balancer with sticky sessions.
+
+    Attributes:
+        ttl (float): The seconds a result is kept for.
+        max_entries (int): The maximum number of stored results.
+        wait_timeout (float): The seconds a duplicate waits for the execution in flight.
+    """
+
+    def __init__(
+        self,
+        ttl: float = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._replays = 0
+        self._evictions = 0
+
+    def run(
+        self,
+        key: Hashable,
+        fingerprint: str,
+        func: Callable[[], Any],
+        mutation: str = "",
+    ) -> Any:
+        """
+        Runs a function once per key and returns its result to every call with the key.
+
+        Args:
+            key (Hashable): The scoped idempotency key.
+            fingerprint (str): The fingerprint of the arguments the function runs with.
+            func (Callable[[], Any]): The function.
+            mutation (str, optional): The name of the mutation, used in the metrics.
+
+        Returns:
+            Any: The result of the function, stored or fresh.
+
+        Raises:
+            GraphQLError: If the key was used with other arguments, or if the execution in
+                flight did not finish within the wait timeout. Errors raised by the execution
+                are re-raised to the duplicates that waited for it.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+
+            if entry is None:
+                entry = self._entries[key] = _Entry(fingerprint, now + self.ttl)
+                self._executions += 1
+                self._evict()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return self._replay(entry, fingerprint, mutation)
+
+        try:
+            entry.result = func()
+        except BaseException as error:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.error = error
+            raise
+        finally:
+            entry.done.set()
+
+        return entry.result
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._executions = 0
+            self._replays = 0
+            self._evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the store statistics.
+
+        Returns:
+            Dict[str, int]: The stored entries, executions, replays and evictions.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "executions": self._executions,
+                "replays": self._replays,
+                "evictions": self._evictions,
+            }
+
+    def _replay(self, entry: _Entry, fingerprint: str, mutation: str) -> Any:
+        if entry.fingerprint != fingerprint:
+            raise GraphQLError(
+                "This idempotency key was already used with different arguments",
+                extensions={"code": "IDEMPOTENCY_KEY_REUSED"},
+            )
+
+        if not entry.done.wait(self.wait_timeout):
+            raise GraphQLError(
+                "A request with this idempotency key is still in progress",
+                extensions={"code": "IDEMPOTENCY_IN_PROGRESS"},
+            )
+
+        if entry.error is not None:
+            raise entry.error
+
+        with self._lock:
+            self._replays += 1
+        idempotent_replays.inc(mutation)
+
+        return entry.result
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            key = next(iter(self._entries))
+            if self._entries[key].expires_at > now:
+                break
+            del self._entries[key]
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+            self._evictions += 1
+
+
+store = IdempotencyStore()
+
+
+def idempotency_key(info: Any, argument: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the idempotency key of a mutation, from its argument or the request header.
+
+    The argument takes precedence, so the mutations of a batched request can each use their own
+    key, while the Idempotency-Key header applies to every mutation of the request.
+
+    Args:
+        info (ResolveInfo): The resolve info of the mutation.
+        argument (str, optional): The idempotencyKey argument of the mutation.
+
+    Returns:
+        str, optional: The key, or None if the client did not send one.
+
+    Raises:
+        GraphQLError: If the key is longer than 255 characters.
+    """
+    key = argument
+    if key is None:
+        request = (
+            info.context.get("request") if isinstance(info.context, dict) else None
+        )
+        headers = getattr(request, "headers", None)
+        key = headers.get(IDEMPOTENCY_KEY_HEADER) if headers is not None else None
+
+    if not key:
+        return None
+
+    if len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise GraphQLError(
+            f"Idempotency keys cannot be longer than {IDEMPOTENCY_MAX_KEY_LENGTH} characters",
+            extensions={"code": "IDEMPOTENCY_KEY_INVALID"},
+        )
+
+    return key
+
+
+def principal(context: Any) -> Optional[int]:
+    """
+    Returns the id of the user a mutation is run for, scoping its idempotency keys.
+
+    Args:
+        context (Any): The context of the operation, holding its request.
+
+    Returns:
+        int, optional: The id of the authenticated user, or None for anonymous clients.
+    """
+    if not isinstance(context, dict):
+        return None
+
+    try:
+        user, _ = get_authenticated_user(context)
+    except GraphQLError:
+        return None
+
+    return user.id
+
+
+def idempotent(func: Callable):
+    """
+    Decorator making a mutation honor idempotency keys.
+
+    The key comes from the idempotencyKey argument or the Idempotency-Key header and is scoped
+    to the authenticated user, or shared by anonymous clients, and to the mutation field; it is
+    also bound to a fingerprint of the arguments, so anonymous clients can only replay results
+    of mutations they could run themselves. Mutations without a key run as usual. Put it below
+    logged_in, so the user is authenticated before a stored result is returned.
+
+    Args:
+        func (Callable): The mutate method to be decorated.
+
+    Returns:
+        Callable: The decorated method.
+    """
+
+    @wraps(func)
+    def wrapper(root, info, **kwargs):
+        key = idempotency_key(info, kwargs.pop("idempotency_key", None))
+
+        if key is None:
+            return func(root, info, **kwargs)
+
+        scoped_key = (principal(info.context), info.field_name, key)
+
+        return store.run(
+            scoped_key,
+            fingerprint(kwargs),
+            lambda: func(root, info, **kwargs),
+            info.field_name,
+        )
+
+    return wrapper
@@ -0,0 +1,163 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from app.db.database import Session
+from app.db.models import User
+from app.utils.cache import invalidate_user
+from app.utils.env import getenv
+
+LAST_LOGIN_FLUSH_INTERVAL = float(getenv("LAST_LOGIN_FLUSH_INTERVAL", 5))
+LAST_LOGIN_FLUSH_SIZE = int(getenv("LAST_LOGIN_FLUSH_SIZE", 500))
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer of the users' last login timestamps.
+
+    Logins only record their timestamp in memory; a background thread writes the buffered
+    timestamps with one batched UPDATE every flush_interval seconds, or as soon as
+    flush_size users are waiting. Repeated logins of a user before a flush are coalesced
+    into a single update of the latest timestamp. Timestamps stay in the buffer, and keep
+    hiding the stored ones from readers, until their UPDATE is committed; the cached
+    responses of the flushed users are invalidated then, so none of them holds the login
+    from before. If a flush fails, its timestamps are retried with the next one.
+
+    Attributes:
+        flush_interval (float): The maximum number of seconds a timestamp waits in the buffer.
+        flush_size (int): The number of buffered users that triggers an early flush.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = LAST_LOGIN_FLUSH_INTERVAL,
+        flush_size: int = LAST_LOGIN_FLUSH_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, user_id: int, timestamp: Optional[datetime] = None) -> datetime:
+        """
+        Buffers the last login of a user.
+
+        Args:
+            user_id (int): The ID of the user who logged in.
+            timestamp (datetime, optional): The time of the login, now by default.
+
+        Returns:
+            datetime: The buffered timestamp.
+        """
+        timestamp = timestamp or datetime.now()
+
+        with self._lock:
+            if self._pending.get(user_id, timestamp) <= timestamp:
+                self._pending[user_id] = timestamp
+            size = len(self._pending)
+
+        self._start()
+
+        if size >= self.flush_size:
+            self._wakeup.set()
+
+        return timestamp
+
+    def get(self, user_id: int) -> Optional[datetime]:
+        """
+        Returns the buffered last login of a user that has not been written yet.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            datetime, optional: The buffered timestamp or None if there is none.
+        """
+        with self._lock:
+            return self._pending.get(user_id)
+
+    def flush(self) -> int:
+        """
+        Writes the buffered timestamps with one batched UPDATE.
+
+        Returns:
+            int: The number of updated users.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = dict(self._pending)
+
+            if not pending:
+                return 0
+
+            with Session() as session:
+                session.execute(
+                    update(User),
+                    [
+                        {"id": user_id, "last_login": timestamp}
+                        for user_id, timestamp in pending.items()
+                    ],
+                )
+                session.commit()
+
+            with self._lock:
+                for user_id, timestamp in pending.items():
+                    # Logins recorded during the write are left for the next flush
+                    if self._pending.get(user_id) == timestamp:
+                        del self._pending[user_id]
+
+            for user_id in pending:
+                invalidate_user(user_id)
+
+            return len(pending)
+
+    def stop(self) -> None:
+        """
+        Stops the background thread and writes the remaining timestamps.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+        self._stopping.clear()
+        self._wakeup.clear()
+
+    def _start(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="last-login-flush", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            if self._stopping.is_set():
+                return
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write the buffered last logins")
+
+
+last_login_buffer = LastLoginBuffer()
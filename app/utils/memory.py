@@ -0,0 +1,368 @@
+import gc
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.db.database import live_sessions
+from app.db.models import Base
+from app.utils.env import getenv
+from app.utils.export import require_admin
+
+MEMORY_REQUEST_BUDGET_KB = int(getenv("MEMORY_REQUEST_BUDGET_KB", 0))
+MEMORY_TRACEMALLOC_FRAMES = int(getenv("MEMORY_TRACEMALLOC_FRAMES", 10))
+MEMORY_SNAPSHOT_STORE_SIZE = int(getenv("MEMORY_SNAPSHOT_STORE_SIZE", 5))
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/diagnostics/memory")
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Returns the resident set size of the process, current and peak.
+
+    Returns:
+        Dict[str, Optional[int]]: rss_bytes, None where /proc is not available, and
+            max_rss_bytes, None where the resource module is not.
+    """
+    rss = None
+    try:
+        with open("/proc/self/statm") as file:
+            rss = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        max_rss = None
+    else:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss *= 1 if os.uname().sysname == "Darwin" else 1024
+
+    return {"rss_bytes": rss, "max_rss_bytes": max_rss}
+
+
+def session_stats(top: int = 10) -> Dict[str, Any]:
+    """
+    Describes the live sessions and the objects their identity maps hold.
+
+    A session is live until it is garbage collected, whether it was closed or not; a
+    session that was never closed keeps its identity map, and every entity in it, alive
+    for as long as something references it.
+
+    Args:
+        top (int): The number of largest identity maps listed.
+
+    Returns:
+        Dict[str, Any]: The number of live sessions and of those in a transaction (holding
+            a connection), the total and largest identity map sizes and the identity
+            mapped objects by type.
+    """
+    sessions = list(live_sessions)
+    sizes = []
+    objects: Counter = Counter()
+
+    for session in sessions:
+        try:
+            # Another thread may be loading entities into the map meanwhile
+            entities = list(session.identity_map.values())
+        except RuntimeError:
+            continue
+        sizes.append(len(entities))
+        objects.update(type(entity).__name__ for entity in entities)
+
+    return {
+        "live": len(sessions),
+        "in_transaction": sum(session.in_transaction() for session in sessions),
+        "identity_map_objects": sum(sizes),
+        "largest_identity_maps": sorted(sizes, reverse=True)[:top],
+        "identity_mapped_by_type": dict(objects.most_common()),
+    }
+
+
+def mapped_object_counts() -> Dict[str, int]:
+    """
+    Counts the live instances of every mapped class, whether in an identity map or not.
+
+    This walks every object tracked by the garbage collector, so it takes time in
+    proportion to the heap; it is only meant for diagnostics.
+
+    Returns:
+        Dict[str, int]: The number of instances by class name, largest first.
+    """
+    classes = tuple(mapper.class_ for mapper in Base.registry.mappers)
+    counts = Counter(
+        type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, classes)
+    )
+
+    return dict(counts.most_common())
+
+
+def memory_report() -> Dict[str, Any]:
+    """
+    Collects the memory accounting of the process.
+
+    Returns:
+        Dict[str, Any]: The process memory, the sessions, the live mapped objects, the
+            garbage collector's counts and the memory traced by tracemalloc, if it runs.
+    """
+    traced = None
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        traced = {"current_bytes": current, "peak_bytes": peak}
+
+    return {
+        "process": process_memory(),
+        "sessions": session_stats(),
+        "mapped_objects": mapped_object_counts(),
+        "gc": {
+            "counts": list(gc.get_count()),
+            "tracked_objects": len(gc.get_objects()),
+        },
+        "tracemalloc": traced,
+    }
+
+
+class SnapshotStore:
+    """
+    Thread-safe store of the latest tracemalloc snapshots, to diff them later.
+
+    Snapshots hold a trace of every live allocation, so only a few are kept.
+
+    Attributes:
+        max_entries (int): The maximum number of stored snapshots.
+    """
+
+    def __init__(self, max_entries: int = MEMORY_SNAPSHOT_STORE_SIZE):
+        self.max_entries = max_entries
+        self._snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self) -> str:
+        """
+        Takes a snapshot, starting tracemalloc first if it does not run yet, and stores it,
+        dropping the oldest one if the store is full.
+
+        Allocations made before tracemalloc started are not traced, so the first snapshot
+        of a process is only a starting point for later diffs.
+
+        Returns:
+            str: The id of the snapshot.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACEMALLOC_FRAMES)
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+        snapshot_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+
+        return snapshot_id
+
+    def get(self, snapshot_id: str) -> Optional[tracemalloc.Snapshot]:
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+
+snapshot_store = SnapshotStore()
+
+
+def diff_snapshots(
+    first: tracemalloc.Snapshot,
+    second: tracemalloc.Snapshot,
+    group_by: str = "lineno",
+    limit: int = 25,
+) -> Dict[str, Any]:
+    """
+    Compares two snapshots and returns the allocation sites that grew the most.
+
+    Args:
+        first (tracemalloc.Snapshot): The earlier snapshot.
+        second (tracemalloc.Snapshot): The later snapshot.
+        group_by (str): "lineno", "filename" or "traceback", as for Snapshot.compare_to.
+        limit (int): The number of allocation sites returned.
+
+    Returns:
+        Dict[str, Any]: The total size difference in bytes and the top allocation sites,
+            each with its size and count differences and its current size and count.
+    """
+    statistics = second.compare_to(first, group_by)
+
+    return {
+        "size_diff_bytes": sum(stat.size_diff for stat in statistics),
+        "count_diff": sum(stat.count_diff for stat in statistics),
+        "top": [
+            {
+                "traceback": [str(frame) for frame in stat.traceback],
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in statistics[:limit]
+        ],
+    }
+
+
+@contextmanager
+def allocation_budget(
+    label: str, budget_kb: int = MEMORY_REQUEST_BUDGET_KB
+) -> Iterator[None]:
+    """
+    Logs a warning if the code run in the context allocates more than a budget.
+
+    The allocations are measured by tracemalloc, as the peak of the traced memory above
+    its level on entry, so nothing is measured unless tracemalloc runs (it is started at
+    startup when MEMORY_REQUEST_BUDGET_KB is set). The traced memory is process-wide:
+    the peak is reset on entry, so requests running concurrently share it and a request
+    may be charged for the allocations of another, or miss some of its own.
+
+    Args:
+        label (str): What is measured, e.g. the operations of a request, for the log.
+        budget_kb (int): The budget in kibibytes, 0 to disable the check.
+    """
+    if budget_kb <= 0 or not tracemalloc.is_tracing():
+        yield
+        return
+
+    tracemalloc.reset_peak()
+    started, _ = tracemalloc.get_traced_memory()
+    started_at = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        allocated_kb = (peak - started) / 1024
+
+        if allocated_kb > budget_kb:
+            logger.warning(
+                "Request %s allocated %.0f KiB (budget %d KiB) and retained %.0f KiB"
+                " in %.1f ms",
+                label,
+                allocated_kb,
+                budget_kb,
+                (current - started) / 1024,
+                (time.perf_counter() - started_at) * 1000,
+            )
+
+
+def start_allocation_tracing() -> None:
+    """
+    Starts tracemalloc for the per-request allocation budget, if it is configured.
+    """
+    if MEMORY_REQUEST_BUDGET_KB > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACEMALLOC_FRAMES)
+
+
+@router.get("")
+def get_memory_report(request: Request) -> Dict[str, Any]:
+    """
+    Reports the memory accounting of the worker handling the request.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+
+    Returns:
+        Dict[str, Any]: The report of memory_report.
+    """
+    require_admin(request)
+
+    return memory_report()
+
+
+@router.post("/snapshots")
+def take_snapshot(request: Request) -> Dict[str, Any]:
+    """
+    Takes a tracemalloc snapshot, starting tracemalloc if needed.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+
+    Returns:
+        Dict[str, Any]: The id of the snapshot and the memory traced so far.
+    """
+    require_admin(request)
+
+    snapshot_id = snapshot_store.take()
+    current, peak = tracemalloc.get_traced_memory()
+
+    return {"id": snapshot_id, "current_bytes": current, "peak_bytes": peak}
+
+
+@router.get("/snapshots/{snapshot_id}/diff")
+def diff_snapshot(
+    request: Request,
+    snapshot_id: str,
+    to: Optional[str] = None,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+) -> Dict[str, Any]:
+    """
+    Diffs a snapshot with a later one, by default a snapshot taken now.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+        snapshot_id (str): The id of the earlier snapshot.
+        to (str, optional): The id of the later snapshot.
+        group_by (str): How allocations are grouped: by line, file or traceback.
+        limit (int): The number of allocation sites returned.
+
+    Returns:
+        Dict[str, Any]: The diff of diff_snapshots, with the ids of both snapshots.
+
+    Raises:
+        HTTPException: 404 if a snapshot does not exist or was already dropped.
+    """
+    require_admin(request)
+
+    first = snapshot_store.get(snapshot_id)
+    second_id = to or snapshot_store.take()
+    second = snapshot_store.get(second_id)
+
+    if first is None or second is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+    return {
+        "from": snapshot_id,
+        "to": second_id,
+        **diff_snapshots(first, second, group_by, limit),
+    }
+
+
+@router.delete("/snapshots", status_code=204)
+def clear_snapshots(request: Request) -> None:
+    """
+    Drops the stored snapshots and stops tracemalloc, unless the allocation budget needs it.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+    """
+    require_admin(request)
+
+    snapshot_store.clear()
+    if MEMORY_REQUEST_BUDGET_KB <= 0:
+        tracemalloc.stop()
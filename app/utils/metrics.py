@@ -0,0 +1,692 @@
+import logging
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from graphql import GraphQLObjectType, GraphQLSchema
+
+from app.utils.env import getenv
+
+METRICS_ENABLED = getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_MAX_SERIES = int(getenv("METRICS_MAX_SERIES", 500))
+METRICS_NESTED_RESOLVERS = getenv("METRICS_NESTED_RESOLVERS", "false").lower() == "true"
+SQL_N_PLUS_ONE_THRESHOLD = int(getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Starlette appends the charset to text media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Label values used once a metric reaches METRICS_MAX_SERIES series, since operation names
+# are chosen by clients and would otherwise grow the registry without bound
+OVERFLOW_LABEL = "other"
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """
+    Base class of the metrics, a family of series identified by their label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        documentation (str): The help text of the metric.
+        labelnames (Tuple[str, ...]): The names of the labels.
+        max_series (int): The number of series after which new label values are replaced
+            with "other".
+    """
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = METRICS_MAX_SERIES,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, labelvalues: Tuple[str, ...]) -> Any:
+        # Called with the lock held
+        series = self._series.get(labelvalues)
+
+        if series is None:
+            if len(self._series) >= self.max_series:
+                labelvalues = (OVERFLOW_LABEL,) * len(self.labelnames)
+                series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = self._new_series()
+
+        return series
+
+    @abstractmethod
+    def _new_series(self) -> Any:
+        pass
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """
+        Yields the samples of the metric.
+
+        Yields:
+            Tuple[str, Tuple[str, ...], Tuple[str, ...], float]: The suffix of the sample name,
+                the label names, the label values and the value.
+        """
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """
+        Returns the metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The HELP and TYPE lines followed by one line per sample.
+        """
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(
+            f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}"
+            for suffix, names, values, value in self.samples()
+        )
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing value per series, named with the "_total" suffix.
+    """
+
+    type = "counter"
+
+    def _new_series(self) -> List[float]:
+        return [0.0]
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """
+        Increments the series of the label values.
+
+        Args:
+            *labelvalues (str): The values of the labels.
+            amount (float): The increment.
+        """
+        with self._lock:
+            self._get(labelvalues)[0] += amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return series[0] if series else 0.0
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, value[0]) for labels, value in self._series.items()]
+
+        for labelvalues, value in series:
+            yield "", self.labelnames, labelvalues, value
+
+
+class Histogram(Metric):
+    """
+    Observations counted in cumulative buckets, with their count and sum, per series.
+
+    Attributes:
+        buckets (Tuple[float, ...]): The upper bounds of the buckets, without +Inf.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        max_series: int = METRICS_MAX_SERIES,
+    ):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(buckets)
+
+    def _new_series(self) -> List[float]:
+        # The counts of the buckets and +Inf, followed by the sum of the observations
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """
+        Records an observation in the series of the label values.
+
+        Args:
+            value (float): The observed value.
+            *labelvalues (str): The values of the labels.
+        """
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._get(labelvalues)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return sum(series[:-1]) if series else 0
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """
+        Observes the duration of the block in seconds.
+
+        Args:
+            *labelvalues (str): The values of the labels.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(value)) for labels, value in self._series.items()]
+
+        bounds = self.buckets + (float("inf"),)
+        names = self.labelnames + ("le",)
+
+        for labelvalues, value in series:
+            cumulative = 0
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                bucket = labelvalues + (_format_value(bound),)
+                yield "_bucket", names, bucket, cumulative
+            yield "_sum", self.labelnames, labelvalues, value[-1]
+            yield "_count", self.labelnames, labelvalues, cumulative
+
+
+class Registry:
+    """
+    The collection of metrics exposed on the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def clear(self) -> None:
+        """
+        Removes all recorded series, keeping the metrics registered.
+        """
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition.
+        """
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+registry = Registry()
+
+operation_duration = registry.register(
+    Histogram(
+        "graphql_operation_duration_seconds",
+        "Execution time of GraphQL operations",
+        ["operation"],
+    )
+)
+operation_errors = registry.register(
+    Counter(
+        "graphql_operation_errors_total",
+        "Errors returned by GraphQL operations",
+        ["operation"],
+    )
+)
+resolver_duration = registry.register(
+    Histogram(
+        "graphql_resolver_duration_seconds",
+        "Execution time of GraphQL resolvers",
+        ["resolver"],
+    )
+)
+resolver_errors = registry.register(
+    Counter(
+        "graphql_resolver_errors_total",
+        "Exceptions raised by GraphQL resolvers",
+        ["resolver"],
+    )
+)
+operation_sql_statements = registry.register(
+    Histogram(
+        "graphql_operation_sql_statements",
+        "SQL statements executed per GraphQL operation",
+        ["operation"],
+        buckets=COUNT_BUCKETS,
+    )
+)
+operation_sql_duration = registry.register(
+    Histogram(
+        "graphql_operation_sql_duration_seconds",
+        "Time spent in SQL statements per GraphQL operation",
+        ["operation"],
+    )
+)
+password_duration = registry.register(
+    Histogram(
+        "password_hashing_duration_seconds",
+        "Time spent hashing and verifying passwords with Argon2",
+        ["action"],
+    )
+)
+hibp_duration = registry.register(
+    Histogram(
+        "hibp_request_duration_seconds",
+        "Time spent querying the Have I Been Pwned range API",
+    )
+)
+rate_limited = registry.register(
+    Counter(
+        "rate_limited_attempts_total",
+        "Attempts rejected by a rate limiter before any password hashing",
+        ["action", "key"],
+    )
+)
+requests_shed = registry.register(
+    Counter(
+        "graphql_requests_shed_total",
+        "GraphQL requests rejected by the admission control because of overload",
+        ["request_class"],
+    )
+)
+idempotent_replays = registry.register(
+    Counter(
+        "graphql_idempotent_replays_total",
+        "Mutations answered with the stored result of an earlier request with the same idempotency key",
+        ["mutation"],
+    )
+)
+coalesced_executions = registry.register(
+    Counter(
+        "graphql_coalesced_executions_total",
+        "GraphQL read operations collapsed into an identical operation already in flight",
+        ["operation"],
+    )
+)
+
+
+suspected_n_plus_one = registry.register(
+    Counter(
+        "graphql_suspected_n_plus_one_total",
+        "SQL statements repeated often enough within one GraphQL operation to suggest N+1 queries",
+        ["operation"],
+    )
+)
+
+# Expanded IN lists differ in their number of parameters, not in their shape
+_IN_LIST = re.compile(r"\bIN \([^()]*\)", re.IGNORECASE)
+
+
+class OperationStats:
+    """
+    Statistics of the GraphQL operation being executed, collected while it runs.
+
+    Attributes:
+        name (str): The name of the operation.
+        sql_statements (int): The number of SQL statements executed so far.
+        sql_seconds (float): The time spent in SQL statements so far.
+        statements (Dict[str, int]): The number of executions of every SQL statement text.
+    """
+
+    __slots__ = ("name", "sql_statements", "sql_seconds", "statements")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Returns the statement shapes executed at least threshold times, most repeated first.
+
+        Statements are parameterized, so the lazy load of a relationship issued once per row
+        repeats the same text; expanded IN lists are folded into one shape.
+
+        Args:
+            threshold (int): The minimum number of executions.
+
+        Returns:
+            List[Tuple[str, int]]: The statement shapes and their number of executions.
+        """
+        shapes: Dict[str, int] = {}
+
+        for statement, count in self.statements.items():
+            shape = _IN_LIST.sub("IN (...)", " ".join(statement.split()))
+            shapes[shape] = shapes.get(shape, 0) + count
+
+        return sorted(
+            ((shape, count) for shape, count in shapes.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+current_operation: ContextVar[Optional[OperationStats]] = ContextVar(
+    "current_operation", default=None
+)
+
+# Callables receiving the statistics of every finished operation, e.g. query budgets in tests
+operation_observers: List[Callable[[OperationStats], None]] = []
+
+
+def operation_label(operation_name: Optional[str]) -> str:
+    return operation_name or "anonymous"
+
+
+@contextmanager
+def record_operation(operation_name: Optional[str]) -> Iterator[OperationStats]:
+    """
+    Times a GraphQL operation and attributes the SQL statements executed meanwhile to it.
+
+    The errors of the operation are counted by record_errors once its result is known.
+    When it finishes, statements it repeated SQL_N_PLUS_ONE_THRESHOLD times or more are
+    logged as suspected N+1 queries and its statistics are passed to operation_observers.
+
+    Args:
+        operation_name (str, optional): The name of the operation, "anonymous" if None.
+
+    Yields:
+        OperationStats: The statistics of the operation.
+    """
+    stats = OperationStats(operation_label(operation_name))
+    token = current_operation.set(stats)
+    started = time.perf_counter()
+
+    try:
+        yield stats
+    finally:
+        duration = time.perf_counter() - started
+
+        try:
+            current_operation.reset(token)
+        except ValueError:
+            # A streamed response closed by a disconnecting client is finalized in
+            # another context, which does not see the operation anyway
+            pass
+
+        if METRICS_ENABLED:
+            operation_duration.observe(duration, stats.name)
+            operation_sql_statements.observe(stats.sql_statements, stats.name)
+            operation_sql_duration.observe(stats.sql_seconds, stats.name)
+
+        if SQL_N_PLUS_ONE_THRESHOLD > 0:
+            report_n_plus_one(stats, SQL_N_PLUS_ONE_THRESHOLD)
+
+        for observer in operation_observers:
+            observer(stats)
+
+
+def report_n_plus_one(stats: OperationStats, threshold: int) -> List[Tuple[str, int]]:
+    """
+    Logs the statements an operation repeated at least threshold times as suspected N+1 queries.
+
+    Args:
+        stats (OperationStats): The statistics of the finished operation.
+        threshold (int): The number of executions of one statement shape that is suspicious.
+
+    Returns:
+        List[Tuple[str, int]]: The repeated statement shapes and their number of executions.
+    """
+    repeated = stats.repeated_statements(threshold)
+
+    for shape, count in repeated:
+        logger.warning(
+            "Suspected N+1 queries in operation %s: statement executed %d times: %s",
+            stats.name,
+            count,
+            shape,
+        )
+
+    if repeated and METRICS_ENABLED:
+        suspected_n_plus_one.inc(stats.name, amount=len(repeated))
+
+    return repeated
+
+
+def record_errors(operation_name: Optional[str], errors: Optional[Sequence]) -> None:
+    """
+    Counts the errors returned by a GraphQL operation.
+
+    Args:
+        operation_name (str, optional): The name of the operation.
+        errors (Sequence, optional): The errors of its result.
+    """
+    if METRICS_ENABLED and errors:
+        operation_errors.inc(operation_label(operation_name), amount=len(errors))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_operation.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_operation.get()
+    started = getattr(context, "_metrics_started", None)
+
+    if stats is not None and started is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += time.perf_counter() - started
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+_sql_metrics_installed = False
+
+
+def install_sql_metrics() -> None:
+    """
+    Attributes the SQL statements of every engine to the GraphQL operation executing them.
+    """
+    global _sql_metrics_installed
+
+    if _sql_metrics_installed:
+        return
+
+    from sqlalchemy import Engine, event
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _sql_metrics_installed = True
+
+
+def timed(histogram: Histogram, *labelvalues: str) -> Callable:
+    """
+    Decorator observing the duration of every call of a function in a histogram.
+
+    Args:
+        histogram (Histogram): The histogram the durations are observed in.
+        *labelvalues (str): The values of its labels.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+
+            with histogram.time(*labelvalues):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def resolver_label(resolver: Any) -> Optional[str]:
+    """
+    Returns the label of a resolver: its qualified name without the "resolve_" prefix.
+
+    Args:
+        resolver (Any): The resolver.
+
+    Returns:
+        str, optional: The label (e.g. "Query.get_all_user_notes" or "CreateNote.mutate")
+            or None for resolvers without a name, such as graphene's default resolver.
+    """
+    qualname = getattr(resolver, "__qualname__", None)
+
+    if not qualname:
+        return None
+
+    owner, _, name = qualname.rsplit("<locals>.", 1)[-1].rpartition(".")
+    name = name[len("resolve_") :] if name.startswith("resolve_") else name
+
+    return f"{owner}.{name}" if owner else name
+
+
+def timed_resolver(resolver: Callable, label: str) -> Callable:
+    """
+    Wraps a resolver to record its latency and exceptions under a label.
+
+    Args:
+        resolver (Callable): The resolver.
+        label (str): The value of the "resolver" label.
+
+    Returns:
+        Callable: The timed resolver, keeping the attributes (e.g. cache hints) of the original.
+    """
+
+    @wraps(resolver)
+    def wrapper(root, info, **args):
+        started = time.perf_counter()
+        try:
+            return resolver(root, info, **args)
+        except Exception:
+            resolver_errors.inc(label)
+            raise
+        finally:
+            resolver_duration.observe(time.perf_counter() - started, label)
+
+    wrapper.metrics_label = label
+    return wrapper
+
+
+def wrap_resolvers(
+    schema: GraphQLSchema,
+    wrap: Callable[[Callable, str], Callable],
+    marker: str,
+    nested_resolvers: bool,
+) -> None:
+    """
+    Wraps the resolvers of a schema in place, e.g. to time or trace them.
+
+    Only the resolvers of the root query and mutation fields are wrapped unless
+    nested_resolvers is enabled. Fields without a resolver of their own, resolvers that
+    resolver_label does not name and resolvers carrying the marker attribute, i.e. already
+    wrapped by the same instrumentation, are left as they are.
+
+    Args:
+        schema (GraphQLSchema): The schema whose resolvers are wrapped.
+        wrap (Callable[[Callable, str], Callable]): A function returning the wrapper of a
+            resolver given the resolver and its label.
+        marker (str): The attribute set on the wrappers returned by wrap.
+        nested_resolvers (bool): Whether the resolvers of nested fields are wrapped too.
+    """
+    if nested_resolvers:
+        types = [
+            named_type
+            for name, named_type in schema.type_map.items()
+            if isinstance(named_type, GraphQLObjectType) and not name.startswith("__")
+        ]
+    else:
+        types = [schema.query_type, schema.mutation_type]
+
+    for object_type in types:
+        if object_type is None:
+            continue
+
+        for field in object_type.fields.values():
+            if field.resolve is None or hasattr(field.resolve, marker):
+                continue
+
+            label = resolver_label(field.resolve)
+            if label is not None:
+                field.resolve = wrap(field.resolve, label)
+
+
+def instrument_resolvers(
+    schema: GraphQLSchema, nested_resolvers: bool = METRICS_NESTED_RESOLVERS
+) -> None:
+    """
+    Records the latency and exceptions of the resolvers of a schema.
+
+    Only the resolvers of the root query and mutation fields are timed, unless
+    nested_resolvers is enabled: nested resolvers run once per item of a list, so timing them
+    would add to every row of a large response. The resolvers are wrapped in the schema
+    itself rather than by an execution middleware, so fields that are not timed do not pay
+    for an extra call, and operations run by compiled execution plans are timed as well.
+    Fields without a resolver of their own are never timed.
+
+    Args:
+        schema (GraphQLSchema): The schema to be instrumented.
+        nested_resolvers (bool): Whether the resolvers of nested fields are timed too.
+    """
+    wrap_resolvers(schema, timed_resolver, "metrics_label", nested_resolvers)
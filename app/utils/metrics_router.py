@@ -0,0 +1,39 @@
+import secrets
+
+from fastapi import APIRouter, Request
+from starlette.responses import Response
+
+from app.utils.env import getenv
+from app.utils.export import require_admin
+from app.utils.metrics import CONTENT_TYPE, registry
+
+METRICS_TOKEN = getenv("METRICS_TOKEN")
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics(request: Request) -> Response:
+    """
+    Exposes the metrics in the Prometheus text format.
+
+    The metrics are restricted to admins, like the profiles and memory snapshots. Scrapers
+    that cannot log in can send METRICS_TOKEN, if it is set, as a bearer token instead.
+
+    Args:
+        request (Request): The scrape request.
+
+    Returns:
+        Response: The exposition.
+
+    Raises:
+        HTTPException: 401 if the request carries neither the metrics token nor a valid JWT,
+            403 if the user is not an admin.
+    """
+    authorization = request.headers.get("Authorization", "")
+    if not METRICS_TOKEN or not secrets.compare_digest(
+        authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        require_admin(request)
+
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,14 +1,31 @@
 import hashlib
+from functools import lru_cache
 from typing import Dict
 
-import requests
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
 from graphql import GraphQLError
 
-ph = PasswordHasher()
+from app.utils.metrics import hibp_duration, password_duration, timed
+from app.utils.tracing import SPAN_KIND_CLIENT, traced
 
 
+@lru_cache(maxsize=None)
+def get_password_hasher():
+    """
+    Returns the shared Argon2 password hasher.
+
+    argon2 is imported on the first call, so processes that never hash a password do not
+    pay for loading it at startup.
+
+    Returns:
+        argon2.PasswordHasher: The password hasher.
+    """
+    from argon2 import PasswordHasher
+
+    return PasswordHasher()
+
+
+@timed(password_duration, "hash")
+@traced("argon2.hash")
 def hash_password(password: str) -> str:
     """
     Hashes a given password using the Argon2 algorithm.
@@ -19,9 +36,11 @@ def hash_password(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return ph.hash(password)
+    return get_password_hasher().hash(password)
 
 
+@timed(password_duration, "verify")
+@traced("argon2.verify")
 def verify_password(password_hash: str, password: str) -> None:
     """
     Verifies if the given password matches the hashed password.
@@ -39,8 +58,10 @@ def verify_password(password_hash: str, password: str) -> None:
     Raises:
         GraphQLError: If the passwords do not match.
     """
+    from argon2.exceptions import VerifyMismatchError
+
     try:
-        ph.verify(password_hash, password)
+        get_password_hasher().verify(password_hash, password)
     except VerifyMismatchError:
         raise GraphQLError("Invalid email or password")
 
@@ -72,6 +93,8 @@ def is_password_safe(password: str) -> bool:
     return True
 
 
+@timed(hibp_duration)
+@traced("hibp.range", SPAN_KIND_CLIENT)
 def get_hashes_from_hibp(password_hash: str) -> str:
     """
     Retrieves the hashes from the Have I Been Pwned database that match the first 5 characters of the given password hash.
@@ -83,6 +106,8 @@ def get_hashes_from_hibp(password_hash: str) -> str:
         str: The hashes from the HIBP database.
     """
 
+    import requests
+
     password_hash_prefix = password_hash[:5]
     url = "https://api.pwnedpasswords.com/range/"
 
@@ -0,0 +1,318 @@
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from types import CodeType, FrameType, SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from graphql import GraphQLError
+from starlette.responses import PlainTextResponse, Response
+
+from app.utils.decorators import admin_user
+from app.utils.env import getenv
+from app.utils.export import require_admin
+from app.utils.serialization import FastJSONResponse
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_INTERVAL_MS = float(getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_STORE_SIZE = int(getenv("PROFILE_STORE_SIZE", 20))
+
+# The first category found walking a sample's stack from its innermost frame wins, so
+# a SQL statement executed by a resolver counts as SQLAlchemy, not as GraphQL execution
+CATEGORIES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("argon2", ("/argon2/",)),
+    ("sqlalchemy", ("/sqlalchemy/", "/sqlite3/", "/psycopg/", "/psycopg2/")),
+    ("serialization", ("/orjson/", "/json/", "app/utils/serialization.py")),
+    ("graphql", ("/graphql/", "/graphene/", "/starlette_graphene3/")),
+)
+OTHER_CATEGORY = "other"
+
+router = APIRouter(prefix="/profiles")
+
+
+def frame_name(code: CodeType) -> str:
+    """
+    Returns the name of a frame in a profile: its module path and qualified function name.
+
+    Args:
+        code (CodeType): The code object of the frame.
+
+    Returns:
+        str: The name, e.g. "graphql/execution/execute.py:ExecutionContext.execute_field".
+    """
+    path = code.co_filename.replace("\\", "/")
+    if "site-packages/" in path:
+        path = path.rsplit("site-packages/", 1)[1]
+    elif "/app/" in path:
+        path = "app/" + path.rsplit("/app/", 1)[1]
+    elif "/lib/python" in path:
+        path = path.rsplit("/lib/python", 1)[1].split("/", 1)[-1]
+
+    return f"{path}:{code.co_qualname}"
+
+
+def categorize(codes: List[CodeType]) -> str:
+    """
+    Returns the category of a sample from the code objects of its stack, innermost first.
+
+    Args:
+        codes (List[CodeType]): The code objects of the stack.
+
+    Returns:
+        str: One of the CATEGORIES or "other".
+    """
+    for code in codes:
+        path = code.co_filename.replace("\\", "/")
+        for category, fragments in CATEGORIES:
+            if any(fragment in path for fragment in fragments):
+                return category
+
+    return OTHER_CATEGORY
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stack of one thread at a fixed interval.
+
+    A background thread reads the profiled thread's current frame every interval, so the
+    profiled code runs unmodified and the overhead does not depend on how many functions
+    it calls. The sampler needs the GIL, so a busy thread is effectively sampled at most
+    once per interpreter switch interval (5 ms by default).
+
+    A request is profiled on the event loop's thread, which runs the other requests
+    whenever the profiled one awaits. Given the frame of the profiled coroutine, only the
+    samples whose stack contains it are recorded; the others, taken while the thread ran
+    other requests or waited for I/O, are only counted as excluded samples. Operations of
+    a concurrent batch run in the threadpool and are not sampled.
+
+    Attributes:
+        interval (float): The time between samples, in seconds.
+        thread_id (int): The identifier of the profiled thread.
+        frame (FrameType, optional): The frame the recorded samples have to go through.
+        excluded (int): The number of samples outside of the frame.
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        thread_id: Optional[int] = None,
+        frame: Optional[FrameType] = None,
+    ):
+        self.interval = interval_ms / 1000
+        self.thread_id = thread_id or threading.get_ident()
+        self.frame = frame
+        self.excluded = 0
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.started = 0.0
+        self.duration = 0.0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopping.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            frame: Optional[FrameType] = sys._current_frames().get(self.thread_id)
+            codes = []
+            inside = self.frame is None
+            while frame is not None:
+                codes.append(frame.f_code)
+                inside = inside or frame is self.frame
+                frame = frame.f_back
+
+            if not inside:
+                self.excluded += 1
+            elif codes:
+                self.stacks[tuple(reversed(codes))] += 1
+                self.categories[categorize(codes)] += 1
+
+    def folded(self) -> str:
+        """
+        Returns the samples in the folded stack format of flame graph tools such as
+        flamegraph.pl, inferno or speedscope: one line per distinct stack, its frames from
+        the outermost separated by semicolons, followed by its number of samples.
+
+        Returns:
+            str: The folded stacks.
+        """
+        lines = [
+            f"{';'.join(frame_name(code) for code in stack)} {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the number of samples, the profiled duration and its breakdown by category.
+
+        The estimated times are shares of the duration, of which the excluded samples take
+        their own share, so they do not include the time spent on other requests.
+
+        Returns:
+            Dict[str, Any]: The recorded and excluded samples, the interval and duration in
+                milliseconds, and for every category its samples, share of the recorded
+                samples and estimated time.
+        """
+        samples = sum(self.categories.values())
+        duration_ms = self.duration * 1000
+        total = samples + self.excluded
+        breakdown = {}
+
+        for category in [name for name, _ in CATEGORIES] + [OTHER_CATEGORY]:
+            share = self.categories[category] / samples if samples else 0.0
+            breakdown[category] = {
+                "samples": self.categories[category],
+                "percent": round(share * 100, 1),
+                "estimated_ms": round(
+                    duration_ms * self.categories[category] / total if total else 0.0,
+                    3,
+                ),
+            }
+
+        return {
+            "samples": samples,
+            "excluded_samples": self.excluded,
+            "interval_ms": self.interval * 1000,
+            "duration_ms": round(duration_ms, 3),
+            "breakdown": breakdown,
+        }
+
+
+class ProfileStore:
+    """
+    Thread-safe store of the latest profiles, for later download.
+
+    Attributes:
+        max_entries (int): The maximum number of stored profiles.
+    """
+
+    def __init__(self, max_entries: int = PROFILE_STORE_SIZE):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, folded: str) -> str:
+        """
+        Stores a profile, dropping the oldest one if the store is full.
+
+        Args:
+            folded (str): The folded stacks of the profile.
+
+        Returns:
+            str: The id of the profile.
+        """
+        profile_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._profiles[profile_id] = folded
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+profile_store = ProfileStore()
+
+
+@admin_user
+def _authorize_profiling(root, info) -> bool:
+    return True
+
+
+def profiling_requested(request: Request, context: Dict[str, Any]) -> bool:
+    """
+    Checks if a request asks to be profiled and is sent by an admin.
+
+    The admin is authenticated like for the resolvers decorated with admin_user, sharing
+    the request's context, so the operations of the request reuse the lookup. Requests of
+    other users carrying the header are executed normally.
+
+    Args:
+        request (Request): The request.
+        context (Dict[str, Any]): The context the request's operations are executed with.
+
+    Returns:
+        bool: True if the request is to be profiled.
+    """
+    if request.headers.get(PROFILE_HEADER, "").lower() not in ("1", "true"):
+        return False
+
+    try:
+        return _authorize_profiling(None, SimpleNamespace(context=context))
+    except GraphQLError:
+        return False
+
+
+def profiled_response(response: Response, profiler: SamplingProfiler) -> Response:
+    """
+    Stores the profile of a request and returns its response with the profile attached.
+
+    The id of the stored profile is sent in the X-Profile-Id header; a single operation's
+    result also gets the profile's summary in its "profile" extension.
+
+    Args:
+        response (Response): The JSON response of the profiled request.
+        profiler (SamplingProfiler): The stopped profiler.
+
+    Returns:
+        Response: The response with the profile attached.
+    """
+    profile_id = profile_store.add(profiler.folded())
+    body = json.loads(response.body)
+
+    if isinstance(body, dict):
+        body.setdefault("extensions", {})["profile"] = {
+            "id": profile_id,
+            "download": f"{router.prefix}/{profile_id}",
+            **profiler.summary(),
+        }
+        response = FastJSONResponse(
+            body, status_code=response.status_code, background=response.background
+        )
+
+    response.headers[PROFILE_ID_HEADER] = profile_id
+    return response
+
+
+@router.get("/{profile_id}")
+def download_profile(request: Request, profile_id: str) -> PlainTextResponse:
+    """
+    Downloads a stored profile as folded stacks.
+
+    Args:
+        request (Request): The request, authenticated as an admin.
+        profile_id (str): The id returned with the profiled response.
+
+    Returns:
+        PlainTextResponse: The folded stacks.
+
+    Raises:
+        HTTPException: 404 if the profile does not exist or was already dropped.
+    """
+    require_admin(request)
+
+    folded = profile_store.get(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return PlainTextResponse(folded)
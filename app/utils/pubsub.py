@@ -0,0 +1,246 @@
+import asyncio
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Set
+
+from app.utils.env import getenv
+
+PUBSUB_BROKER = getenv("PUBSUB_BROKER", "app.utils.pubsub:InProcessBroker")
+PUBSUB_QUEUE_SIZE = int(getenv("PUBSUB_QUEUE_SIZE", 100))
+
+
+class Subscription:
+    """
+    A single subscriber of a broker channel.
+
+    Messages are buffered in a bounded queue. When the queue is full the subscriber is considered
+    too slow and is dropped by the broker: it receives the messages that are already buffered and
+    then its iteration ends.
+
+    Attributes:
+        channel (str): The channel the subscription listens on.
+        dropped (bool): True if the subscriber has been dropped for being too slow.
+    """
+
+    def __init__(self, broker: "Broker", channel: str, max_queue_size: int):
+        self.channel = channel
+        self.dropped = False
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue_size)
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Any:
+        while True:
+            if self._queue.empty() and (self.dropped or self._closed):
+                raise StopAsyncIteration
+
+            message = await self._queue.get()
+
+            if message is not _WAKE_UP:
+                return message
+
+    async def aclose(self) -> None:
+        # Callers closing an async iterator cancel its pending __anext__ themselves,
+        # so unlike close() this does not wake the consumer up
+        self._closed = True
+        self._broker.unsubscribe(self)
+
+    def deliver(self, message: Any) -> bool:
+        """
+        Puts a message into the subscriber's queue.
+
+        The method has to be called from the subscriber's event loop.
+
+        Args:
+            message (Any): The message to be delivered.
+
+        Returns:
+            bool: False if the queue is full and the subscriber should be dropped.
+        """
+        if self._closed:
+            return True
+
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+
+        return True
+
+    def close(self) -> None:
+        """
+        Unsubscribes from the broker and ends the iteration once the queue is drained.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._broker.unsubscribe(self)
+
+        try:
+            self._queue.put_nowait(_WAKE_UP)
+        except asyncio.QueueFull:
+            pass
+
+
+class Broker(ABC):
+    """
+    Interface of the publish/subscribe hub used by GraphQL subscriptions.
+
+    Implementations have to deliver every published message to the subscriptions of its channel.
+    A broker used by multi-worker deployments can relay the messages through an external bus and
+    deliver them to its local subscribers.
+    """
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        """
+        Creates a subscription of the given channel.
+
+        Args:
+            channel (str): The channel to subscribe to.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Removes a subscription from the broker.
+
+        Args:
+            subscription (Subscription): The subscription to be removed.
+        """
+
+    @abstractmethod
+    def publish(self, channel: str, message: Any) -> None:
+        """
+        Publishes a message to every subscriber of the given channel.
+
+        Args:
+            channel (str): The channel to publish to.
+            message (Any): The message to be published.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the broker statistics.
+
+        Returns:
+            Dict[str, int]: The number of subscribers, published and delivered messages and dropped subscribers.
+        """
+
+
+class InProcessBroker(Broker):
+    """
+    Broker delivering messages to subscribers living in the same process.
+
+    Publishing is thread-safe: messages published from a thread other than the subscriber's
+    event loop are handed over to that loop.
+    """
+
+    def __init__(self, max_queue_size: int = PUBSUB_QUEUE_SIZE):
+        self.max_queue_size = max_queue_size
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._published = 0
+        self._delivered = 0
+        self._dropped = 0
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.max_queue_size)
+
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel: str, message: Any) -> None:
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+            self._published += 1
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        for subscription in subscribers:
+            if subscription._loop is running_loop:
+                self._deliver(subscription, message)
+            else:
+                subscription._loop.call_soon_threadsafe(
+                    self._deliver, subscription, message
+                )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": sum(len(s) for s in self._channels.values()),
+                "channels": len(self._channels),
+                "published": self._published,
+                "delivered": self._delivered,
+                "dropped": self._dropped,
+            }
+
+    def _deliver(self, subscription: Subscription, message: Any) -> None:
+        if subscription.deliver(message):
+            with self._lock:
+                self._delivered += 1
+            return
+
+        subscription.dropped = True
+        self.unsubscribe(subscription)
+
+        with self._lock:
+            self._dropped += 1
+
+
+def load_broker(path: str = PUBSUB_BROKER) -> Broker:
+    """
+    Instantiates the broker class configured by the PUBSUB_BROKER environment variable.
+
+    Args:
+        path (str): The broker class in the "package.module:ClassName" format.
+
+    Returns:
+        Broker: The broker instance.
+    """
+    module_name, class_name = path.split(":")
+    broker_class = getattr(importlib.import_module(module_name), class_name)
+
+    return broker_class()
+
+
+def note_channel(user_id: int) -> str:
+    """
+    Returns the name of the channel on which changes of the given user's notes are published.
+
+    Args:
+        user_id (int): The ID of the notes' owner.
+
+    Returns:
+        str: The channel name.
+    """
+    return f"notes:{user_id}"
+
+
+_WAKE_UP = object()
+
+broker = load_broker()
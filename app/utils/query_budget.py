@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from app.utils.metrics import (
+    OperationStats,
+    install_sql_metrics,
+    operation_label,
+    operation_observers,
+    record_operation,
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a GraphQL operation executes more SQL statements than its budget allows.
+    """
+
+
+class QueryBudget:
+    """
+    Records the GraphQL operations finished while it is active and checks their number of
+    SQL statements against the budgets declared for them.
+
+    Meant for tests: a budget pins down the number of statements of an operation, so a
+    change introducing N+1 queries fails instead of only slowing production down.
+
+    Attributes:
+        budgets (Dict[str, int]): The maximum number of statements of every operation name.
+        operations (List[OperationStats]): The statistics of the recorded operations.
+    """
+
+    def __init__(self):
+        self.budgets: Dict[str, int] = {}
+        self.operations: List[OperationStats] = []
+
+    def __enter__(self) -> "QueryBudget":
+        install_sql_metrics()
+        operation_observers.append(self.operations.append)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        operation_observers.remove(self.operations.append)
+
+    def expect(self, operation_name: Optional[str], max_statements: int) -> None:
+        """
+        Declares the maximum number of SQL statements of an operation.
+
+        Args:
+            operation_name (str, optional): The name of the operation, None if anonymous.
+            max_statements (int): The maximum number of statements of one execution.
+        """
+        self.budgets[operation_label(operation_name)] = max_statements
+
+    @contextmanager
+    def operation(
+        self, operation_name: Optional[str], max_statements: Optional[int] = None
+    ) -> Iterator[OperationStats]:
+        """
+        Records the statements executed in the block as an operation, for code that does
+        not run through the GraphQL app, and optionally declares its budget.
+
+        Args:
+            operation_name (str, optional): The name of the operation, None if anonymous.
+            max_statements (int, optional): The maximum number of statements of the block.
+
+        Yields:
+            OperationStats: The statistics of the operation.
+        """
+        if max_statements is not None:
+            self.expect(operation_name, max_statements)
+
+        with record_operation(operation_name) as stats:
+            yield stats
+
+    def check(self) -> None:
+        """
+        Checks every recorded execution of the operations with a budget.
+
+        Raises:
+            QueryBudgetExceeded: If an execution exceeded its budget, listing its statements,
+                or if an operation with a budget was not executed at all.
+        """
+        failures = []
+
+        for name, budget in self.budgets.items():
+            executions = [stats for stats in self.operations if stats.name == name]
+
+            if not executions:
+                failures.append(f"Operation {name} was not executed")
+
+            for stats in executions:
+                if stats.sql_statements > budget:
+                    failures.append(describe(stats, budget))
+
+        if failures:
+            raise QueryBudgetExceeded("\n\n".join(failures))
+
+
+def describe(stats: OperationStats, budget: int) -> str:
+    """
+    Describes an operation exceeding its budget, with its statements most repeated first.
+
+    Args:
+        stats (OperationStats): The statistics of the operation.
+        budget (int): Its maximum number of statements.
+
+    Returns:
+        str: The description.
+    """
+    lines = [
+        f"Operation {stats.name} executed {stats.sql_statements} SQL statements, "
+        f"its budget is {budget}:"
+    ]
+    lines.extend(
+        f"  {count} x {shape}" for shape, count in stats.repeated_statements(1)
+    )
+    return "\n".join(lines)
+
+
+@contextmanager
+def assert_query_budget(
+    operation_name: Optional[str], max_statements: int
+) -> Iterator[QueryBudget]:
+    """
+    Asserts that every execution of an operation in the block stays within a budget.
+
+    Args:
+        operation_name (str, optional): The name of the operation, None if anonymous.
+        max_statements (int): The maximum number of statements of one execution.
+
+    Yields:
+        QueryBudget: The budget, which other operations can be declared on.
+
+    Raises:
+        QueryBudgetExceeded: If an execution exceeded its budget or none happened.
+    """
+    with QueryBudget() as budget:
+        budget.expect(operation_name, max_statements)
+        yield budget
+
+    budget.check()
@@ -0,0 +1,291 @@
+import importlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from graphql import GraphQLError
+
+from app.utils.env import getenv
+from app.utils.metrics import rate_limited
+
+RATE_LIMIT_ENABLED = getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = getenv(
+    "RATE_LIMIT_BACKEND", "app.utils.rate_limit:InMemoryRateLimitBackend"
+)
+RATE_LIMIT_MAX_KEYS = int(getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+RATE_LIMIT_LOGIN_PER_EMAIL = getenv("RATE_LIMIT_LOGIN_PER_EMAIL", "10/60")
+RATE_LIMIT_LOGIN_PER_IP = getenv("RATE_LIMIT_LOGIN_PER_IP", "100/60")
+RATE_LIMIT_REGISTER_PER_EMAIL = getenv("RATE_LIMIT_REGISTER_PER_EMAIL", "5/3600")
+RATE_LIMIT_REGISTER_PER_IP = getenv("RATE_LIMIT_REGISTER_PER_IP", "20/3600")
+RATE_LIMIT_PASSWORD_PER_EMAIL = getenv("RATE_LIMIT_PASSWORD_PER_EMAIL", "5/3600")
+RATE_LIMIT_PASSWORD_PER_IP = getenv("RATE_LIMIT_PASSWORD_PER_IP", "20/3600")
+
+
+class Rate(NamedTuple):
+    """
+    The number of attempts allowed per window of seconds.
+    """
+
+    limit: int
+    window: float
+
+
+def parse_rate(value: Optional[str]) -> Optional[Rate]:
+    """
+    Parses a rate written as "attempts/seconds", e.g. "10/60".
+
+    Args:
+        value (str, optional): The rate.
+
+    Returns:
+        Rate, optional: The rate, or None if it is empty or "0", which disables the limit.
+
+    Raises:
+        ValueError: If the rate is malformed.
+    """
+    if not value or value.strip() == "0":
+        return None
+
+    limit, _, window = value.partition("/")
+    rate = Rate(int(limit), float(window or 1))
+
+    if rate.limit < 1 or rate.window <= 0:
+        raise ValueError(f"Invalid rate: {value}")
+
+    return rate
+
+
+class RateLimitBackend(ABC):
+    """
+    Interface of the storage of the rate limiters' counters.
+
+    The limiters use sliding window counters: every key counts its attempts in fixed
+    windows, and the rate over the last window length is estimated from the counts of the
+    current and the previous window. A backend shared by multi-worker deployments can
+    keep the counters in an external store, e.g. with INCR and EXPIRE on a key per window.
+    """
+
+    @abstractmethod
+    def increment(self, key: str, window: float, now: float) -> Tuple[int, int]:
+        """
+        Counts an attempt in the current window of a key.
+
+        Args:
+            key (str): The key.
+            window (float): The length of the windows, in seconds.
+            now (float): The time of the attempt, in seconds since the epoch.
+
+        Returns:
+            Tuple[int, int]: The number of attempts in the previous window and in the
+                current one, this attempt included.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the backend statistics.
+
+        Returns:
+            Dict[str, int]: The number of tracked keys and of evicted ones.
+        """
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Backend keeping the counters in the memory of the process.
+
+    Every key holds one tuple of its window number and its current and previous counts.
+    Keys are grouped by window length and kept in the order of their last attempt, so the
+    expired ones, whose last attempt is older than two windows, are always the oldest and
+    are dropped in time proportional to their number. At most max_keys keys are kept per
+    window length; beyond that the least recently attempted ones are evicted.
+
+    Attributes:
+        max_keys (int): The maximum number of keys per window length.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters: Dict[float, Dict[str, Tuple[int, int, int]]] = {}
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def increment(self, key: str, window: float, now: float) -> Tuple[int, int]:
+        number = int(now // window)
+
+        with self._lock:
+            counters = self._counters.setdefault(window, {})
+            self._expire(counters, number)
+
+            # Re-inserting the key moves it to the end of the insertion order
+            last, current, previous = counters.pop(key, (number, 0, 0))
+            if last == number - 1:
+                current, previous = 0, current
+            elif last != number:
+                current, previous = 0, 0
+
+            counters[key] = (number, current + 1, previous)
+
+            while len(counters) > self.max_keys:
+                del counters[next(iter(counters))]
+                self._evicted += 1
+
+        return previous, current + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "keys": sum(len(counters) for counters in self._counters.values()),
+                "evicted": self._evicted,
+            }
+
+    @staticmethod
+    def _expire(counters: Dict[str, Tuple[int, int, int]], number: int) -> None:
+        while counters:
+            key = next(iter(counters))
+            if counters[key][0] >= number - 1:
+                break
+            del counters[key]
+
+
+def load_backend(path: str = RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    """
+    Instantiates the backend class configured by the RATE_LIMIT_BACKEND environment variable.
+
+    Args:
+        path (str): The backend class in the "package.module:ClassName" format.
+
+    Returns:
+        RateLimitBackend: The backend instance.
+    """
+    module_name, class_name = path.split(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+
+    return backend_class()
+
+
+backend = load_backend()
+
+
+def client_ip(context: Any) -> Optional[str]:
+    """
+    Returns the IP address of the client of a GraphQL request.
+
+    Behind a reverse proxy this is the proxy's address, unless the server is run with
+    trusted proxy headers (uvicorn --proxy-headers --forwarded-allow-ips).
+
+    Args:
+        context (Any): The context of the operation, holding its request.
+
+    Returns:
+        str, optional: The address, or None if it is unknown.
+    """
+    request = context.get("request") if isinstance(context, dict) else None
+    client = getattr(request, "scope", {}).get("client") if request else None
+
+    return client[0] if client else None
+
+
+class RateLimiter:
+    """
+    Limits the attempts of an action per email and per client IP.
+
+    An attempt over either limit is rejected with a GraphQLError before the action does
+    any work, and rejected attempts are counted too, so a client retrying in a loop stays
+    rejected until it slows down.
+
+    Attributes:
+        action (str): The name of the action, used in the keys and metrics.
+        per_email (Rate, optional): The rate allowed per email, None for no limit.
+        per_ip (Rate, optional): The rate allowed per client IP, None for no limit.
+        backend (RateLimitBackend, optional): The storage of the counters, by default the
+            configured one.
+        enabled (bool): Whether attempts are limited at all.
+    """
+
+    def __init__(
+        self,
+        action: str,
+        per_email: Optional[Rate],
+        per_ip: Optional[Rate],
+        backend: Optional[RateLimitBackend] = None,
+        enabled: bool = RATE_LIMIT_ENABLED,
+    ):
+        self.action = action
+        self.per_email = per_email
+        self.per_ip = per_ip
+        self.backend = backend
+        self.enabled = enabled
+
+    def hit(self, key: str, rate: Rate, now: float) -> float:
+        """
+        Counts an attempt for a key and returns how long to wait if it is over the rate.
+
+        Args:
+            key (str): The key.
+            rate (Rate): The rate allowed for the key.
+            now (float): The time of the attempt, in seconds since the epoch.
+
+        Returns:
+            float: 0 if the attempt is allowed, otherwise the seconds until the current
+                window ends.
+        """
+        previous, current = (self.backend or backend).increment(key, rate.window, now)
+        elapsed = now % rate.window
+        estimate = previous * (1 - elapsed / rate.window) + current
+
+        return rate.window - elapsed if estimate > rate.limit else 0.0
+
+    def check(self, context: Any, email: Optional[str]) -> None:
+        """
+        Counts an attempt of the action and rejects it if it is over a limit.
+
+        Args:
+            context (Any): The context of the operation, holding its request.
+            email (str, optional): The email the attempt is made for.
+
+        Raises:
+            GraphQLError: If there were too many attempts for the email or from the IP.
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        keys = []
+        if self.per_email is not None and email:
+            keys.append(("email", email.strip().lower(), self.per_email))
+        ip = client_ip(context)
+        if self.per_ip is not None and ip:
+            keys.append(("ip", ip, self.per_ip))
+
+        for kind, value, rate in keys:
+            retry_after = self.hit(f"{self.action}:{kind}:{value}", rate, now)
+
+            if retry_after:
+                rate_limited.inc(self.action, kind)
+                raise GraphQLError(
+                    f"Too many attempts, please try again in {math.ceil(retry_after)} seconds",
+                    extensions={
+                        "code": "RATE_LIMITED",
+                        "retryAfter": math.ceil(retry_after),
+                    },
+                )
+
+
+login_limiter = RateLimiter(
+    "login",
+    parse_rate(RATE_LIMIT_LOGIN_PER_EMAIL),
+    parse_rate(RATE_LIMIT_LOGIN_PER_IP),
+)
+register_limiter = RateLimiter(
+    "register",
+    parse_rate(RATE_LIMIT_REGISTER_PER_EMAIL),
+    parse_rate(RATE_LIMIT_REGISTER_PER_IP),
+)
+password_change_limiter = RateLimiter(
+    "password_change",
+    parse_rate(RATE_LIMIT_PASSWORD_PER_EMAIL),
+    parse_rate(RATE_LIMIT_PASSWORD_PER_IP),
+)
@@ -0,0 +1,58 @@
+import json
+import logging
+from datetime import date, datetime
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+    logger.warning(
+        "orjson is not installed, responses are serialized with the slower json module"
+    )
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes a value to compact UTF-8 encoded JSON.
+
+    orjson is used when it is installed, otherwise the function falls back to the standard
+    library encoder. Both encoders serialize datetime and date values natively as ISO 8601
+    strings, so rows such as notes with their created_at/updated_at can be encoded directly.
+
+    Args:
+        content (Any): The value to be serialized.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the fastest available encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,727 @@
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from graphql import GraphQLSchema
+
+from app.utils.env import getenv
+from app.utils.metrics import operation_label, wrap_resolvers
+
+TRACING_ENABLED = getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SAMPLE_RATE = float(getenv("TRACING_SAMPLE_RATE", 1.0))
+TRACING_EXPORTER = getenv("TRACING_EXPORTER", "otlp").lower()
+TRACING_JSON_PATH = getenv("TRACING_JSON_PATH", "traces.jsonl")
+TRACING_NESTED_RESOLVERS = getenv("TRACING_NESTED_RESOLVERS", "false").lower() == "true"
+TRACING_BATCH_SIZE = int(getenv("TRACING_BATCH_SIZE", 512))
+TRACING_QUEUE_SIZE = int(getenv("TRACING_QUEUE_SIZE", 2048))
+TRACING_EXPORT_INTERVAL = float(getenv("TRACING_EXPORT_INTERVAL", 5))
+OTEL_SERVICE_NAME = getenv("OTEL_SERVICE_NAME", "todo-graphql-backend")
+OTEL_EXPORTER_OTLP_ENDPOINT = getenv(
+    "OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"
+)
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    A timed unit of work of a trace, following the OpenTelemetry data model.
+
+    Attributes:
+        name (str): The name of the span.
+        trace_id (str): The 32 hex digit id of its trace.
+        span_id (str): Its 16 hex digit id.
+        parent_id (str, optional): The id of its parent span, None for a root span.
+        kind (int): The OTLP span kind.
+        attributes (Dict[str, Any]): Its attributes.
+        start_ns (int): When it started, in nanoseconds since the epoch.
+        end_ns (int): When it ended, 0 while it is running.
+        status (int): The OTLP status code.
+        status_message (str): The description of an error status.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def record_exception(self, error: BaseException) -> None:
+        """
+        Sets the error status of the span from an exception.
+
+        Args:
+            error (BaseException): The exception raised in the span.
+        """
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+        self.attributes["exception.type"] = type(error).__name__
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        Returns the span in the JSON encoding of OTLP.
+
+        Returns:
+            Dict[str, Any]: The span.
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": encode_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+
+        return span
+
+
+def encode_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Encodes attributes as OTLP key-value pairs.
+
+    Args:
+        attributes (Dict[str, Any]): The attributes.
+
+    Returns:
+        List[Dict[str, Any]]: The encoded attributes.
+    """
+    encoded = []
+
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded_value = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded_value = {"doubleValue": value}
+        else:
+            encoded_value = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": encoded_value})
+
+    return encoded
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parses a W3C traceparent header.
+
+    Args:
+        header (str, optional): The header.
+
+    Returns:
+        Tuple[str, str, bool], optional: The trace id, the parent span id and whether the
+            parent was sampled, or None if the header is missing or invalid.
+    """
+    match = _TRACEPARENT.match((header or "").strip().lower())
+
+    if match is None:
+        return None
+
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    """
+    Returns the W3C traceparent header propagating a sampled span.
+
+    Args:
+        span (Span): The span.
+
+    Returns:
+        str: The header.
+    """
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+class SpanExporter(ABC):
+    """
+    Base class of the exporters sending finished spans to a backend.
+    """
+
+    @abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        """
+        Exports a batch of finished spans.
+
+        Args:
+            spans (List[Span]): The spans.
+        """
+
+    def shutdown(self) -> None:
+        """
+        Releases the resources of the exporter.
+        """
+
+
+def resource_spans(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Wraps spans in the resourceSpans envelope of an OTLP export request.
+
+    Args:
+        spans (List[Span]): The spans.
+
+    Returns:
+        Dict[str, Any]: The export request.
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": encode_attributes({"service.name": OTEL_SERVICE_NAME})
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class OTLPExporter(SpanExporter):
+    """
+    Sends spans to an OpenTelemetry collector with OTLP over HTTP, JSON encoded.
+
+    Attributes:
+        endpoint (str): The traces endpoint of the collector.
+        timeout (float): The timeout of an export request, in seconds.
+    """
+
+    def __init__(
+        self, endpoint: str = OTEL_EXPORTER_OTLP_ENDPOINT, timeout: float = 10.0
+    ):
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]) -> None:
+        import requests
+
+        requests.post(
+            self.endpoint, json=resource_spans(spans), timeout=self.timeout
+        ).raise_for_status()
+
+
+class JSONFileExporter(SpanExporter):
+    """
+    Appends spans to a local file, one OTLP JSON export request per line, for offline use.
+
+    Attributes:
+        path (str): The path of the file.
+    """
+
+    def __init__(self, path: str = TRACING_JSON_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(resource_spans(spans), separators=(",", ":"))
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+EXPORTERS: Dict[str, Callable[[], SpanExporter]] = {
+    "otlp": OTLPExporter,
+    "json": JSONFileExporter,
+}
+
+
+class BatchSpanProcessor:
+    """
+    Queues finished spans and exports them in batches from a background thread.
+
+    Spans are dropped rather than blocking requests when the queue is full, for example
+    while the collector is unreachable. A batch is exported when batch_size spans are
+    waiting or every interval seconds.
+
+    Attributes:
+        exporter (SpanExporter): The exporter of the batches.
+        batch_size (int): The maximum number of spans exported at once.
+        interval (float): The maximum time a span waits for its export, in seconds.
+        dropped (int): The number of spans dropped so far.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        batch_size: int = TRACING_BATCH_SIZE,
+        queue_size: int = TRACING_QUEUE_SIZE,
+        interval: float = TRACING_EXPORT_INTERVAL,
+    ):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(queue_size)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_end(self, span: Span) -> None:
+        """
+        Queues a finished span.
+
+        Args:
+            span (Span): The span.
+        """
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if self._thread is None:
+            self._start()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Exports all queued spans.
+        """
+        with self._lock:
+            while not self._queue.empty():
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.exception("Failed to export %d spans", len(batch))
+
+    def shutdown(self) -> None:
+        """
+        Stops the background thread, exports the remaining spans and shuts the exporter down.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+        self.exporter.shutdown()
+        self._stopping.clear()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._stopping.is_set():
+                self._thread = threading.Thread(
+                    target=self._run, name="span-export", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+class Tracer:
+    """
+    Creates the spans of sampled traces and hands the finished ones to a processor.
+
+    Whether a trace is recorded is decided once, when its root span starts: a trace
+    continued from a traceparent header follows the sampling decision of its caller, any
+    other trace is sampled with probability sample_rate, derived from its trace id like
+    OpenTelemetry's TraceIdRatioBased sampler. Spans of unsampled traces are never
+    created, so they cost a context variable lookup.
+
+    Attributes:
+        processor (BatchSpanProcessor, optional): The processor of finished spans, None
+            while tracing is disabled.
+        sample_rate (float): The fraction of new traces that are recorded.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[BatchSpanProcessor] = None,
+        sample_rate: float = TRACING_SAMPLE_RATE,
+    ):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    def should_sample(self, trace_id: str) -> bool:
+        """
+        Returns whether a new trace is sampled.
+
+        Args:
+            trace_id (str): The id of the trace.
+
+        Returns:
+            bool: True if its spans are recorded.
+        """
+        return int(trace_id[16:], 16) < self.sample_rate * 2**64
+
+    @contextmanager
+    def start_trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Starts the root span of a request in the service, continuing the caller's trace
+        if a valid traceparent header was sent.
+
+        Args:
+            name (str): The name of the span.
+            traceparent (str, optional): The traceparent header of the request.
+            attributes (Dict[str, Any], optional): The attributes of the span.
+
+        Yields:
+            Span, optional: The span, or None if the trace is not sampled.
+        """
+        if self.processor is None:
+            yield None
+            return
+
+        parent = parse_traceparent(traceparent)
+
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = self.should_sample(trace_id)
+
+        if not sampled:
+            token = current_span.set(None)
+            try:
+                yield None
+            finally:
+                current_span.reset(token)
+            return
+
+        span = Span(name, trace_id, parent_id, SPAN_KIND_SERVER, attributes)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Starts a child span of the current span.
+
+        Args:
+            name (str): The name of the span.
+            kind (int): The OTLP span kind.
+            attributes (Dict[str, Any], optional): The attributes of the span.
+
+        Yields:
+            Span, optional: The span, or None outside of a sampled trace.
+        """
+        parent = current_span.get()
+
+        if parent is None or self.processor is None:
+            yield None
+            return
+
+        span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        with self._activate(span):
+            yield span
+
+    def start_detached(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Span]:
+        """
+        Starts a child span of the current span without making it current, for work whose
+        start and end are observed by separate callbacks. It has to be ended with end().
+
+        Args:
+            name (str): The name of the span.
+            kind (int): The OTLP span kind.
+            attributes (Dict[str, Any], optional): The attributes of the span.
+
+        Returns:
+            Span, optional: The span, or None outside of a sampled trace.
+        """
+        parent = current_span.get()
+
+        if parent is None or self.processor is None:
+            return None
+
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+    def end(self, span: Span) -> None:
+        """
+        Ends a span and hands it to the processor.
+
+        Args:
+            span (Span): The span.
+        """
+        span.end_ns = time.time_ns()
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.record_exception(error)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end(span)
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+tracer = Tracer()
+
+
+def configure_tracing(
+    exporter: Optional[SpanExporter] = None, sample_rate: float = TRACING_SAMPLE_RATE
+) -> None:
+    """
+    Enables tracing with an exporter, by default the one named by TRACING_EXPORTER.
+
+    Args:
+        exporter (SpanExporter, optional): The exporter of the spans.
+        sample_rate (float): The fraction of new traces that are recorded.
+    """
+    if exporter is None:
+        exporter = EXPORTERS[TRACING_EXPORTER]()
+
+    if tracer.processor is not None:
+        tracer.processor.shutdown()
+
+    tracer.processor = BatchSpanProcessor(exporter)
+    tracer.sample_rate = sample_rate
+
+
+def shutdown_tracing() -> None:
+    """
+    Exports the remaining spans and disables tracing.
+    """
+    if tracer.processor is not None:
+        tracer.processor.shutdown()
+        tracer.processor = None
+
+
+@contextmanager
+def trace_operation(
+    operation_name: Optional[str], context: Any
+) -> Iterator[Optional[Span]]:
+    """
+    Traces a GraphQL operation, continuing the trace of its request's traceparent header.
+
+    Args:
+        operation_name (str, optional): The name of the operation.
+        context (Any): The context of the operation, holding its request.
+
+    Yields:
+        Span, optional: The span of the operation, or None if it is not sampled.
+    """
+    if tracer.processor is None:
+        yield None
+        return
+
+    request = context.get("request") if isinstance(context, dict) else None
+    headers = getattr(request, "headers", None) or {}
+
+    with tracer.start_trace(
+        f"graphql.operation {operation_label(operation_name)}",
+        headers.get("traceparent"),
+        {"graphql.operation.name": operation_label(operation_name)},
+    ) as span:
+        yield span
+
+
+def record_span_errors(span: Optional[Span], errors: Optional[Sequence]) -> None:
+    """
+    Sets the error status of an operation's span if its result has errors, which the
+    execution catches and so never reach the span as exceptions.
+
+    Args:
+        span (Span, optional): The span of the operation.
+        errors (Sequence, optional): The errors of the result.
+    """
+    if span is not None and errors:
+        span.status = STATUS_ERROR
+        span.status_message = str(errors[0])
+        span.attributes["graphql.errors"] = len(errors)
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """
+    Decorator recording every call of a function made within a sampled trace as a span.
+
+    Args:
+        name (str): The name of the spans.
+        kind (int): Their OTLP span kind.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return func(*args, **kwargs)
+
+            with tracer.start_span(name, kind):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_resolver(resolver: Callable, label: str) -> Callable:
+    """
+    Wraps a resolver to record its calls within sampled traces as spans.
+
+    Args:
+        resolver (Callable): The resolver.
+        label (str): The name of the resolver.
+
+    Returns:
+        Callable: The traced resolver, keeping the attributes of the original.
+    """
+    name = f"graphql.resolve {label}"
+
+    @wraps(resolver)
+    def wrapper(root, info, **args):
+        if current_span.get() is None:
+            return resolver(root, info, **args)
+
+        with tracer.start_span(
+            name, attributes={"graphql.field.name": info.field_name}
+        ):
+            return resolver(root, info, **args)
+
+    wrapper.tracing_label = label
+    return wrapper
+
+
+def trace_resolvers(
+    schema: GraphQLSchema, nested_resolvers: bool = TRACING_NESTED_RESOLVERS
+) -> None:
+    """
+    Records the resolvers of a schema as spans, like instrument_resolvers times them:
+    only the root query and mutation fields unless nested_resolvers is enabled.
+
+    Args:
+        schema (GraphQLSchema): The schema to be instrumented.
+        nested_resolvers (bool): Whether the resolvers of nested fields are traced too.
+    """
+    wrap_resolvers(schema, traced_resolver, "tracing_label", nested_resolvers)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = tracer.start_detached(
+        statement.split(None, 1)[0].upper() if statement else "SQL",
+        SPAN_KIND_CLIENT,
+        {"db.system": conn.dialect.name, "db.statement": statement},
+    )
+    if span is not None:
+        context._tracing_span = span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_tracing_span", None)
+    if span is not None:
+        context._tracing_span = None
+        tracer.end(span)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    span = getattr(context, "_tracing_span", None)
+    if span is not None:
+        context._tracing_span = None
+        span.record_exception(exception_context.original_exception)
+        tracer.end(span)
+
+
+_sql_tracing_installed = False
+
+
+def install_sql_tracing() -> None:
+    """
+    Records the SQL statements of every engine executed within sampled traces as spans.
+    """
+    global _sql_tracing_installed
+
+    if _sql_tracing_installed:
+        return
+
+    from sqlalchemy import Engine, event
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _sql_tracing_installed = True
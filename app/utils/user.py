@@ -16,6 +16,8 @@ def get_authenticated_user(context: Dict) -> Tuple[User, str]:
     If the token is valid, the function queries the database for a user with the email from the token payload.
     If the user is found, the function does not raise an error, effectively authenticating the user.
     If the user is not found or the token is invalid, the function raises a GraphQLError.
+    The authenticated user is remembered in the context, so every resolver and every operation
+    of a batched request sharing the context reuses a single token check and database lookup.
 
     Args:
         context (Dict): The context dictionary containing the request object.
@@ -32,6 +34,18 @@ def get_authenticated_user(context: Dict) -> Tuple[User, str]:
         raise GraphQLError("Missing request object in context")
     auth_header: str = request_object.headers.get("Authorization")
 
+    if auth_header is None:
+        # WebSocket clients send the header in the payload of the connection_init message
+        connection_params = request_object.scope.get("connection_params") or {}
+        auth_header = connection_params.get("Authorization")
+
+    authenticated = (
+        context.get("authenticated_user") if isinstance(context, dict) else None
+    )
+
+    if authenticated is not None and authenticated[0] == auth_header:
+        return authenticated[1]
+
     token = [None]
 
     if auth_header and "Bearer" in auth_header:
@@ -42,14 +56,21 @@ def get_authenticated_user(context: Dict) -> Tuple[User, str]:
 
         is_verified, payload = verify_jwt(token)
 
-        session = Session()
+        # Ending the transaction returns the connection to the pool right away instead of
+        # when the session is garbage collected, while the user stays attached to the
+        # session for relationships loaded later
+        session = Session(expire_on_commit=False)
         user: User = (
             session.query(User).filter(User.email == payload.get("sub")).first()
         )
+        session.commit()
 
         if not user:
             raise GraphQLError("Couldn't authenticate user")
 
+        if isinstance(context, dict):
+            context["authenticated_user"] = (auth_header, (user, token))
+
         return user, token
     else:
         raise GraphQLError("Missing authentication token")
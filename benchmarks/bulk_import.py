@@ -0,0 +1,107 @@
+"""
+Bulk import benchmark comparing the import pipeline with creating notes one by one.
+
+Generates NDJSON records and loads them into a temporary SQLite database through:
+
+* create_note: one ORM insert and commit per note, as the createNote mutation does;
+* bulk_import: import_notes, validating the records as a stream and loading them with
+  one executemany and commit per chunk.
+
+Both report their throughput in rows per second. create_note is measured on a sample of
+at most --sample records, since it is orders of magnitude slower.
+
+Usage:
+    python -m benchmarks.bulk_import --records 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DB_URL", "sqlite://")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.models import Base, Note, User  # noqa: E402
+from app.utils import bulk_import  # noqa: E402
+
+
+def records(count: int, users: int):
+    for i in range(count):
+        yield json.dumps(
+            {
+                "title": f"note {i}",
+                "description": "description " * 4,
+                "done": i % 2 == 0,
+                "owner_email": f"user{i % users}@example.com",
+            }
+        ) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--sample", type=int, default=2_000)
+    parser.add_argument("--chunk-size", type=int, default=bulk_import.IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/import.db")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        bulk_import.Session = Session
+
+        with Session() as session:
+            session.execute(
+                insert(User),
+                [
+                    {
+                        "username": f"user{i}",
+                        "email": f"user{i}@example.com",
+                        "password_hash": "x",
+                    }
+                    for i in range(args.users)
+                ],
+            )
+            session.commit()
+
+        sample = min(args.sample, args.records)
+        started = time.perf_counter()
+        for i in range(sample):
+            session = Session()
+            session.add(Note(title=f"note {i}", owner_id=i % args.users + 1))
+            session.commit()
+            session.close()
+        create_note = time.perf_counter() - started
+
+        report = bulk_import.import_notes(
+            records(args.records, args.users), chunk_size=args.chunk_size
+        )
+        engine.dispose()
+
+    print(
+        json.dumps(
+            {
+                "records": args.records,
+                "chunk_size": args.chunk_size,
+                "create_note": {
+                    "records": sample,
+                    "seconds": round(create_note, 3),
+                    "rows_per_sec": round(sample / create_note),
+                },
+                "bulk_import": {
+                    "records": report["imported"],
+                    "seconds": report["seconds"],
+                    "rows_per_sec": report["rows_per_sec"],
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cold start benchmark for the application process.
+
+Starts fresh interpreters and reports where a cold start spends its time:
+
+* import phases: the time spent importing the modules of every package loaded by
+  app.main (fastapi, graphene, sqlalchemy, app, ...), measured with
+  ``python -X importtime``;
+* startup phases: importing app.main, running the startup hook, opening the first
+  database connection and running the first ORM query.
+
+Both startup modes are measured. Unless --db-url is given, every run uses a fresh SQLite
+database in a temporary directory, so the benchmark never touches real data.
+
+Usage:
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List
+
+STARTUP_SCRIPT = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+asyncio.run(app.main.app.router.startup())
+started_up = time.perf_counter()
+
+from sqlalchemy import text
+from app.db.database import Session
+
+session = Session()
+session.execute(text("SELECT 1"))
+session.close()
+connected = time.perf_counter()
+
+from app.db.models import Note
+
+session = Session()
+session.query(Note).first()
+session.close()
+queried = time.perf_counter()
+
+print(json.dumps({
+    "import_app_ms": (imported - started) * 1000,
+    "startup_hook_ms": (started_up - imported) * 1000,
+    "first_connection_ms": (connected - started_up) * 1000,
+    "first_query_ms": (queried - connected) * 1000,
+    "total_ms": (queried - started) * 1000,
+    "argon2_loaded": "argon2" in sys.modules,
+    "requests_loaded": "requests" in sys.modules,
+}))
+"""
+
+
+def parse_importtime(output: str) -> Dict[str, float]:
+    """
+    Sums the self import time of every module per root package, in milliseconds.
+
+    Self times exclude nested imports, so every package is only charged for its own
+    modules and the phases add up to the total import time.
+    """
+    phases: Dict[str, float] = defaultdict(float)
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        self_time, _, name = line[len("import time:") :].split("|")
+        phases[name.strip().split(".")[0].lstrip("_")] += int(self_time) / 1000
+
+    return phases
+
+
+def run(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, text=True, check=True
+    )
+
+
+def measure(mode: str, runs: int, db_url: str) -> dict:
+    import_phases: Dict[str, List[float]] = defaultdict(list)
+    startup_phases: Dict[str, List[float]] = defaultdict(list)
+    lazy_modules = {}
+
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "STARTUP_MODE": mode,
+                "DB_URL": db_url or f"sqlite:///{directory}/cold_start.db",
+            }
+
+            imports = run(["-X", "importtime", "-c", "import app.main"], env)
+            for package, duration in parse_importtime(imports.stderr).items():
+                import_phases[package].append(duration)
+
+            startup = json.loads(run(["-c", STARTUP_SCRIPT], env).stdout)
+            for phase, value in startup.items():
+                if phase.endswith("_ms"):
+                    startup_phases[phase].append(value)
+                else:
+                    lazy_modules[phase] = value
+
+    def median(samples: Dict[str, List[float]], top: int = None) -> Dict[str, float]:
+        medians = sorted(
+            ((name, statistics.median(values)) for name, values in samples.items()),
+            key=lambda item: -item[1],
+        )
+        result = {name: round(value, 2) for name, value in medians[:top]}
+        if top is not None and len(medians) > top:
+            result["other"] = round(sum(value for _, value in medians[top:]), 2)
+        return result
+
+    return {
+        "import_phases_ms": median(import_phases, top=15),
+        "startup_phases_ms": median(startup_phases),
+        "modules_loaded_after_first_query": lazy_modules,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--modes", nargs="+", default=["development", "production"])
+    args = parser.parse_args()
+
+    result = {
+        "runs": args.runs,
+        "modes": {mode: measure(mode, args.runs, args.db_url) for mode in args.modes},
+    }
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
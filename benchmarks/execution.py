@@ -0,0 +1,129 @@
+"""
+Execution engine benchmark for list-heavy queries.
+
+Executes getAllNotes-style queries over in-memory notes (10k by default) with the real
+NoteObject/UserObject types, once with the stock graphql-core executor and once with the plans
+compiled by app.gql.compiler, and reports the median execution time and throughput of both.
+Parsing and validation are excluded from the stock numbers, so only execution is compared.
+
+Usage:
+    python -m benchmarks.execution --notes 10000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from graphene import List, ObjectType, Schema
+from graphql import execute, parse
+
+from app.gql.compiler import compile_query
+from app.gql.types import NoteObject, UserObject
+
+QUERIES = {
+    "notes_scalars": "{ getAllNotes { id title description done createdAt updatedAt"
+    " ownerId } }",
+    "notes_with_owner": "{ getAllNotes { id title done owner { id username email } } }",
+    "users_with_notes": "{ getUsers { id username notes { id title done createdAt } } }",
+}
+
+
+def build_schema(notes: int, users: int) -> Schema:
+    owners = [
+        SimpleNamespace(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            is_admin=False,
+            is_active=True,
+            created_at=datetime(2023, 1, 1),
+            last_login=datetime(2023, 11, 1),
+            notes=[],
+        )
+        for i in range(users)
+    ]
+    rows = []
+    for i in range(notes):
+        owner = owners[i % users]
+        note = SimpleNamespace(
+            id=i,
+            title=f"Note number {i}",
+            description="Remember to buy milk, eggs and bread on the way home.",
+            done=i % 3 == 0,
+            created_at=datetime(2023, 1, 1) + timedelta(minutes=i),
+            updated_at=datetime(2023, 6, 1) + timedelta(minutes=i),
+            owner_id=owner.id,
+            owner=owner,
+        )
+        owner.notes.append(note)
+        rows.append(note)
+
+    class Query(ObjectType):
+        get_all_notes = List(NoteObject)
+        get_users = List(UserObject)
+
+        @staticmethod
+        def resolve_get_all_notes(root, info):
+            return rows
+
+        @staticmethod
+        def resolve_get_users(root, info):
+            return owners
+
+    return Schema(query=Query)
+
+
+def wall_time(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+
+    median = statistics.median(samples)
+    return {
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "ops_per_second": round(1 / median, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    schema = build_schema(args.notes, args.users).graphql_schema
+    results = {}
+
+    for name, query in QUERIES.items():
+        document = parse(query)
+        plan = compile_query(schema, document)
+
+        stock = execute(schema, document)
+        compiled = plan()
+        assert stock.errors is None and compiled.errors is None
+        assert stock.data == compiled.data, f"{name}: results differ"
+
+        stock_time = wall_time(lambda: execute(schema, document), args.repeat)
+        compiled_time = wall_time(plan, args.repeat)
+
+        results[name] = {
+            "stock": stock_time,
+            "compiled": compiled_time,
+            "speedup": round(stock_time["median_ms"] / compiled_time["median_ms"], 2),
+        }
+
+    print(
+        json.dumps(
+            {"notes": args.notes, "users": args.users, "queries": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+End-to-end load benchmark of the GraphQL endpoint.
+
+Boots the app of app.main in process against a SQLite database seeded by a deterministic
+generator (--users users, 2000 by default, and --notes notes, 200k by default; pass
+--notes 2000000 for millions) and drives a mix of requests through an ASGI client at
+fixed concurrency levels:
+
+* login: the loginUser mutation, verifying an Argon2 hash;
+* list_notes: getAllUserNotes of the logged in user;
+* edit_note: the editNote mutation on one of their notes;
+* admin_listing: getUsers, as an admin.
+
+For every concurrency level it reports the requests per second and the p50/p95/p99
+latencies, overall and per kind of request; requests shed by the admission control (503)
+count as errors. The seeded database is kept (next to the
+system's temporary files by default) and reused by the next runs with the same sizes.
+
+Results can be stored with --save-baseline and compared with --baseline: a level or a
+kind of request whose throughput drops, or whose p95 latency grows, by more than
+--tolerance is reported as a regression and the benchmark exits with status 1. Baselines
+are only comparable on the same machine, so none is shipped.
+
+Usage:
+    python -m benchmarks.load --concurrency 1,16,64 --requests 2000
+    python -m benchmarks.load --save-baseline load-baseline.json
+    python -m benchmarks.load --baseline load-baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+PASSWORD = "correct horse battery staple"
+
+MIX = {"login": 10, "list_notes": 60, "edit_note": 20, "admin_listing": 10}
+
+QUERIES = {
+    "login": "mutation login($email: String!, $password: String!) {"
+    " loginUser(email: $email, password: $password) { token } }",
+    "list_notes": "query listNotes($userId: Int!) {"
+    " getAllUserNotes(userId: $userId) { id title description done createdAt } }",
+    "edit_note": "mutation editNote($noteId: Int!, $title: String, $done: Boolean) {"
+    " editNote(noteId: $noteId, title: $title, done: $done) { note { id title done } } }",
+    "admin_listing": "query adminListing {"
+    " getUsers { id username email isActive createdAt lastLogin } }",
+}
+
+WORDS = (
+    "buy milk eggs bread call mom book flight pay rent fix bike read chapter water plants"
+    " write report review pull request clean kitchen walk dog renew passport"
+).split()
+
+
+def seed(path: str, users: int, notes: int, seed_value: int) -> None:
+    """
+    Creates the database and fills it with users and notes generated from seed_value.
+
+    User 1 is the admin; every user has the same password, hashed once. The owners of the
+    notes are drawn uniformly, so every user has about notes / users of them.
+    """
+    from sqlalchemy import create_engine, insert
+
+    from app.db.models import Base, Note, User
+    from app.utils.password import hash_password
+
+    rng = random.Random(seed_value)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    password_hash = hash_password(PASSWORD)
+    started = datetime(2023, 1, 1)
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "password_hash": password_hash,
+                    "is_admin": i == 1,
+                    "is_active": True,
+                    "created_at": started + timedelta(hours=i),
+                }
+                for i in range(1, users + 1)
+            ],
+        )
+
+    batch = 50_000
+    for offset in range(0, notes, batch):
+        with engine.begin() as connection:
+            connection.execute(
+                insert(Note),
+                [
+                    {
+                        "owner_id": rng.randint(1, users),
+                        "title": " ".join(rng.choices(WORDS, k=3)),
+                        "description": " ".join(rng.choices(WORDS, k=12)),
+                        "done": rng.random() < 0.3,
+                        "created_at": started + timedelta(minutes=offset + i),
+                    }
+                    for i in range(min(batch, notes - offset))
+                ],
+            )
+
+    engine.dispose()
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of sorted latencies, in milliseconds.
+    """
+    if not latencies:
+        return 0.0
+    index = max(0, min(len(latencies) - 1, round(fraction * len(latencies)) - 1))
+    return round(latencies[index] * 1000, 2)
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+class Workload:
+    """
+    Generates the requests of the mix for a pool of users with known tokens and notes.
+    """
+
+    def __init__(self, users: List[Tuple[int, str, List[int]]], seed_value: int):
+        from app.utils.jwt import generate_jwt
+
+        self.users = users
+        self.tokens = {email: generate_jwt(email) for _, email, _ in users}
+        self.admin_token = generate_jwt("user1@example.com")
+        self.rng = random.Random(seed_value)
+        self.kinds = list(MIX)
+        self.weights = list(MIX.values())
+
+    def next_request(self) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        user_id, email, note_ids = self.rng.choice(self.users)
+        token = self.tokens[email]
+
+        if kind == "login":
+            return kind, {"email": email, "password": PASSWORD}, None
+        if kind == "list_notes":
+            return kind, {"userId": user_id}, token
+        if kind == "edit_note":
+            variables = {
+                "noteId": self.rng.choice(note_ids),
+                "title": " ".join(self.rng.choices(WORDS, k=3)),
+                "done": self.rng.random() < 0.5,
+            }
+            return kind, variables, token
+        return kind, {}, self.admin_token
+
+
+def load_users(pool: int) -> List[Tuple[int, str, List[int]]]:
+    """
+    Returns the ids, emails and note ids of the first pool users that have notes.
+    """
+    from sqlalchemy import select
+
+    from app.db.database import Session
+    from app.db.models import Note, User
+
+    with Session() as session:
+        users = session.execute(
+            select(User.id, User.email).order_by(User.id).limit(pool)
+        ).all()
+        note_ids: Dict[int, List[int]] = {}
+        for note_id, owner_id in session.execute(
+            select(Note.id, Note.owner_id).where(
+                Note.owner_id.in_([user_id for user_id, _ in users])
+            )
+        ):
+            note_ids.setdefault(owner_id, []).append(note_id)
+
+    return [
+        (user_id, email, note_ids[user_id])
+        for user_id, email in users
+        if user_id in note_ids
+    ]
+
+
+async def run_level(
+    app, workload: Workload, concurrency: int, requests: int
+) -> Dict[str, Any]:
+    """
+    Sends requests from concurrency workers sharing one queue of requests and returns
+    their summary, overall and per kind of request.
+    """
+    import httpx
+
+    plan = [workload.next_request() for _ in range(requests)]
+    latencies: Dict[str, List[float]] = {kind: [] for kind in MIX}
+    errors: Dict[str, int] = {kind: 0 for kind in MIX}
+    first_errors: Dict[str, str] = {}
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def worker() -> None:
+            while plan:
+                kind, variables, token = plan.pop()
+                headers = {"Authorization": f"Bearer {token}"} if token else {}
+                started = time.perf_counter()
+                response = await client.post(
+                    "/",
+                    json={"query": QUERIES[kind], "variables": variables},
+                    headers=headers,
+                )
+                latencies[kind].append(time.perf_counter() - started)
+                body = response.json()
+                if response.status_code != 200 or "errors" in body:
+                    errors[kind] += 1
+                    first_errors.setdefault(kind, json.dumps(body)[:200])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+
+    return {
+        **summarize(
+            [latency for values in latencies.values() for latency in values],
+            sum(errors.values()),
+            seconds,
+        ),
+        "scenarios": {
+            kind: summarize(latencies[kind], errors[kind], seconds) for kind in MIX
+        },
+        "first_errors": first_errors,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Returns the regressions of results against a baseline: a throughput lower, or a p95
+    latency higher, than the baseline's by more than tolerance.
+    """
+    regressions = []
+
+    for level, summary in results["levels"].items():
+        base = baseline.get("levels", {}).get(level)
+        if base is None:
+            continue
+
+        pairs = [(f"concurrency {level}", summary, base)]
+        pairs.extend(
+            (f"concurrency {level} {kind}", summary["scenarios"][kind], scenario)
+            for kind, scenario in base.get("scenarios", {}).items()
+            if kind in summary["scenarios"]
+        )
+
+        for name, current, previous in pairs:
+            if previous["rps"] and current["rps"] < previous["rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {current['rps']} rps, baseline {previous['rps']} rps"
+                )
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (
+                1 + tolerance
+            ):
+                regressions.append(
+                    f"{name}: p95 {current['p95_ms']} ms, "
+                    f"baseline {previous['p95_ms']} ms"
+                )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--notes", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="SQLite file, reused if it exists")
+    parser.add_argument("--pool", type=int, default=200, help="users sending requests")
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--requests", type=int, default=2_000, help="per level")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--save-baseline", help="file to store the results in")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(
+        tempfile.gettempdir(), f"todo_load_{args.users}_{args.notes}_{args.seed}.db"
+    )
+    os.environ["DB_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-32-bytes!")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("TOKEN_EXPIRATION_TIME_MINUTES", "60")
+    # Every request comes from the same client address, which the login rate limit
+    # would otherwise quickly reject
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    seeded = not os.path.exists(path)
+    if seeded:
+        seed(path, args.users, args.notes, args.seed)
+
+    from app.main import app
+
+    workload = Workload(load_users(args.pool), args.seed)
+    asyncio.run(run_level(app, workload, 8, args.warmup))
+
+    results: Dict[str, Any] = {
+        "users": args.users,
+        "notes": args.notes,
+        "seeded": seeded,
+        "requests": args.requests,
+        "mix": MIX,
+        "levels": {},
+    }
+    for concurrency in map(int, args.concurrency.split(",")):
+        results["levels"][str(concurrency)] = asyncio.run(
+            run_level(app, workload, concurrency, args.requests)
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            results["regressions"] = compare(results, json.load(file), args.tolerance)
+
+    print(json.dumps(results, indent=2))
+
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
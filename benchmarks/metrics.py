@@ -0,0 +1,147 @@
+"""
+Overhead benchmark for the metrics instrumentation.
+
+Measures how much the metrics add to the work they observe:
+
+* execution: the getAllNotes-style queries of benchmarks.execution over in-memory notes
+  (10k by default), executed with the stock executor and again inside record_operation
+  with the resolvers instrumented;
+* sql_trivial / sql_page: statements on an in-memory SQLite database (``SELECT 1`` and a
+  page of 50 notes), executed without and with the SQL statement listeners attributing
+  them to an operation. Their overhead is also reported in microseconds per statement:
+  it is a fixed cost, so relative to statements sent to a database over the network it
+  is much smaller than relative to these.
+
+Rounds of both variants alternate, so drifting machine load affects them alike, and the
+overhead is computed from their medians.
+
+Usage:
+    python -m benchmarks.metrics --notes 10000
+"""
+import argparse
+import gc
+import json
+import statistics
+import time
+from typing import Callable, Dict
+
+from graphql import execute, parse
+from sqlalchemy import Engine, create_engine, event
+
+from app.utils import metrics
+from benchmarks.execution import QUERIES, build_schema
+
+
+def compare(
+    baseline: Callable[[], None], instrumented: Callable[[], None], repeat: int
+) -> Dict[str, float]:
+    samples = {"baseline": [], "instrumented": []}
+
+    for _ in range(repeat):
+        for name, func in (("baseline", baseline), ("instrumented", instrumented)):
+            gc.collect()
+            gc.disable()
+            started = time.perf_counter()
+            func()
+            samples[name].append(time.perf_counter() - started)
+            gc.enable()
+
+    baseline_median = statistics.median(samples["baseline"])
+    instrumented_median = statistics.median(samples["instrumented"])
+
+    return {
+        "baseline_ms": round(baseline_median * 1000, 3),
+        "instrumented_ms": round(instrumented_median * 1000, 3),
+        "overhead_percent": round((instrumented_median / baseline_median - 1) * 100, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--statements", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    schema = build_schema(args.notes, args.users).graphql_schema
+    instrumented_schema = build_schema(args.notes, args.users).graphql_schema
+    metrics.instrument_resolvers(instrumented_schema)
+    results = {}
+
+    for name, query in QUERIES.items():
+        document = parse(query)
+
+        def instrumented():
+            with metrics.record_operation(name):
+                execute(instrumented_schema, document)
+
+        results[name] = compare(
+            lambda: execute(schema, document), instrumented, args.repeat
+        )
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE notes (id INTEGER, title TEXT)")
+        connection.exec_driver_sql(
+            "INSERT INTO notes VALUES "
+            + ",".join(f"({i}, 'note {i}')" for i in range(50))
+        )
+
+    def statements(sql: str) -> Callable[[], None]:
+        def run():
+            with engine.connect() as connection:
+                for _ in range(args.statements):
+                    connection.exec_driver_sql(sql).fetchall()
+
+        return run
+
+    def without_listeners(run: Callable[[], None]) -> Callable[[], None]:
+        def baseline():
+            event.remove(
+                Engine, "before_cursor_execute", metrics._before_cursor_execute
+            )
+            event.remove(Engine, "after_cursor_execute", metrics._after_cursor_execute)
+            metrics._sql_metrics_installed = False
+            run()
+
+        return baseline
+
+    def with_listeners(run: Callable[[], None]) -> Callable[[], None]:
+        def instrumented():
+            metrics.install_sql_metrics()
+            with metrics.record_operation("sql"):
+                run()
+
+        return instrumented
+
+    metrics.install_sql_metrics()
+
+    for name, sql in (("sql_trivial", "SELECT 1"), ("sql_page", "SELECT * FROM notes")):
+        results[name] = compare(
+            without_listeners(statements(sql)),
+            with_listeners(statements(sql)),
+            args.repeat,
+        )
+        results[name]["overhead_us_per_statement"] = round(
+            (results[name]["instrumented_ms"] - results[name]["baseline_ms"])
+            * 1000
+            / args.statements,
+            2,
+        )
+
+    print(
+        json.dumps(
+            {
+                "notes": args.notes,
+                "users": args.users,
+                "statements": args.statements,
+                "overhead": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
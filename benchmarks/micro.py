@@ -0,0 +1,367 @@
+"""
+Microbenchmarks of the authentication and validation hot paths.
+
+Times the functions every request or registration runs, with representative inputs:
+
+* jwt: generate_jwt, verify_jwt and regenerate_jwt for every algorithm PyJWT supports
+  here (HMAC always, RSA, ECDSA and EdDSA when cryptography is installed), and
+  verify_jwt rejecting a token with a bad signature;
+* password: hash_password and verify_password with the default Argon2 parameters,
+  split_hashes and check_if_hash_is_present on a full 800-line HIBP range body, and
+  is_password_safe with that body served instead of the HIBP API;
+* email: is_valid_email on a typical, a long and an invalid address;
+* decorators: a resolver wrapped by logged_in and admin_user, with the user already
+  authenticated earlier in the request, as for every resolver after the first one.
+
+Every case is run in batches of calls lasting at least --min-time seconds, with the
+garbage collector disabled, in --repeat rounds interleaving all cases with a fixed
+reference workload. The median time per call is reported with its interquartile range,
+and so is the median time relative to the reference of the same round, which varies
+much less between runs on a loaded or throttled machine.
+
+Results can be stored with --save-baseline and compared with --baseline: a case whose
+relative time grows by more than --tolerance, and by more than its interquartile range,
+is reported as a regression and the benchmark exits with status 1.
+
+Usage:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter jwt --repeat 25
+    python -m benchmarks.micro --save-baseline micro-baseline.json
+    python -m benchmarks.micro --baseline micro-baseline.json --tolerance 0.1
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import timeit
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" * 4)
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("TOKEN_EXPIRATION_TIME_MINUTES", "60")
+
+import jwt as pyjwt  # noqa: E402
+from graphql import GraphQLError  # noqa: E402
+
+from app.utils import jwt, password  # noqa: E402
+from app.utils.decorators import admin_user, logged_in  # noqa: E402
+from app.utils.email import is_valid_email  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+EMAIL = "jane.doe@example.com"
+
+
+def hibp_body(lines: int, password_sha1: str, seed: int = 0) -> str:
+    """
+    Returns an HIBP range body of the given number of lines for the prefix of a hash,
+    with the hash itself in the middle, as the API sends it.
+    """
+    rng = random.Random(seed)
+    suffixes = sorted(
+        "".join(rng.choices("0123456789ABCDEF", k=35)) for _ in range(lines - 1)
+    )
+    suffixes.insert(len(suffixes) // 2, password_sha1[5:].upper())
+    return "\r\n".join(f"{suffix}:{rng.randint(1, 5000)}" for suffix in suffixes)
+
+
+def signing_keys() -> Dict[str, tuple]:
+    """
+    Returns the signing and verification keys of every algorithm available to PyJWT.
+    """
+    secret = os.environ["SECRET_KEY"]
+    keys = {name: (secret, secret) for name in ("HS256", "HS384", "HS512")}
+
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+    except ImportError:
+        return keys
+
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    for name in ("RS256", "PS256"):
+        keys[name] = (rsa_key, rsa_key.public_key())
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    keys["ES256"] = (ec_key, ec_key.public_key())
+    ed_key = ed25519.Ed25519PrivateKey.generate()
+    keys["EdDSA"] = (ed_key, ed_key.public_key())
+
+    return {
+        name: key
+        for name, key in keys.items()
+        if name in pyjwt.algorithms.get_default_algorithms()
+    }
+
+
+def jwt_cases() -> Dict[str, Callable[[], Any]]:
+    cases = {}
+
+    for algorithm, (signing_key, verifying_key) in signing_keys().items():
+        token = pyjwt.encode(
+            {"sub": EMAIL, "exp": jwt.get_expiration_date()},
+            signing_key,
+            algorithm=algorithm,
+        )
+
+        def with_algorithm(func, key, algorithm=algorithm):
+            def case():
+                jwt.SECRET_KEY, jwt.ALGORITHM = key, algorithm
+                return func()
+
+            return case
+
+        cases[f"jwt.generate_jwt[{algorithm}]"] = with_algorithm(
+            lambda: jwt.generate_jwt(EMAIL), signing_key
+        )
+        cases[f"jwt.verify_jwt[{algorithm}]"] = with_algorithm(
+            lambda token=token: jwt.verify_jwt(token), verifying_key
+        )
+
+    secret = os.environ["SECRET_KEY"]
+    token = pyjwt.encode(
+        {"sub": EMAIL, "exp": jwt.get_expiration_date()}, secret, algorithm="HS256"
+    )
+    forged = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+
+    def regenerate():
+        jwt.SECRET_KEY, jwt.ALGORITHM = secret, "HS256"
+        return jwt.regenerate_jwt(token)
+
+    def reject():
+        jwt.SECRET_KEY, jwt.ALGORITHM = secret, "HS256"
+        try:
+            jwt.verify_jwt(forged)
+        except GraphQLError:
+            return False
+        raise AssertionError("The forged token was accepted")
+
+    cases["jwt.regenerate_jwt[HS256]"] = regenerate
+    cases["jwt.verify_jwt[HS256, bad signature]"] = reject
+
+    return cases
+
+
+def password_cases() -> Dict[str, Callable[[], Any]]:
+    password_sha1 = hashlib.sha1(PASSWORD.encode()).hexdigest()
+    body = hibp_body(800, password_sha1)
+    absent_sha1 = password_sha1[:5] + "F" * 35
+    password_hash = password.hash_password(PASSWORD)
+
+    def is_password_safe():
+        # The HIBP request is replaced by the body it would return, only the local work is timed
+        fetch, password.get_hashes_from_hibp = password.get_hashes_from_hibp, (
+            lambda _: body
+        )
+        try:
+            password.is_password_safe(PASSWORD)
+        except GraphQLError:
+            return False
+        finally:
+            password.get_hashes_from_hibp = fetch
+        return True
+
+    def verify_mismatch():
+        try:
+            password.verify_password(password_hash, PASSWORD + "!")
+        except GraphQLError:
+            return False
+        raise AssertionError("The wrong password was accepted")
+
+    return {
+        "password.hash_password": lambda: password.hash_password(PASSWORD),
+        "password.verify_password": lambda: password.verify_password(
+            password_hash, PASSWORD
+        ),
+        "password.verify_password[mismatch]": verify_mismatch,
+        "password.split_hashes[800 lines]": lambda: password.split_hashes(body),
+        "password.check_if_hash_is_present[present]": (
+            lambda: password.check_if_hash_is_present(body, password_sha1)
+        ),
+        "password.check_if_hash_is_present[absent]": (
+            lambda: password.check_if_hash_is_present(body, absent_sha1)
+        ),
+        "password.is_password_safe[800 lines]": is_password_safe,
+    }
+
+
+def email_cases() -> Dict[str, Callable[[], Any]]:
+    long_email = "a.very.long.local.part.of.an.address" * 4 + "@mail.example.co.uk"
+
+    def invalid():
+        try:
+            is_valid_email("jane.doe@example")
+        except GraphQLError:
+            return False
+        raise AssertionError("The invalid email was accepted")
+
+    return {
+        "email.is_valid_email[typical]": lambda: is_valid_email(EMAIL),
+        "email.is_valid_email[long]": lambda: is_valid_email(long_email),
+        "email.is_valid_email[invalid]": invalid,
+    }
+
+
+def decorator_cases() -> Dict[str, Callable[[], Any]]:
+    header = "Bearer token"
+    user = SimpleNamespace(id=1, is_admin=True)
+    request = SimpleNamespace(headers={"Authorization": header}, scope={})
+    info = SimpleNamespace(
+        context={"request": request, "authenticated_user": (header, (user, "token"))}
+    )
+
+    def resolver(root, info):
+        return root
+
+    logged_in_resolver = logged_in(resolver)
+    admin_resolver = admin_user(resolver)
+
+    return {
+        "decorators.undecorated": lambda: resolver(None, info),
+        "decorators.logged_in": lambda: logged_in_resolver(None, info),
+        "decorators.admin_user": lambda: admin_resolver(None, info),
+    }
+
+
+def reference() -> int:
+    """
+    A fixed pure-Python workload the cases are expressed in units of.
+    """
+    return sum(i * i for i in range(1000))
+
+
+def calibrate(case: Callable[[], Any], min_time: float) -> int:
+    """
+    Returns the number of calls of a case lasting at least min_time seconds.
+    """
+    timer = timeit.Timer(case)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+
+def run(
+    cases: Dict[str, Callable[[], Any]], repeat: int, min_time: float
+) -> Dict[str, Dict[str, float]]:
+    """
+    Times the cases in repeat rounds, each timing one batch of calls of every case and of
+    the reference workload.
+
+    Interleaving the cases spreads drifting machine load evenly over them, and dividing
+    their time by the reference's time of the same round cancels most of it out, so the
+    relative times stay comparable between runs when the absolute ones do not.
+
+    Returns:
+        Dict[str, Dict[str, float]]: For every case, the median, minimum and interquartile
+            range of the time per call in microseconds, the IQR relative to the median,
+            the median time relative to the reference and its IQR, and the calls per batch.
+    """
+    timers = {name: timeit.Timer(case) for name, case in cases.items()}
+    numbers = {name: calibrate(case, min_time) for name, case in cases.items()}
+    reference_timer = timeit.Timer(reference)
+    reference_number = calibrate(reference, min_time)
+    per_call: Dict[str, List[float]] = {name: [] for name in cases}
+    relative: Dict[str, List[float]] = {name: [] for name in cases}
+
+    for _ in range(repeat):
+        unit = reference_timer.timeit(reference_number) / reference_number
+        for name, timer in timers.items():
+            seconds = timer.timeit(numbers[name]) / numbers[name]
+            per_call[name].append(seconds * 1e6)
+            relative[name].append(seconds / unit)
+
+    results = {}
+    for name in cases:
+        times = sorted(per_call[name])
+        ratios = sorted(relative[name])
+        quartiles = statistics.quantiles(times, n=4)
+        ratio_quartiles = statistics.quantiles(ratios, n=4)
+        median = statistics.median(times)
+        results[name] = {
+            "median_us": round(median, 3),
+            "min_us": round(times[0], 3),
+            "iqr_us": round(quartiles[2] - quartiles[0], 3),
+            "spread_percent": round((quartiles[2] - quartiles[0]) / median * 100, 2),
+            "relative": round(statistics.median(ratios), 5),
+            "relative_iqr": round(ratio_quartiles[2] - ratio_quartiles[0], 5),
+            "calls_per_batch": numbers[name],
+        }
+
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Returns the cases slower than in a baseline, relative to the reference workload, by
+    more than tolerance and more than their interquartile range.
+    """
+    regressions = []
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        slowdown = current["relative"] - previous["relative"]
+        noise = max(current["relative_iqr"], previous["relative_iqr"])
+
+        if slowdown > previous["relative"] * tolerance and slowdown > noise:
+            regressions.append(
+                f"{name}: {current['relative']} x reference, "
+                f"baseline {previous['relative']} x reference "
+                f"(+{slowdown / previous['relative'] * 100:.1f}%)"
+            )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filter", default="", help="only cases containing this")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.1)
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--save-baseline", help="file to store the results in")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.repeat < 2:
+        parser.error("--repeat must be at least 2 to compute the interquartile range")
+
+    cases = {
+        **jwt_cases(),
+        **password_cases(),
+        **email_cases(),
+        **decorator_cases(),
+    }
+
+    results = run(
+        {name: case for name, case in cases.items() if args.filter in name},
+        args.repeat,
+        args.min_time,
+    )
+    output: Dict[str, Any] = {"repeat": args.repeat, "cases": results}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(output, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["cases"]
+        output["regressions"] = compare(results, baseline, args.tolerance)
+
+    print(json.dumps(output, indent=2))
+
+    if output.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Read-path benchmark comparing ORM entities with projected row tuples.
+
+Fills a temporary SQLite database with notes and reads all of them through:
+
+* orm: ``select(Note)`` with lazy loading, building a tracked Note entity per row;
+* orm_owner: the same with the owner joined, as the ORM path of getAllNotes loads it;
+* projection: select_notes with the columns requested by a typical list query;
+* projection_owner: the same with the owner's email, selected in the same query.
+
+Every variant reports rows per second and the memory retained per note while the
+result is alive, measured with tracemalloc.
+
+Usage:
+    python -m benchmarks.projection --notes 100000
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+os.environ.setdefault("DB_URL", "sqlite://")
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import joinedload, lazyload, sessionmaker  # noqa: E402
+
+from app.db.models import Base, Note, User  # noqa: E402
+from app.gql import projections  # noqa: E402
+
+NOTE_SELECTION = {"id": {}, "title": {}, "done": {}, "created_at": {}}
+
+
+def fill(session, notes: int, users: int) -> None:
+    session.execute(
+        insert(User),
+        [
+            {
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "password_hash": "x",
+            }
+            for i in range(users)
+        ],
+    )
+    session.execute(
+        insert(Note),
+        [
+            {
+                "title": f"note {i}",
+                "description": "description " * 4,
+                "owner_id": i % users + 1,
+            }
+            for i in range(notes)
+        ],
+    )
+    session.commit()
+
+
+def measure(read: Callable[[], Any], notes: int, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = read()
+        timings.append(time.perf_counter() - started)
+        assert len(rows[0]) == notes
+        del rows
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = read()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del rows
+
+    best = min(timings)
+    return {
+        "best_ms": round(best * 1000, 1),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "rows_per_sec": round(notes / best),
+        "bytes_per_note": round(retained / notes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/projection.db")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        projections.Session = Session
+
+        with Session() as session:
+            fill(session, args.notes, args.users)
+
+        def orm(*options):
+            def read():
+                # The session is returned with the entities, which it keeps tracking
+                session = Session()
+                statement = select(Note).options(lazyload("*"), *options)
+                return session.scalars(statement).unique().all(), session
+
+            return read
+
+        def projection(selection):
+            return lambda: (projections.select_notes(selection),)
+
+        variants = {
+            "orm": orm(),
+            "orm_owner": orm(joinedload(Note.owner).lazyload(User.notes)),
+            "projection": projection(NOTE_SELECTION),
+            "projection_owner": projection({**NOTE_SELECTION, "owner": {"email": {}}}),
+        }
+        results = {
+            name: measure(read, args.notes, args.repeat)
+            for name, read in variants.items()
+        }
+        engine.dispose()
+
+    print(
+        json.dumps(
+            {"notes": args.notes, "users": args.users, "reads": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
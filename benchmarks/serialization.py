@@ -0,0 +1,122 @@
+"""
+Serialization and compression benchmark for a large note list response.
+
+Builds the response of a getAllNotes-style query for a number of notes (10k by default) by
+executing the real NoteObject/UserObject types, then reports the CPU time spent serializing
+it with the standard library encoder and with app.utils.serialization.dumps, and the number
+of bytes on the wire with every supported content coding.
+
+Usage:
+    python -m benchmarks.serialization --notes 10000
+"""
+import argparse
+import json
+import statistics
+import time
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from graphene import List, ObjectType, Schema
+
+from app.gql.types import NoteObject
+from app.utils import compression, serialization
+
+
+def build_response(notes: int) -> dict:
+    owner = SimpleNamespace(
+        id=1,
+        username="owner",
+        email="owner@example.com",
+        is_admin=False,
+        is_active=True,
+        created_at=datetime(2023, 1, 1),
+        last_login=datetime(2023, 11, 1),
+        notes=[],
+    )
+    rows = [
+        SimpleNamespace(
+            id=i,
+            title=f"Note number {i}",
+            description="Remember to buy milk, eggs and bread on the way home. " * 2,
+            done=i % 3 == 0,
+            created_at=datetime(2023, 1, 1) + timedelta(minutes=i),
+            updated_at=datetime(2023, 6, 1) + timedelta(minutes=i),
+            owner_id=owner.id,
+            owner=owner,
+        )
+        for i in range(notes)
+    ]
+
+    class Query(ObjectType):
+        get_all_notes = List(NoteObject)
+
+        @staticmethod
+        def resolve_get_all_notes(root, info):
+            return rows
+
+    result = Schema(query=Query).execute(
+        "{ getAllNotes { id title description done createdAt updatedAt ownerId"
+        " owner { id username } } }"
+    )
+
+    return {"data": result.data}
+
+
+def cpu_time(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        samples.append(time.process_time() - started)
+
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+    }
+
+
+def stdlib_dumps(content) -> bytes:
+    # The encoder configuration used by starlette.responses.JSONResponse
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    response = build_response(args.notes)
+    body = serialization.dumps(response)
+
+    wire = {"identity": len(body)}
+    wire["gzip"] = len(zlib.compress(body, compression.GZIP_LEVEL, wbits=31))
+    if compression.brotli is not None:
+        wire["br"] = len(
+            compression.brotli.compress(body, quality=compression.BROTLI_QUALITY)
+        )
+
+    result = {
+        "notes": args.notes,
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+        "serialization_cpu": {
+            "stdlib_json": cpu_time(lambda: stdlib_dumps(response), args.repeat),
+            "fast_path": cpu_time(lambda: serialization.dumps(response), args.repeat),
+        },
+        "compression_cpu": {
+            "gzip": cpu_time(
+                lambda: zlib.compress(body, compression.GZIP_LEVEL, wbits=31),
+                args.repeat,
+            ),
+        },
+        "bytes_on_wire": wire,
+    }
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
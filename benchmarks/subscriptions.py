@@ -0,0 +1,80 @@
+"""
+Load test of the in-process subscription hub.
+
+Holds a configurable number of idle subscribers (10k by default) spread across user channels
+on a single event loop, then publishes one message to every channel and measures how long the
+fan-out takes and how much memory the subscribers hold.
+
+Usage:
+    python -m benchmarks.subscriptions --subscribers 10000 --channels 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.utils.pubsub import InProcessBroker, note_channel
+
+
+async def run(subscribers: int, channels: int, queue_size: int) -> dict:
+    broker = InProcessBroker(max_queue_size=queue_size)
+    received = 0
+    all_received = asyncio.Event()
+
+    async def consume(subscription) -> None:
+        nonlocal received
+        async for _ in subscription:
+            received += 1
+            if received == subscribers:
+                all_received.set()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+
+    subscriptions = [
+        broker.subscribe(note_channel(i % channels)) for i in range(subscribers)
+    ]
+    tasks = [asyncio.create_task(consume(s)) for s in subscriptions]
+    await asyncio.sleep(0)
+
+    subscribe_seconds = time.perf_counter() - started
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for channel in range(channels):
+        broker.publish(note_channel(channel), {"action": "UPDATED", "note": None})
+    await asyncio.wait_for(all_received.wait(), timeout=60)
+    fan_out_seconds = time.perf_counter() - started
+
+    for subscription in subscriptions:
+        subscription.close()
+    await asyncio.gather(*tasks)
+
+    return {
+        "subscribers": subscribers,
+        "channels": channels,
+        "subscribe_seconds": round(subscribe_seconds, 4),
+        "memory_bytes": after - before,
+        "memory_bytes_per_subscriber": round((after - before) / subscribers),
+        "fan_out_seconds": round(fan_out_seconds, 4),
+        "deliveries_per_second": round(subscribers / fan_out_seconds),
+        "broker": broker.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--channels", type=int, default=1_000)
+    parser.add_argument("--queue-size", type=int, default=100)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.subscribers, args.channels, args.queue_size))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
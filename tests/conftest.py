@@ -0,0 +1,15 @@
+import pytest
+
+from app.utils.query_budget import QueryBudget
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Records the GraphQL operations of a test; the budgets declared with
+    query_budget.expect(operation_name, max_statements) are checked when it ends.
+    """
+    with QueryBudget() as budget:
+        yield budget
+
+    budget.check()
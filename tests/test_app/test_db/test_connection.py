@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from app.db import connection
+from app.db.connection import ConnectMetrics, get_engine_options, install_connect_retry
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(connection.time, "sleep", lambda seconds: None)
+
+
+@pytest.mark.db_connection
+def test_default_mode_keeps_engine_defaults():
+    assert get_engine_options("postgresql+psycopg://u:p@host/db", "default") == {}
+
+
+@pytest.mark.db_connection
+def test_serverless_mode_disables_pooling_and_prepared_statements(monkeypatch):
+    monkeypatch.setattr(connection, "DB_POOL_SIZE", 0)
+
+    options = get_engine_options("postgresql+psycopg://u:p@host/db", "serverless")
+
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"]["prepare_threshold"] is None
+    assert options["connect_args"]["connect_timeout"] == connection.DB_CONNECT_TIMEOUT
+
+
+@pytest.mark.db_connection
+def test_serverless_mode_can_use_tiny_pool(monkeypatch):
+    monkeypatch.setattr(connection, "DB_POOL_SIZE", 2)
+
+    options = get_engine_options("sqlite:///todo.db", "serverless")
+
+    assert options == {"pool_size": 2, "max_overflow": 0}
+
+
+@pytest.mark.db_connection
+def test_connect_is_retried_and_timed():
+    engine = create_engine("sqlite://", poolclass=NullPool)
+    metrics = ConnectMetrics()
+    install_connect_retry(engine, metrics, retries=2)
+
+    connect = engine.dialect.connect
+    attempts = []
+
+    def flaky_connect(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError("server closed the connection")
+        return connect(*args, **kwargs)
+
+    engine.dialect.connect = flaky_connect
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    stats = metrics.stats()
+    assert stats["connects"] == 1
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+
+
+@pytest.mark.db_connection
+def test_connect_fails_after_retries():
+    engine = create_engine("sqlite:////nonexistent/directory/todo.db")
+    metrics = ConnectMetrics()
+    install_connect_retry(engine, metrics, retries=1)
+
+    with pytest.raises(OperationalError):
+        engine.connect()
+
+    stats = metrics.stats()
+    assert stats["connects"] == 0
+    assert stats["failures"] == 1
+    assert stats["retries"] == 1
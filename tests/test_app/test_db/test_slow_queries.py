@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db.slow_queries import (
+    SlowQueryLog,
+    explain,
+    install_slow_query_log,
+    parameter_shape,
+)
+from app.utils.metrics import record_operation
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE notes (id INTEGER PRIMARY KEY, owner_id INTEGER)")
+        )
+        connection.execute(text("CREATE INDEX ix_notes_owner_id ON notes (owner_id)"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.slow_queries
+def test_parameter_shape_hides_values():
+    assert parameter_shape((1, "secret")) == "(int, str)"
+    assert parameter_shape({"owner_id_1": 1}) == "{owner_id_1: int}"
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+    assert parameter_shape(None) == "()"
+
+
+@pytest.mark.slow_queries
+def test_slow_statements_are_recorded_with_operation_and_plan(engine):
+    log = SlowQueryLog(size=10, threshold_ms=0, explain_rate=1.0)
+    install_slow_query_log(engine, log)
+
+    with record_operation("getAllUserNotes"), engine.connect() as connection:
+        connection.execute(
+            text("SELECT id FROM notes WHERE owner_id = :owner_id"), {"owner_id": 7}
+        )
+
+    entry = log.entries()[0]
+    assert entry["statement"] == "SELECT id FROM notes WHERE owner_id = ?"
+    assert entry["parameters"] == "(int)"
+    assert entry["operation"] == "getAllUserNotes"
+    assert entry["duration_ms"] >= 0
+    assert "ix_notes_owner_id" in entry["plan"]
+
+
+@pytest.mark.slow_queries
+def test_fast_statements_are_not_recorded(engine):
+    log = SlowQueryLog(size=10, threshold_ms=10_000)
+    install_slow_query_log(engine, log)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert log.entries() == []
+
+
+@pytest.mark.slow_queries
+def test_unsampled_statements_have_no_plan(engine):
+    log = SlowQueryLog(size=10, threshold_ms=0, explain_rate=0.0)
+    install_slow_query_log(engine, log)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert log.entries()[0]["plan"] is None
+    assert log.entries()[0]["operation"] is None
+
+
+@pytest.mark.slow_queries
+def test_log_keeps_the_latest_entries_first():
+    log = SlowQueryLog(size=2)
+    for index in range(3):
+        log.record({"statement": str(index)})
+
+    assert [entry["statement"] for entry in log.entries()] == ["2", "1"]
+    assert [entry["statement"] for entry in log.entries(limit=1)] == ["2"]
+
+
+@pytest.mark.slow_queries
+def test_explain_skips_writes(engine):
+    with engine.connect() as connection:
+        plan = explain(connection, "DELETE FROM notes", (), analyze=True)
+
+    assert plan == "Only SELECT statements are explained"
+
+
+class RecordingCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+
+    def fetchall(self):
+        return [("Seq Scan on notes",)]
+
+    def close(self):
+        pass
+
+
+@pytest.mark.slow_queries
+def test_explain_analyzes_only_plain_selects():
+    executed = []
+    connection = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        connection=SimpleNamespace(cursor=lambda: RecordingCursor(executed)),
+    )
+    cte = "WITH moved AS (DELETE FROM notes RETURNING *) SELECT * FROM moved"
+
+    assert explain(connection, "SELECT * FROM notes", (), analyze=True) == (
+        "Seq Scan on notes"
+    )
+    assert explain(connection, cte, (), analyze=True) == "Seq Scan on notes"
+
+    explained = [statement for statement in executed if "EXPLAIN" in statement]
+    assert explained == [
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM notes",
+        f"EXPLAIN {cte}",
+    ]
@@ -0,0 +1,227 @@
+import asyncio
+import json
+
+import pytest
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+
+from app.gql import admission
+from app.gql.admission import (
+    AdaptiveLimit,
+    AdmissionControl,
+    build_limits,
+    classify_operations,
+    classify_query,
+    classify_request,
+    parse_classes,
+)
+
+
+async def echo_app(scope, receive, send):
+    message = await receive()
+    body = message.get("body", b"").decode()
+    await JSONResponse({"body": body})(scope, receive, send)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.mark.admission
+def test_parse_classes():
+    assert parse_classes("read=64, listing=0.5,") == {"read": 64.0, "listing": 0.5}
+
+
+@pytest.mark.admission
+def test_classify_query():
+    assert classify_query("{ getNote(userId: 1, noteId: 1) { id } }", None) == "read"
+    assert classify_query("query { getUsers { id } }", None) == "listing"
+    assert classify_query('mutation { loginUser(email: "") { token } }', None) == (
+        "auth"
+    )
+    assert classify_query("mutation { deleteNote(noteId: 1) { ok } }", None) == (
+        "write"
+    )
+    assert classify_query("query a { getUsers { id } } query b { x }", "b") == "read"
+    assert classify_query("{ not valid", None) == "read"
+
+
+@pytest.mark.admission
+def test_classify_query_caches_digests_of_the_documents(monkeypatch):
+    monkeypatch.setattr(admission, "CLASS_CACHE_SIZE", 2)
+    monkeypatch.setattr(admission, "_classes", admission.OrderedDict())
+    listing = "query a { getUsers { id } } query b { getNote { id } }"
+
+    assert classify_query(listing, "a") == "listing"
+    assert classify_query(listing, "b") == "read"
+    assert classify_query(listing, "a") == "listing"
+    assert classify_query("{ getNote { id } }" + " " * 100_000, None) == "read"
+
+    assert len(admission._classes) == 2
+    assert all(len(key) == 32 for key in admission._classes)
+    assert classify_query(listing, "a") == "listing"
+
+
+@pytest.mark.admission
+def test_classify_batches_by_most_constrained_operation():
+    operations = [
+        {"query": "{ getNote(userId: 1, noteId: 1) { id } }"},
+        {"query": "{ getAllNotes { id } }"},
+        {"extensions": {"persistedQuery": {}}},
+    ]
+
+    assert classify_operations(operations) == "listing"
+    assert classify_operations({"query": 42}) == "read"
+
+
+@pytest.mark.admission
+def test_classify_request():
+    get = {
+        "type": "http",
+        "method": "GET",
+        "query_string": b"query=%7BgetUsers%7Bid%7D%7D",
+    }
+    post = {"type": "http", "method": "POST", "headers": []}
+    upload = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x")],
+    }
+
+    assert classify_request(get, b"") == "listing"
+    assert classify_request(post, b'{"query": "mutation { editNote { ok } }"}') == (
+        "write"
+    )
+    assert classify_request(post, b"not json") == "read"
+    assert classify_request(upload, b"") == "write"
+
+
+@pytest.mark.admission
+def test_limit_queues_then_sheds_requests():
+    async def scenario():
+        limit = AdaptiveLimit("listing", 1, queue_timeout=0.05, max_queue=1)
+
+        assert await limit.acquire()
+        queued = asyncio.ensure_future(limit.acquire())
+        await asyncio.sleep(0)
+        assert not await limit.acquire()
+
+        limit.release(0.01)
+        assert await queued
+        assert limit.in_flight == 1
+
+        assert not await limit.acquire()
+        return limit
+
+    limit = run(scenario())
+
+    assert limit.admitted == 2
+    assert limit.shed == 2
+
+
+@pytest.mark.admission
+def test_limit_adapts_to_latency():
+    limit = AdaptiveLimit("read", 10, queue_timeout=1, latency_floor=0.01)
+    limit.limit = 5.0
+
+    async def saturate():
+        for _ in range(5):
+            await limit.acquire()
+
+    run(saturate())
+    limit.release(0.005)
+    assert limit.limit == 6.0
+    assert limit.baseline == 0.005
+
+    limit.release(0.5)
+    assert limit.limit == pytest.approx(5.4)
+
+    for _ in range(50):
+        limit.in_flight += 1
+        limit.release(0.5)
+    assert limit.limit == 1.0
+
+
+@pytest.mark.admission
+def test_admission_control_passes_requests_through():
+    control = AdmissionControl(echo_app, limits=build_limits())
+    client = TestClient(control)
+
+    response = client.post("/", json={"query": "{ getUsers { id } }"})
+
+    assert response.status_code == 200
+    assert json.loads(response.json()["body"]) == {"query": "{ getUsers { id } }"}
+    assert control.stats()["listing"]["admitted"] == 1
+    assert control.stats()["listing"]["in_flight"] == 0
+
+
+@pytest.mark.admission
+def test_admission_control_sheds_with_retry_after():
+    limits = build_limits("listing=1", "listing=0")
+    limits["listing"].in_flight = 1
+    client = TestClient(AdmissionControl(echo_app, limits=limits, retry_after=3))
+
+    shed = client.post("/", json={"query": "{ getAllNotes { id } }"})
+    read = client.post("/", json={"query": "{ getNote(userId: 1, noteId: 1) { id } }"})
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "3"
+    error = shed.json()["errors"][0]
+    assert error["extensions"] == {
+        "code": "OVERLOADED",
+        "requestClass": "listing",
+        "retryAfter": 3,
+    }
+    assert read.status_code == 200
+
+
+@pytest.mark.admission
+def test_admission_control_sheds_requests_that_waited_for_the_loop_too_long():
+    limits = build_limits("listing=4", "listing=0")
+    client = TestClient(AdmissionControl(echo_app, limits=limits))
+
+    response = client.post("/", json={"query": "{ getAllNotes { id } }"})
+
+    assert response.status_code == 503
+    assert limits["listing"].stats()["in_flight"] == 0
+    assert limits["listing"].stats()["shed"] == 1
+
+
+@pytest.mark.admission
+def test_admission_control_rejects_large_bodies():
+    control = AdmissionControl(echo_app, limits=build_limits(), max_body_bytes=64)
+    client = TestClient(control)
+    query = {"query": "{ getNote(userId: 1, noteId: 1) { id } }"}
+
+    assert client.post("/", json=query).status_code == 200
+
+    response = client.post("/", json={"query": "{ getUsers { id } }", "x": "y" * 64})
+
+    assert response.status_code == 413
+    assert response.json()["errors"][0]["extensions"] == {
+        "code": "PAYLOAD_TOO_LARGE",
+        "maxBytes": 64,
+    }
+    assert control.stats()["listing"]["admitted"] == 0
+
+
+@pytest.mark.admission
+def test_admission_control_stops_reading_bodies_over_the_limit():
+    control = AdmissionControl(echo_app, limits=build_limits(), max_body_bytes=64)
+    chunks = [b"x" * 40] * 4
+    received = []
+    sent = []
+
+    async def receive():
+        received.append(chunks[len(received)])
+        more_body = len(received) < len(chunks)
+        return {"type": "http.request", "body": received[-1], "more_body": more_body}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": []}
+    run(control(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    assert len(received) == 2
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+
+import pytest
+from graphene import Field, Int, List, ObjectType, Schema, String
+from graphql import parse
+from graphql.utilities import get_operation_ast
+
+from app.gql import app as gql_app
+from app.gql.app import (
+    PersistedQueryNotFound,
+    PersistedQueryStore,
+    TodoGraphQLApp,
+    etag_matches,
+    make_etag,
+)
+from app.gql.cache_control import PUBLIC, cache_hint, get_cache_control
+
+
+class ItemObject(ObjectType):
+    name = String()
+
+
+class Query(ObjectType):
+    public_items = List(ItemObject)
+    private_item = Field(ItemObject, item_id=Int())
+    uncached = Int()
+
+    @staticmethod
+    @cache_hint(max_age=60, scope=PUBLIC)
+    def resolve_public_items(root, info):
+        return []
+
+    @staticmethod
+    @cache_hint(max_age=10)
+    def resolve_private_item(root, info, item_id=None):
+        return None
+
+    @staticmethod
+    def resolve_uncached(root, info):
+        return 1
+
+
+graphene_schema = Schema(query=Query)
+schema = graphene_schema.graphql_schema
+
+
+def cache_control(query: str) -> str:
+    document = parse(query)
+    return get_cache_control(schema, document, get_operation_ast(document))
+
+
+@pytest.mark.gql
+def test_cache_control_uses_lowest_max_age_and_private_scope():
+    assert cache_control("{ publicItems { name } }") == "public, max-age=60"
+    assert (
+        cache_control("{ publicItems { name } privateItem(itemId: 1) { name } }")
+        == "private, max-age=10"
+    )
+
+
+@pytest.mark.gql
+def test_cache_control_without_hint_requires_revalidation():
+    assert cache_control("{ publicItems { name } uncached }") == "private, no-cache"
+
+
+@pytest.mark.gql
+def test_etag_matches_if_none_match_header():
+    etag = make_etag(b'{"data": {}}')
+
+    assert etag == make_etag(b'{"data": {}}')
+    assert etag_matches(etag, f'"other", {etag}')
+    assert etag_matches(etag, f"W/{etag}")
+    assert etag_matches(etag, "*")
+    assert not etag_matches(etag, '"other"')
+    assert not etag_matches(etag, None)
+
+
+@pytest.mark.gql
+class TestPersistedQueryStore:
+    query = "{ publicItems { name } }"
+    query_hash = hashlib.sha256(query.encode()).hexdigest()
+
+    def setup_method(self):
+        self.store = PersistedQueryStore(max_entries=1)
+
+    def extensions(self, query_hash: str) -> dict:
+        return {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+
+    def test_unknown_hash_raises_not_found(self):
+        with pytest.raises(PersistedQueryNotFound):
+            self.store.resolve(None, self.extensions(self.query_hash))
+
+    def test_registered_query_is_resolved_by_hash(self):
+        self.store.resolve(self.query, self.extensions(self.query_hash))
+        assert self.store.resolve(None, self.extensions(self.query_hash)) == self.query
+
+    def test_mismatched_hash_is_rejected(self):
+        with pytest.raises(ValueError):
+            self.store.resolve(self.query, self.extensions("0" * 64))
+
+    def test_oldest_query_is_evicted(self):
+        self.store.resolve(self.query, self.extensions(self.query_hash))
+        other = "{ uncached }"
+        self.store.resolve(
+            other, self.extensions(hashlib.sha256(other.encode()).hexdigest())
+        )
+
+        with pytest.raises(PersistedQueryNotFound):
+            self.store.resolve(None, self.extensions(self.query_hash))
+
+
+@pytest.mark.gql
+class TestBatching:
+    def setup_method(self):
+        self.app = TodoGraphQLApp(schema=graphene_schema)
+
+    def execute_batch(self, operations: list) -> list:
+        return asyncio.run(self.app._execute_batch(operations, {}))
+
+    def test_results_are_returned_in_order(self):
+        results = self.execute_batch(
+            [{"query": "{ uncached }"}, {"query": "{ publicItems { name } }"}]
+        )
+
+        assert results == [
+            {"data": {"uncached": 1}},
+            {"data": {"publicItems": []}},
+        ]
+
+    def test_invalid_operation_does_not_fail_the_batch(self):
+        results = self.execute_batch(["invalid", {"query": "{ uncached }"}])
+
+        assert results[0] == {"errors": ["Operation must be an Object"]}
+        assert results[1] == {"data": {"uncached": 1}}
+
+    def test_queries_run_concurrently_when_enabled(self, monkeypatch):
+        monkeypatch.setattr(gql_app, "GRAPHQL_BATCH_CONCURRENT", True)
+
+        results = self.execute_batch([{"query": "{ uncached }"}] * 3)
+
+        assert results == [{"data": {"uncached": 1}}] * 3
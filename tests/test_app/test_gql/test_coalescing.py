@@ -0,0 +1,230 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from graphene import Schema
+from sqlalchemy import create_engine, event
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.gql import coalescing
+from app.gql.app import TodoGraphQLApp
+from app.gql.coalescing import SingleFlight, coalescing_key, read_fields
+from app.gql.queries import Query
+from app.utils.jwt import generate_jwt
+from app.utils.metrics import coalesced_executions
+
+ALL_NOTES = "query AllNotes { getAllNotes { id title } }"
+
+
+async def wait_until(predicate, timeout=5):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+
+    with database.Session() as session:
+        admins = [
+            User(
+                username=f"admin{index}",
+                email=f"admin{index}@example.com",
+                password_hash="x",
+                is_admin=True,
+            )
+            for index in range(2)
+        ]
+        user = User(username="user", email="user@example.com", password_hash="x")
+        user.notes = [Note(title="a")]
+        session.add_all([*admins, user])
+        session.commit()
+
+    yield engine
+    engine.dispose()
+
+
+def context(email):
+    headers = {"Authorization": f"Bearer {generate_jwt(email)}"}
+    return {"request": SimpleNamespace(headers=headers, scope={})}
+
+
+@pytest.mark.coalescing
+def test_single_flight_collapses_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def main():
+        results = await asyncio.gather(
+            *(single_flight.do("key", fetch) for _ in range(3))
+        )
+
+        # Nothing is kept once the call is over
+        assert single_flight.stats()["in_flight"] == 0
+        return results, await single_flight.do("key", fetch)
+
+    results, fresh = asyncio.run(main())
+
+    assert results == ["rows"] * 3
+    assert fresh == "rows"
+    assert len(calls) == 2
+    assert single_flight.stats() == {"in_flight": 0, "executions": 2, "collapsed": 2}
+
+
+@pytest.mark.coalescing
+def test_single_flight_shares_errors_with_waiting_calls():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("Database is down")
+
+    async def main():
+        return await asyncio.gather(
+            *(single_flight.do("key", fail) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert single_flight.stats()["collapsed"] == 1
+
+
+@pytest.mark.coalescing
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    single_flight = SingleFlight()
+
+    async def main():
+        released = asyncio.Event()
+
+        async def fetch():
+            await released.wait()
+            return "rows"
+
+        leader = asyncio.ensure_future(single_flight.do("key", fetch))
+        follower = asyncio.ensure_future(single_flight.do("key", fetch))
+        await wait_until(lambda: single_flight.stats()["collapsed"] == 1)
+
+        leader.cancel()
+        released.set()
+
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ("rows", True)
+
+
+@pytest.mark.coalescing
+def test_read_fields_of_queries():
+    assert read_fields("{ getUsers { id } }", None) == frozenset(("getUsers",))
+    assert read_fields(
+        "query A { getUsers { id } } query B { getNote(userId: 1, noteId: 1) { id } }",
+        "B",
+    ) == frozenset(("getNote",))
+    assert read_fields("{ ...Root } fragment Root on Query { a }", None) == frozenset(
+        ("...",)
+    )
+    assert read_fields("mutation { deleteNote(noteId: 1) { ok } }", None) is None
+    assert read_fields("{ getUsers {", None) is None
+
+
+@pytest.mark.coalescing
+def test_coalescing_key_scopes(engine):
+    admins = [context(f"admin{index}@example.com") for index in range(2)]
+    user = context("user@example.com")
+    user_notes = "{ getAllUserNotes(userId: 3) { id } }"
+
+    # The admin listings are shared between admins, everything else is per user
+    assert coalescing_key(ALL_NOTES, "AllNotes", None, admins[0]) == coalescing_key(
+        ALL_NOTES, "AllNotes", None, admins[1]
+    )
+    assert coalescing_key(user_notes, None, None, admins[0]) != coalescing_key(
+        user_notes, None, None, admins[1]
+    )
+    assert coalescing_key(user_notes, None, None, user) != coalescing_key(
+        user_notes, None, None, admins[0]
+    )
+    assert coalescing_key(ALL_NOTES, "AllNotes", None, user) != coalescing_key(
+        ALL_NOTES, "AllNotes", None, admins[0]
+    )
+    assert coalescing_key(user_notes, None, {"a": 1}, user) != coalescing_key(
+        user_notes, None, {"a": 2}, user
+    )
+
+
+@pytest.mark.coalescing
+def test_coalescing_key_is_none_for_mutations_anonymous_clients_and_when_disabled(
+    engine, monkeypatch
+):
+    mutation = 'mutation { loginUser(email: "a", password: "b") { token } }'
+    anonymous = {"request": SimpleNamespace(headers={}, scope={})}
+
+    assert coalescing_key(mutation, None, None, context("user@example.com")) is None
+    assert coalescing_key(ALL_NOTES, None, None, anonymous) is None
+
+    monkeypatch.setattr(coalescing, "GRAPHQL_COALESCE_READS", False)
+
+    assert coalescing_key(ALL_NOTES, None, None, context("user@example.com")) is None
+
+
+@pytest.mark.coalescing
+def test_concurrent_http_requests_share_one_fetch(engine):
+    graphql_app = TodoGraphQLApp(schema=Schema(query=Query))
+    selects = []
+    release = threading.Event()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def hold_notes_select(conn, cursor, statement, parameters, context, executemany):
+        if (
+            statement.lstrip().upper().startswith("SELECT")
+            and "FROM notes" in statement
+        ):
+            selects.append(statement)
+            release.wait(5)
+
+    before = coalesced_executions.value("AllNotes")
+
+    async def request(client, email):
+        response = await client.post(
+            "/",
+            json={"query": ALL_NOTES, "operationName": "AllNotes"},
+            headers={"Authorization": f"Bearer {generate_jwt(email)}"},
+        )
+        return response.status_code, response.json()
+
+    async def main():
+        transport = httpx.ASGITransport(app=graphql_app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            responses = asyncio.gather(
+                request(client, "admin0@example.com"),
+                request(client, "admin1@example.com"),
+            )
+            # The second request arrives while the first one waits for the database
+            await wait_until(
+                lambda: graphql_app.single_flight.stats()["collapsed"] == 1
+            )
+            release.set()
+            return await responses
+
+    first, second = asyncio.run(main())
+
+    assert first == second
+    assert first == (200, {"data": {"getAllNotes": [{"id": 1, "title": "a"}]}})
+    assert len(selects) == 1
+    assert coalesced_executions.value("AllNotes") - before == 1
+    assert graphql_app.single_flight.stats()["in_flight"] == 0
@@ -0,0 +1,204 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from graphene import (
+    DateTime,
+    Field,
+    Int,
+    List,
+    Mutation,
+    NonNull,
+    ObjectType,
+    Schema,
+    String,
+)
+from graphql import execute, parse
+
+from app.gql import app as gql_app
+from app.gql.app import TodoGraphQLApp
+from app.gql.compiler import (
+    CompilationError,
+    CompiledQuery,
+    ExecutionPlanCache,
+    compile_query,
+)
+
+ITEMS = [
+    SimpleNamespace(id=i, name=f"item {i}", created_at=datetime(2023, 1, i + 1))
+    for i in range(3)
+]
+
+
+class ItemObject(ObjectType):
+    id = Int()
+    name = String()
+    created_at = DateTime()
+    label = String(prefix=String(default_value="#"))
+    broken = String()
+    required = NonNull(String)
+
+    @staticmethod
+    def resolve_label(root, info, prefix):
+        return f"{prefix}{root.id}"
+
+    @staticmethod
+    def resolve_broken(root, info):
+        raise ValueError("broken")
+
+    @staticmethod
+    def resolve_required(root, info):
+        return None
+
+
+class Query(ObjectType):
+    items = List(ItemObject)
+    item = Field(ItemObject, item_id=Int(required=True))
+    context_value = String()
+
+    @staticmethod
+    def resolve_items(root, info):
+        return ITEMS
+
+    @staticmethod
+    def resolve_item(root, info, item_id):
+        return ITEMS[item_id]
+
+    @staticmethod
+    def resolve_context_value(root, info):
+        return info.context["value"]
+
+
+class Touch(Mutation):
+    ok = Int()
+
+    @staticmethod
+    def mutate(root, info):
+        return Touch(ok=1)
+
+
+class Mutations(ObjectType):
+    touch = Touch.Field()
+
+
+schema = Schema(query=Query, mutation=Mutations).graphql_schema
+
+
+def assert_same_as_stock(query: str, variables=None, context=None):
+    document = parse(query)
+    stock = execute(schema, document, context_value=context, variable_values=variables)
+    compiled = compile_query(schema, document)(None, context, variables)
+
+    assert compiled.data == stock.data
+    assert [e.formatted for e in compiled.errors or []] == [
+        e.formatted for e in stock.errors or []
+    ]
+
+    return compiled
+
+
+@pytest.mark.compiler
+@pytest.mark.parametrize(
+    "query",
+    [
+        "{ items { id name createdAt } }",
+        "{ items { __typename ...Fields } } fragment Fields on ItemObject { id name }",
+        "{ items { ... on ItemObject { id } alias: name } }",
+        '{ items { id label withPrefix: label(prefix: "$") } }',
+        "{ items { id @skip(if: true) name @include(if: true) } }",
+    ],
+)
+def test_compiled_query_matches_stock_executor(query):
+    result = assert_same_as_stock(query)
+
+    assert result.errors is None
+
+
+@pytest.mark.compiler
+def test_compiled_query_coerces_variables_and_passes_context():
+    result = assert_same_as_stock(
+        "query Item($id: Int!) { item(itemId: $id) { id } contextValue }",
+        variables={"id": 2},
+        context={"value": "context"},
+    )
+
+    assert result.data == {"item": {"id": 2}, "contextValue": "context"}
+
+
+@pytest.mark.compiler
+def test_compiled_query_reports_invalid_variables():
+    plan = compile_query(
+        schema, parse("query Item($id: Int!) { item(itemId: $id) { id } }")
+    )
+
+    result = plan(variable_values={})
+
+    assert result.data is None
+    assert "was not provided" in result.errors[0].message
+
+
+@pytest.mark.compiler
+def test_compiled_query_handles_resolver_errors():
+    result = assert_same_as_stock("{ items { id broken } }")
+
+    assert result.data["items"][0] == {"id": 0, "broken": None}
+    assert result.errors[0].path == ["items", 0, "broken"]
+
+
+@pytest.mark.compiler
+def test_compiled_query_propagates_null_of_non_null_field():
+    result = assert_same_as_stock("{ item(itemId: 0) { id required } items { id } }")
+
+    assert result.data["item"] is None
+    assert result.data["items"] == [{"id": 0}, {"id": 1}, {"id": 2}]
+
+
+@pytest.mark.compiler
+@pytest.mark.parametrize(
+    "query",
+    [
+        "mutation { touch { ok } }",
+        "{ __schema { queryType { name } } }",
+        "query Items($skip: Boolean!) { items { id @skip(if: $skip) } }",
+    ],
+)
+def test_unsupported_operations_are_not_compiled(query):
+    with pytest.raises(CompilationError):
+        compile_query(schema, parse(query))
+
+
+@pytest.mark.compiler
+def test_execution_plan_cache_compiles_each_document_once():
+    cache = ExecutionPlanCache(schema)
+
+    plan = cache.get("{ items { id } }")
+
+    assert isinstance(plan, CompiledQuery)
+    assert cache.get("{ items { id } }") is plan
+    assert cache.get("{ unknownField }") is None
+    assert cache.get("mutation { touch { ok } }") is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 3, "compiled": 1}
+
+
+@pytest.mark.compiler
+def test_execution_plan_cache_is_bounded():
+    cache = ExecutionPlanCache(schema, max_entries=1)
+
+    cache.get("{ items { id } }")
+    cache.get("{ items { name } }")
+
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.compiler
+def test_app_executes_compiled_plans(monkeypatch):
+    monkeypatch.setattr(gql_app, "GRAPHQL_COMPILED_EXECUTION", True)
+    app = TodoGraphQLApp(schema=Schema(query=Query))
+
+    response = asyncio.run(
+        app._execute_operation({"query": "{ items { id } }"}, {"value": None})
+    )
+
+    assert response == {"data": {"items": [{"id": 0}, {"id": 1}, {"id": 2}]}}
+    assert app.execution_plans.stats()["compiled"] == 1
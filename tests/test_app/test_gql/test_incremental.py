@@ -0,0 +1,253 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from graphene import Field, Int, List, NonNull, ObjectType, Schema, String
+from graphql import parse, specified_directives, validate
+from sqlalchemy import create_engine
+
+from app.db import database
+from app.db.models import Base, Note
+
+from app.gql import incremental
+from app.gql.incremental import (
+    GraphQLDeferDirective,
+    GraphQLStreamDirective,
+    encode_multipart,
+    execute_incrementally,
+    is_streamed,
+    stream_rows,
+    uses_incremental_delivery,
+)
+
+
+class ItemObject(ObjectType):
+    id = Int()
+    name = String()
+
+
+class BrokenObject(ObjectType):
+    id = Int()
+    name = NonNull(String)
+
+    @staticmethod
+    def resolve_name(root, info):
+        raise ValueError("Name is not available")
+
+
+class Query(ObjectType):
+    items = List(ItemObject, count=Int(default_value=5))
+    broken_items = List(ItemObject)
+    broken = Field(BrokenObject)
+    required_items = List(NonNull(Int))
+    item = Field(ItemObject)
+    streamed = String()
+
+    @staticmethod
+    def resolve_items(root, info, count):
+        return iter(ItemObject(id=i, name=f"item {i}") for i in range(count))
+
+    @staticmethod
+    def resolve_broken_items(root, info):
+        yield ItemObject(id=0, name="item 0")
+        yield ItemObject(id=1, name="item 1")
+        raise ConnectionError("Connection lost")
+
+    @staticmethod
+    def resolve_broken(root, info):
+        return BrokenObject(id=1)
+
+    @staticmethod
+    def resolve_required_items(root, info):
+        return iter([1, None, 3])
+
+    @staticmethod
+    def resolve_item(root, info):
+        return ItemObject(id=1, name="item")
+
+    @staticmethod
+    def resolve_streamed(root, info):
+        return str(is_streamed(info))
+
+
+schema = Schema(
+    query=Query,
+    directives=(*specified_directives, GraphQLDeferDirective, GraphQLStreamDirective),
+).graphql_schema
+
+
+def run(query: str, context=None):
+    document = parse(query)
+    assert not validate(schema, document)
+    return list(execute_incrementally(schema, document, context_value=context))
+
+
+@pytest.mark.incremental
+def test_query_without_directives_is_single_payload():
+    assert run("{ item { id } }") == [{"data": {"item": {"id": 1}}, "hasNext": False}]
+
+
+@pytest.mark.incremental
+def test_defer_delivers_fragment_in_subsequent_payload():
+    payloads = run('{ item { id ... @defer(label: "rest") { name } } }')
+
+    assert payloads == [
+        {"data": {"item": {"id": 1}}, "hasNext": True},
+        {
+            "incremental": [
+                {"data": {"name": "item"}, "path": ["item"], "label": "rest"}
+            ],
+            "hasNext": False,
+        },
+    ]
+
+
+@pytest.mark.incremental
+def test_defer_can_be_disabled():
+    payloads = run("{ item { id ... @defer(if: false) { name } } }")
+
+    assert payloads == [{"data": {"item": {"id": 1, "name": "item"}}, "hasNext": False}]
+
+
+@pytest.mark.incremental
+def test_defer_named_fragment():
+    payloads = run(
+        "{ item { ...Name @defer } } fragment Name on ItemObject { id name }"
+    )
+
+    assert payloads[0]["data"] == {"item": {}}
+    assert payloads[1]["incremental"][0]["data"] == {"id": 1, "name": "item"}
+
+
+@pytest.mark.incremental
+def test_stream_delivers_remaining_items_in_batches(monkeypatch):
+    monkeypatch.setattr(incremental, "STREAM_BATCH_SIZE", 2)
+
+    payloads = run("{ items(count: 5) @stream(initialCount: 1) { id } }")
+
+    assert payloads[0] == {"data": {"items": [{"id": 0}]}, "hasNext": True}
+    assert [p["incremental"][0] for p in payloads[1:]] == [
+        {"items": [{"id": 1}, {"id": 2}], "path": ["items", 1]},
+        {"items": [{"id": 3}, {"id": 4}], "path": ["items", 3]},
+    ]
+    assert payloads[-1]["hasNext"] is False
+
+
+@pytest.mark.incremental
+def test_stream_ending_at_a_batch_boundary_has_no_empty_payload(monkeypatch):
+    monkeypatch.setattr(incremental, "STREAM_BATCH_SIZE", 2)
+
+    payloads = run("{ items(count: 4) @stream { id } }")
+
+    assert [p["incremental"][0]["items"] for p in payloads[1:]] == [
+        [{"id": 0}, {"id": 1}],
+        [{"id": 2}, {"id": 3}],
+    ]
+    assert payloads[-1]["hasNext"] is False
+
+
+@pytest.mark.incremental
+def test_errors_reading_a_stream_are_reported_in_its_payload():
+    payloads = run("{ brokenItems @stream { id } }")
+
+    incremental_result = payloads[1]["incremental"][0]
+    assert incremental_result["items"] == [{"id": 0}, {"id": 1}]
+    assert incremental_result["errors"][0]["message"] == "Connection lost"
+    assert payloads[1]["hasNext"] is False
+
+
+@pytest.mark.incremental
+def test_errors_of_deferred_fragments_are_reported_in_their_payload():
+    payloads = run("{ broken { id ... @defer { name } } item { ... @defer { name } } }")
+
+    assert payloads[0]["data"] == {"broken": {"id": 1}, "item": {}}
+    broken, item = (payload["incremental"][0] for payload in payloads[1:])
+    assert broken["data"] is None
+    assert broken["errors"][0]["message"] == "Name is not available"
+    assert broken["errors"][0]["path"] == ["broken", "name"]
+    assert item == {"data": {"name": "item"}, "path": ["item"]}
+
+
+@pytest.mark.incremental
+def test_unfinished_streams_are_closed_with_the_response(monkeypatch):
+    monkeypatch.setattr(incremental, "STREAM_BATCH_SIZE", 1)
+    closed = []
+
+    def resolve_items(root, info, count):
+        try:
+            yield from (ItemObject(id=i) for i in range(count))
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(schema.query_type.fields["items"], "resolve", resolve_items)
+    payloads = execute_incrementally(
+        schema, parse("{ items(count: 5) @stream { id } }")
+    )
+
+    next(payloads)
+    next(payloads)
+    payloads.close()
+
+    assert closed == [True]
+
+
+@pytest.mark.incremental
+def test_stream_error_of_non_null_item_ends_stream():
+    payloads = run("{ requiredItems @stream(initialCount: 1) }")
+
+    assert payloads[0]["data"] == {"requiredItems": [1]}
+    assert payloads[1]["incremental"][0]["items"] is None
+    assert payloads[1]["incremental"][0]["errors"][0]["path"] == ["requiredItems", 1]
+    assert payloads[1]["hasNext"] is False
+
+
+@pytest.mark.incremental
+def test_is_streamed_requires_incremental_request():
+    assert run("{ streamed @stream }")[0]["data"] == {"streamed": "False"}
+    assert run("{ streamed @stream }", {"incremental": True})[0]["data"] == {
+        "streamed": "True"
+    }
+    assert run("{ streamed }", {"incremental": True})[0]["data"] == {
+        "streamed": "False"
+    }
+
+
+@pytest.mark.incremental
+def test_encode_multipart():
+    body = b"".join(encode_multipart([json.dumps({"a": 1}).encode()]))
+
+    assert body == (
+        b"\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n"
+        b'{"a": 1}\r\n-----\r\n'
+    )
+
+
+@pytest.mark.incremental
+def test_uses_incremental_delivery():
+    assert uses_incremental_delivery("{ items @stream { id } }")
+    assert uses_incremental_delivery("{ item { ... @defer { id } } }")
+    assert not uses_incremental_delivery("{ items { id } }")
+
+
+@pytest.mark.incremental
+def test_stream_rows_releases_the_connection_when_closed(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    monkeypatch.setattr(incremental, "STREAM_BATCH_SIZE", 2)
+
+    with database.Session() as session:
+        session.add_all([Note(title=f"note {i}") for i in range(5)])
+        session.commit()
+
+    field = parse("{ notes @stream { id } }").definitions[0].selection_set.selections
+    info = SimpleNamespace(
+        context={"incremental": True}, field_nodes=field, variable_values={}
+    )
+
+    notes = stream_rows(info, database.Session().query(Note))
+    assert next(notes).title == "note 0"
+    assert engine.pool.checkedout() == 1
+
+    notes.close()
+    assert engine.pool.checkedout() == 0
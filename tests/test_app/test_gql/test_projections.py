@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+
+import pytest
+from graphql import parse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Note, User
+from app.gql import projections
+from app.gql.projections import (
+    NoteRow,
+    UserRow,
+    get_selection,
+    select_notes,
+    select_users,
+    to_rows,
+)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(projections, "Session", Session)
+
+    session = Session()
+    for index in range(2):
+        user = User(
+            username=f"user{index}", email=f"user{index}@example.com", password_hash="x"
+        )
+        user.notes = [Note(title=f"note {index}.{i}", description="") for i in range(3)]
+        session.add(user)
+    session.commit()
+
+    yield session
+    session.close()
+
+
+def info_for(query):
+    document = parse(query)
+    operation = document.definitions[0]
+    fragments = {
+        definition.name.value: definition for definition in document.definitions[1:]
+    }
+    return SimpleNamespace(
+        field_nodes=operation.selection_set.selections, fragments=fragments
+    )
+
+
+@pytest.mark.projections
+def test_get_selection_expands_fragments_in_snake_case():
+    info = info_for(
+        """
+        { getAllNotes { id ...NoteFields ... on NoteObject { createdAt } } }
+        fragment NoteFields on NoteObject { title owner { email } }
+        """
+    )
+
+    assert get_selection(info) == {
+        "id": {},
+        "title": {},
+        "created_at": {},
+        "owner": {"email": {}},
+    }
+
+
+@pytest.mark.projections
+def test_select_notes_loads_only_requested_columns(session):
+    notes = select_notes({"title": {}, "__typename": {}}, Note.owner_id == 1)
+
+    assert [note.title for note in notes] == ["note 0.0", "note 0.1", "note 0.2"]
+    assert all(isinstance(note, NoteRow) for note in notes)
+    assert all(note.description is None and note.owner is None for note in notes)
+
+
+@pytest.mark.projections
+def test_select_notes_shares_owner_rows(session):
+    notes = select_notes({"id": {}, "owner": {"email": {}}})
+
+    assert len(notes) == 6
+    assert notes[0].owner is notes[1].owner
+    assert notes[0].owner == UserRow(id=1, email="user0@example.com")
+
+
+@pytest.mark.projections
+def test_select_notes_keeps_notes_without_owner(session):
+    session.add(Note(title="orphan", description=""))
+    session.commit()
+
+    notes = select_notes({"title": {}, "owner": {"email": {}}})
+
+    assert len(notes) == 7
+    assert notes[-1] == NoteRow(id=7, title="orphan")
+
+
+@pytest.mark.projections
+def test_select_notes_streams_rows(session):
+    notes = select_notes({"id": {}}, stream=True)
+
+    assert not isinstance(notes, list)
+    assert [note.id for note in notes] == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.projections
+def test_select_users_groups_notes(session):
+    users = select_users({"username": {}, "notes": {"title": {}}}, User.id == 2)
+
+    assert len(users) == 1
+    assert users[0].username == "user1"
+    assert [note.title for note in users[0].notes] == [
+        "note 1.0",
+        "note 1.1",
+        "note 1.2",
+    ]
+    assert not hasattr(users[0], "password_hash")
+
+
+@pytest.mark.projections
+@pytest.mark.parametrize(
+    "selection",
+    [
+        {"notes": {"owner": {"id": {}}}},
+        {"password_hash": {}},
+        {"username": {"nested": {}}},
+    ],
+)
+def test_deeper_selections_fall_back_to_orm(session, selection):
+    assert select_users(selection) is None
+
+
+@pytest.mark.projections
+def test_note_owner_notes_fall_back_to_orm(session):
+    assert select_notes({"owner": {"notes": {"id": {}}}}) is None
+
+
+@pytest.mark.projections
+def test_to_rows_detaches_selected_fields(session):
+    user = session.query(User).filter_by(username="user0").one()
+    selection = {"username": {}, "notes": {"title": {}, "owner": {"email": {}}}}
+
+    row = to_rows(user, selection)
+    session.close()
+
+    assert row.username == "user0" and row.email is None
+    assert [note.title for note in row.notes] == ["note 0.0", "note 0.1", "note 0.2"]
+    assert row.notes[0].owner == UserRow(id=row.id, email="user0@example.com")
+    assert to_rows([row, None], selection) == [row, None]
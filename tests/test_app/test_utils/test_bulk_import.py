@@ -0,0 +1,184 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Base, ImportCheckpoint, Note, User
+from app.utils import bulk_import, export
+from app.utils.bulk_import import (
+    InvalidRecord,
+    import_notes,
+    iterate_lines,
+    validate_record,
+)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(bulk_import, "Session", Session)
+
+    session = Session()
+    session.add_all(
+        [
+            User(username="first", email="first@example.com", password_hash="x"),
+            User(username="second", email="second@example.com", password_hash="x"),
+        ]
+    )
+    session.commit()
+
+    yield session
+    session.close()
+
+
+def ndjson(*records):
+    return [json.dumps(record) + "\n" for record in records]
+
+
+def titles(session):
+    return session.scalars(select(Note.title).order_by(Note.id)).all()
+
+
+@pytest.mark.bulk_import
+def test_iterate_lines_joins_split_chunks():
+    chunks = [
+        b'{"title": "caf',
+        "\xe9".encode()[:1],
+        "\xe9".encode()[1:] + b'"}\n{"a',
+        b"}",
+    ]
+
+    assert list(iterate_lines(chunks)) == ['{"title": "café"}\n', '{"a}']
+
+
+@pytest.mark.bulk_import
+@pytest.mark.parametrize(
+    "record, error",
+    [
+        ([], "Record is not an object"),
+        ({"owner_id": 1}, "Missing title"),
+        ({"title": "t", "owner_id": 1, "done": "maybe"}, "Invalid done value"),
+        ({"title": "t", "owner_id": 1, "created_at": "today"}, "Invalid created_at"),
+        ({"title": "t"}, "Missing owner_id or owner_email"),
+    ],
+)
+def test_validate_record_rejects_invalid_records(record, error):
+    with pytest.raises(InvalidRecord, match=error):
+        validate_record(record)
+
+
+@pytest.mark.bulk_import
+def test_validate_record_parses_csv_values():
+    values = validate_record(
+        {"title": "t", "owner_id": "2", "done": "true", "created_at": "2024-01-02"}
+    )
+
+    assert values["owner_id"] == 2
+    assert values["done"] is True
+    assert values["created_at"].day == 2
+
+
+@pytest.mark.bulk_import
+def test_import_notes_from_ndjson(session):
+    report = import_notes(
+        ndjson(
+            {"title": "by id", "owner_id": 1},
+            {"title": "by email", "owner_email": "second@example.com", "done": True},
+            {"title": "unknown owner", "owner_email": "nobody@example.com"},
+            {"owner_id": 1},
+        )
+        + ["not json\n", "\n"],
+        chunk_size=2,
+    )
+
+    assert titles(session) == ["by id", "by email"]
+    assert session.scalars(select(Note.owner_id).order_by(Note.id)).all() == [1, 2]
+    assert report["processed"] == 5
+    assert report["imported"] == 2
+    assert report["rejected"] == 3
+    assert [error["record"] for error in report["errors"]] == [3, 4, 5]
+    assert report["errors"][0]["error"] == "Unknown owner"
+    assert report["rows_per_sec"] > 0
+
+
+@pytest.mark.bulk_import
+def test_import_notes_from_csv(session):
+    lines = [
+        "title,description,done,owner_id\n",
+        'first,"multi\n',
+        'line",false,1\n',
+        "second,,1,2\n",
+    ]
+
+    report = import_notes(lines, "csv")
+
+    assert report["imported"] == 2
+    assert session.scalars(select(Note.description).order_by(Note.id)).all() == [
+        "multi\nline",
+        None,
+    ]
+
+
+@pytest.mark.bulk_import
+def test_interrupted_import_is_resumed(session, monkeypatch):
+    lines = ndjson(*({"title": f"note {i}", "owner_id": 1} for i in range(5)))
+    load_rows = bulk_import.load_rows
+    loads = []
+
+    def failing_load_rows(session, rows):
+        loads.append(rows)
+        if len(loads) == 2:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        load_rows(session, rows)
+
+    monkeypatch.setattr(bulk_import, "load_rows", failing_load_rows)
+
+    with pytest.raises(OperationalError):
+        import_notes(lines, import_id="migration", chunk_size=2)
+
+    assert titles(session) == ["note 0", "note 1"]
+
+    report = import_notes(lines, import_id="migration", chunk_size=2)
+
+    assert report["resumed_from"] == 2
+    assert report["processed"] == 5
+    assert report["imported"] == 5
+    assert titles(session) == [f"note {i}" for i in range(5)]
+    assert session.get(ImportCheckpoint, "migration").processed == 5
+
+
+@pytest.mark.bulk_import
+def test_import_endpoint_streams_request_body(session, monkeypatch):
+    monkeypatch.setattr(
+        export,
+        "get_authenticated_user",
+        lambda context: (SimpleNamespace(is_admin=True), "token"),
+    )
+    app = FastAPI()
+    app.include_router(bulk_import.router)
+    client = TestClient(app)
+
+    def body():
+        for line in ndjson(*({"title": f"note {i}", "owner_id": 2} for i in range(3))):
+            yield line.encode()
+
+    response = client.post(
+        "/import/notes", params={"import_id": "upload"}, content=body()
+    )
+
+    assert response.status_code == 200
+    assert response.json()["import_id"] == "upload"
+    assert response.json()["imported"] == 3
+    assert titles(session) == ["note 0", "note 1", "note 2"]
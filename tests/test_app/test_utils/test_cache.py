@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import pytest
+from graphene import Schema
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import database
+from app.db.models import Base, User, Note
+from app.gql.mutations import Mutation
+from app.gql.projections import NoteRow
+from app.gql.queries import Query
+from app.utils import cache
+from app.utils.cache import ResponseCache, estimate_size, make_cache_key
+from app.utils.jwt import generate_jwt
+
+
+@pytest.mark.cache
+class TestResponseCache:
+    def setup_method(self):
+        self.cache = ResponseCache(max_bytes=1024)
+
+    def test_get_returns_stored_value(self):
+        self.cache.set("key", "value", tags=("notes:1",))
+        assert self.cache.get("key") == "value"
+
+    def test_get_returns_default_for_missing_key(self):
+        assert self.cache.get("missing", "default") == "default"
+
+    def test_invalidate_removes_tagged_entries(self):
+        self.cache.set("a", "value", tags=("notes:1",))
+        self.cache.set("b", "value", tags=("notes:1", "user:1"))
+        self.cache.set("c", "value", tags=("notes:2",))
+
+        assert self.cache.invalidate("notes:1") == 2
+        assert self.cache.get("a") is None
+        assert self.cache.get("b") is None
+        assert self.cache.get("c") == "value"
+
+    def test_least_recently_used_entry_is_evicted(self):
+        value = "x" * 300
+        self.cache.set("a", value)
+        self.cache.set("b", value)
+        self.cache.get("a")
+        self.cache.set("c", value)
+
+        assert self.cache.get("a") == value
+        assert self.cache.get("b") is None
+        assert self.cache.stats()["bytes"] <= self.cache.max_bytes
+
+    def test_value_larger_than_budget_is_not_stored(self):
+        self.cache.set("a", "x" * 2048)
+        assert self.cache.get("a") is None
+
+    def test_entries_expire_after_the_ttl(self, monkeypatch):
+        now = SimpleNamespace(value=0.0)
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now.value)
+        self.cache.ttl = 30
+
+        self.cache.set("a", "value")
+        now.value = 29
+        assert self.cache.get("a") == "value"
+
+        now.value = 30
+        assert self.cache.get("a") is None
+        assert self.cache.stats()["expirations"] == 1
+        assert self.cache.stats()["entries"] == 0
+
+    def test_stats_report_hit_rate_and_fan_out(self):
+        self.cache.set("a", "value", tags=("notes:1",))
+        self.cache.set("b", "value", tags=("notes:1",))
+        self.cache.get("a")
+        self.cache.get("missing")
+        self.cache.invalidate("notes:1")
+
+        stats = self.cache.stats()
+        assert stats["hit_rate"] == 0.5
+        assert stats["invalidation_fan_out"] == 2
+        assert stats["entries"] == 0
+        assert stats["bytes"] == 0
+
+
+@pytest.mark.cache
+def test_make_cache_key_depends_on_principal():
+    key = make_cache_key("Query.getNote", {"user_id": 1, "note_id": 2}, 1)
+
+    assert key == make_cache_key("Query.getNote", {"note_id": 2, "user_id": 1}, 1)
+    assert key != make_cache_key("Query.getNote", {"user_id": 1, "note_id": 2}, 2)
+
+
+@pytest.mark.cache
+def test_estimate_size_handles_relationship_cycles():
+    user = User(id=1, username="user", email="user@user.com", password_hash="hash")
+    note = Note(id=1, title="title", owner=user)
+
+    assert estimate_size([note]) > estimate_size("title")
+
+
+@pytest.mark.cache
+def test_cached_resolver_stores_detached_rows(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    monkeypatch.setattr(cache, "response_cache", ResponseCache())
+
+    with database.Session() as session:
+        user = User(username="user", email="user@example.com", password_hash="x")
+        user.notes = [Note(title="note")]
+        session.add(user)
+        session.commit()
+
+    schema = Schema(query=Query, mutation=Mutation)
+    context = {
+        "request": SimpleNamespace(
+            headers={"Authorization": f"Bearer {generate_jwt('user@example.com')}"},
+            scope={},
+        )
+    }
+    # Selecting the owner's notes is deeper than projections go, so the ORM is used
+    query = "{ getNote(userId: 1, noteId: 1) { title owner { notes { title } } } }"
+
+    first = schema.execute(query, context_value=context)
+    second = schema.execute(query, context_value=context)
+    other = schema.execute(
+        "{ getNote(userId: 1, noteId: 1) { id } }", context_value=context
+    )
+
+    assert first.errors is None
+    assert second.data == first.data
+    assert other.data == {"getNote": {"id": 1}}
+    assert cache.response_cache.stats()["hits"] == 1
+    assert all(
+        isinstance(value, NoteRow)
+        for value, *_ in cache.response_cache._entries.values()
+    )
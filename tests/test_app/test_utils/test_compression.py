@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.utils import compression
+from app.utils.compression import CompressionMiddleware, choose_encoding
+
+
+def make_app(chunks: list, headers=()):
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json"), *headers],
+            }
+        )
+        for index, chunk in enumerate(chunks):
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": index < len(chunks) - 1,
+                }
+            )
+
+    return app
+
+
+def call(app, accept_encoding: str) -> list:
+    messages = []
+    scope = {
+        "type": "http",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, receive, send))
+    return messages
+
+
+@pytest.mark.compression
+def test_choose_encoding_respects_quality_values(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("br, gzip;q=0.5") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("") is None
+
+
+@pytest.mark.compression
+def test_large_response_is_compressed():
+    body = b'{"data": "' + b"x" * 1000 + b'"}'
+    start, message = call(make_app([body]), "gzip")
+
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert int(headers[b"content-length"]) == len(message["body"])
+    assert gzip.decompress(message["body"]) == body
+
+
+@pytest.mark.compression
+def test_etags_are_weak_for_clients_accepting_compression():
+    body = b'{"data": "' + b"x" * 1000 + b'"}'
+    etag = (b"etag", b'"abc"')
+
+    compressed, _ = call(make_app([body], [etag]), "gzip")
+    small, _ = call(make_app([b"{}"], [etag]), "gzip")
+    identity, _ = call(make_app([body], [etag]), "identity")
+
+    assert dict(compressed["headers"])[b"etag"] == b'W/"abc"'
+    assert dict(small["headers"])[b"etag"] == b'W/"abc"'
+    assert dict(identity["headers"])[b"etag"] == b'"abc"'
+
+
+@pytest.mark.compression
+def test_small_response_is_not_compressed():
+    start, message = call(make_app([b'{"data": null}']), "gzip")
+
+    assert b"content-encoding" not in dict(start["headers"])
+    assert message["body"] == b'{"data": null}'
+
+
+@pytest.mark.compression
+def test_streamed_chunks_are_flushed_immediately():
+    chunks = [b"first line\n", b"second line\n"]
+    start, first, second = call(make_app(chunks), "gzip")
+
+    assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+    assert first["body"]
+    assert gzip.decompress(first["body"] + second["body"]) == b"".join(chunks)
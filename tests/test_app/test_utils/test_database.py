@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.utils import database as database_utils
+from app.utils.password import get_password_hasher
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    monkeypatch.setattr(database_utils, "get_engine", lambda: engine)
+    monkeypatch.setattr(database_utils, "Session", sessionmaker(bind=engine))
+    return engine
+
+
+@pytest.mark.database
+def test_ensure_database_creates_missing_tables(engine):
+    database_utils.ensure_database()
+
+    assert set(inspect(engine).get_table_names()) == set(Base.metadata.tables)
+
+
+@pytest.mark.database
+def test_ensure_database_keeps_existing_data(engine):
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(username="user", email="user@example.com", password_hash="x"))
+    session.commit()
+
+    database_utils.ensure_database()
+
+    assert session.query(User).count() == 1
+    session.close()
+
+
+@pytest.mark.database
+def test_ensure_database_seeds_admin_once(engine):
+    database_utils.ensure_database(seed_admin=True)
+    database_utils.ensure_database(seed_admin=True)
+
+    session = sessionmaker(bind=engine)()
+    assert session.query(User).filter_by(is_admin=True).count() == 1
+    assert session.query(Note).count() == 0
+    session.close()
+
+
+@pytest.mark.database
+def test_engine_is_created_once_and_bound_lazily():
+    assert database.get_engine() is database.get_engine()
+    assert database.engine is database.get_engine()
+
+    session = database.Session()
+    assert session.get_bind() is database.get_engine()
+    session.close()
+
+
+@pytest.mark.database
+def test_password_hasher_is_shared():
+    assert get_password_hasher() is get_password_hasher()
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from graphql import GraphQLError
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Base, Note, User
+from app.utils import export
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(export, "Session", Session)
+
+    with Session() as session:
+        for index in range(2):
+            user = User(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password_hash="secret hash",
+                created_at=datetime(2023, 1, index + 1),
+            )
+            user.notes = [
+                Note(
+                    title=f"note {index}.{i}",
+                    description="with, comma",
+                    created_at=datetime(2023, 1, i + 1),
+                )
+                for i in range(3)
+            ]
+            session.add(user)
+        session.commit()
+
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        export,
+        "get_authenticated_user",
+        lambda context: (SimpleNamespace(is_admin=True), "token"),
+    )
+
+    app = FastAPI()
+    app.include_router(export.router)
+    return TestClient(app)
+
+
+@pytest.mark.export
+def test_export_notes_as_ndjson(client):
+    response = client.get("/export/notes")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    notes = [json.loads(line) for line in response.text.splitlines()]
+    assert [note["id"] for note in notes] == [1, 2, 3, 4, 5, 6]
+    assert notes[0]["title"] == "note 0.0"
+    assert notes[0]["created_at"].startswith("2023-01-01")
+
+
+@pytest.mark.export
+def test_export_notes_as_csv_with_filters(client):
+    response = client.get(
+        "/export/notes",
+        params={"format": "csv", "owner_id": 2, "created_after": "2023-01-02"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["note 1.1", "note 1.2"]
+    assert rows[0]["description"] == "with, comma"
+
+
+@pytest.mark.export
+def test_export_users_omits_password_hash(client):
+    response = client.get("/export/users", params={"created_before": "2023-01-02"})
+
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["email"] for user in users] == ["user0@example.com"]
+    assert "password_hash" not in users[0]
+
+
+@pytest.mark.export
+def test_export_rejects_unknown_format(client):
+    assert client.get("/export/notes", params={"format": "xml"}).status_code == 422
+
+
+@pytest.mark.export
+def test_export_requires_admin(client, monkeypatch):
+    monkeypatch.setattr(
+        export,
+        "get_authenticated_user",
+        lambda context: (SimpleNamespace(is_admin=False), "token"),
+    )
+    assert client.get("/export/notes").status_code == 403
+
+    def fail(context):
+        raise GraphQLError("Missing authentication token")
+
+    monkeypatch.setattr(export, "get_authenticated_user", fail)
+    response = client.get("/export/users")
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Missing authentication token"}
+
+
+@pytest.mark.export
+def test_iterate_batches_reads_in_batches(client):
+    batches = list(export.iterate_batches(select(Note.id), batch_size=4))
+
+    assert [len(batch) for batch in batches] == [4, 2]
@@ -0,0 +1,241 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from graphene import Schema
+from graphql import GraphQLError
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.gql.mutations import Mutation
+from app.gql.queries import Query
+from app.utils import idempotency
+from app.utils.idempotency import IdempotencyStore, fingerprint, idempotency_key
+from app.utils.jwt import generate_jwt
+
+CREATE_NOTE = """
+    mutation ($title: String!, $key: String) {
+        createNote(title: $title, idempotencyKey: $key) { note { id title } }
+    }
+"""
+
+
+def request(headers):
+    return {"request": SimpleNamespace(headers=headers, scope={})}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    monkeypatch.setattr(idempotency, "store", IdempotencyStore())
+
+    with database.Session() as session:
+        session.add_all(
+            [
+                User(username="first", email="first@example.com", password_hash="x"),
+                User(username="second", email="second@example.com", password_hash="x"),
+            ]
+        )
+        session.commit()
+
+    return engine
+
+
+def create_note(email, title="note", key=None, headers=None):
+    schema = Schema(query=Query, mutation=Mutation)
+    headers = dict(headers or {}, Authorization=f"Bearer {generate_jwt(email)}")
+
+    return schema.execute(
+        CREATE_NOTE,
+        variable_values={"title": title, "key": key},
+        context_value=request(headers),
+    )
+
+
+def note_count():
+    with database.Session() as session:
+        return session.query(Note).count()
+
+
+@pytest.mark.idempotency
+def test_store_replays_the_first_result():
+    store = IdempotencyStore()
+    calls = []
+
+    def run():
+        calls.append(1)
+        return len(calls)
+
+    assert store.run("key", "args", run) == 1
+    assert store.run("key", "args", run) == 1
+    assert store.run("other", "args", run) == 2
+    assert store.stats() == {
+        "entries": 2,
+        "executions": 2,
+        "replays": 1,
+        "evictions": 0,
+    }
+
+
+@pytest.mark.idempotency
+def test_store_rejects_keys_reused_with_other_arguments():
+    store = IdempotencyStore()
+    store.run("key", "args", lambda: 1)
+
+    with pytest.raises(GraphQLError) as error:
+        store.run("key", "other args", lambda: 2)
+
+    assert error.value.extensions == {"code": "IDEMPOTENCY_KEY_REUSED"}
+
+
+@pytest.mark.idempotency
+def test_store_does_not_keep_failures():
+    store = IdempotencyStore()
+
+    def fail():
+        raise GraphQLError("Failed")
+
+    with pytest.raises(GraphQLError):
+        store.run("key", "args", fail)
+
+    assert store.run("key", "args", lambda: 1) == 1
+
+
+@pytest.mark.idempotency
+def test_store_expires_and_evicts_entries(monkeypatch):
+    now = SimpleNamespace(value=0.0)
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: now.value)
+    store = IdempotencyStore(ttl=60, max_entries=2)
+
+    for key in "abc":
+        store.run(key, "args", lambda: key)
+    assert store.stats()["evictions"] == 1
+    assert store.run("a", "args", lambda: "again") == "again"
+
+    now.value = 61
+    assert store.run("b", "args", lambda: "expired") == "expired"
+    assert store.stats()["entries"] == 1
+
+
+@pytest.mark.idempotency
+def test_store_makes_concurrent_duplicates_wait():
+    store = IdempotencyStore(wait_timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    first = threading.Thread(target=lambda: results.append(store.run("k", "a", slow)))
+    first.start()
+    started.wait(5)
+    duplicate = threading.Thread(
+        target=lambda: results.append(store.run("k", "a", slow))
+    )
+    duplicate.start()
+    release.set()
+    first.join(5)
+    duplicate.join(5)
+
+    assert results == ["result", "result"]
+    assert len(calls) == 1
+
+
+@pytest.mark.idempotency
+def test_store_gives_up_waiting_after_the_timeout():
+    store = IdempotencyStore(wait_timeout=0)
+    store._entries["key"] = idempotency._Entry("args", float("inf"))
+
+    with pytest.raises(GraphQLError) as error:
+        store.run("key", "args", lambda: 1)
+
+    assert error.value.extensions == {"code": "IDEMPOTENCY_IN_PROGRESS"}
+
+
+@pytest.mark.idempotency
+def test_idempotency_key_prefers_the_argument():
+    info = SimpleNamespace(context=request({"Idempotency-Key": "header"}))
+
+    assert idempotency_key(info) == "header"
+    assert idempotency_key(info, "argument") == "argument"
+    assert idempotency_key(SimpleNamespace(context=request({}))) is None
+
+    with pytest.raises(GraphQLError):
+        idempotency_key(info, "x" * 256)
+
+
+@pytest.mark.idempotency
+def test_fingerprint_ignores_argument_order():
+    assert fingerprint({"a": 1, "b": 2}) == fingerprint({"b": 2, "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+
+@pytest.mark.idempotency
+def test_retried_mutation_returns_the_stored_note(engine):
+    first = create_note("first@example.com", key="retry-1")
+    retry = create_note("first@example.com", headers={"Idempotency-Key": "retry-1"})
+
+    assert first.errors is None
+    assert retry.data == first.data
+    assert note_count() == 1
+
+    create_note("first@example.com")
+    create_note("first@example.com")
+    assert note_count() == 3
+
+
+@pytest.mark.idempotency
+def test_idempotency_keys_are_scoped_to_the_user(engine):
+    first = create_note("first@example.com", key="shared")
+    second = create_note("second@example.com", key="shared")
+
+    assert first.errors is None and second.errors is None
+    assert first.data != second.data
+    assert note_count() == 2
+
+
+@pytest.mark.idempotency
+def test_idempotency_keys_are_scoped_to_the_field_not_the_alias(engine):
+    schema = Schema(query=Query, mutation=Mutation)
+    headers = {"Authorization": f"Bearer {generate_jwt('first@example.com')}"}
+    mutation = """
+        mutation {
+            first: createNote(title: "note", idempotencyKey: "aliased") { note { id } }
+            second: createNote(title: "note", idempotencyKey: "aliased") { note { id } }
+        }
+    """
+
+    result = schema.execute(mutation, context_value=request(headers))
+
+    assert result.errors is None
+    assert result.data["first"] == result.data["second"]
+    assert note_count() == 1
+
+
+@pytest.mark.idempotency
+def test_reused_key_with_other_arguments_fails(engine):
+    create_note("first@example.com", title="first", key="key")
+    result = create_note("first@example.com", title="second", key="key")
+
+    assert result.errors[0].extensions["code"] == "IDEMPOTENCY_KEY_REUSED"
+    assert note_count() == 1
+
+
+@pytest.mark.idempotency
+def test_token_mutations_do_not_take_idempotency_keys():
+    mutation_type = Schema(query=Query, mutation=Mutation).graphql_schema.mutation_type
+
+    assert "idempotencyKey" in mutation_type.fields["registerUser"].args
+    assert "idempotencyKey" not in mutation_type.fields["loginUser"].args
+    assert "idempotencyKey" not in mutation_type.fields["regenerateJwt"].args
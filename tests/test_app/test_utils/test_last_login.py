@@ -0,0 +1,159 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Base, User
+from app.utils import last_login
+from app.utils.cache import response_cache, user_tags
+from app.utils.last_login import LastLoginBuffer
+
+MORNING = datetime(2024, 1, 1, 8)
+EVENING = datetime(2024, 1, 1, 20)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(last_login, "Session", Session)
+
+    with Session() as session:
+        session.add_all(
+            [
+                User(
+                    username=f"user{i}", email=f"user{i}@example.com", password_hash="x"
+                )
+                for i in range(3)
+            ]
+        )
+        session.commit()
+
+    return engine
+
+
+@pytest.fixture
+def buffer():
+    buffer = LastLoginBuffer(flush_interval=60, flush_size=100)
+    yield buffer
+    buffer.stop()
+
+
+def last_logins(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(select(User.id, User.last_login)).all())
+
+
+@pytest.mark.last_login
+def test_repeated_logins_are_coalesced(engine, buffer):
+    buffer.record(1, MORNING)
+    buffer.record(1, EVENING)
+    buffer.record(1, MORNING)
+
+    assert buffer.get(1) == EVENING
+    assert last_logins(engine)[1] is None
+
+    assert buffer.flush() == 1
+    assert buffer.get(1) is None
+    assert last_logins(engine)[1] == EVENING
+
+
+@pytest.mark.last_login
+def test_flush_is_one_batched_update(engine, buffer):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    buffer.record(1, MORNING)
+    buffer.record(2, EVENING)
+
+    assert buffer.flush() == 2
+    assert [s for s in statements if s.startswith("UPDATE")] == [
+        "UPDATE users SET last_login=? WHERE users.id = ?"
+    ]
+    assert last_logins(engine) == {1: MORNING, 2: EVENING, 3: None}
+
+
+@pytest.mark.last_login
+def test_size_threshold_triggers_background_flush(engine):
+    buffer = LastLoginBuffer(flush_interval=60, flush_size=2)
+    buffer.record(1, MORNING)
+    buffer.record(2, MORNING)
+
+    deadline = time.monotonic() + 5
+    while last_logins(engine)[2] is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert last_logins(engine) == {1: MORNING, 2: MORNING, 3: None}
+    buffer.stop()
+
+
+@pytest.mark.last_login
+def test_stop_flushes_remaining_logins(engine, buffer):
+    buffer.record(3, EVENING)
+    buffer.stop()
+
+    assert last_logins(engine)[3] == EVENING
+
+
+@pytest.mark.last_login
+def test_failed_flush_keeps_logins(engine, buffer, monkeypatch):
+    Session = last_login.Session
+
+    def broken_session():
+        raise OperationalError("UPDATE", {}, Exception("database is locked"))
+
+    buffer.record(1, EVENING)
+    monkeypatch.setattr(last_login, "Session", broken_session)
+
+    with pytest.raises(OperationalError):
+        buffer.flush()
+
+    buffer.record(1, MORNING)
+    assert buffer.get(1) == EVENING
+
+    monkeypatch.setattr(last_login, "Session", Session)
+    assert buffer.flush() == 1
+    assert last_logins(engine)[1] == EVENING
+
+
+@pytest.mark.last_login
+def test_logins_stay_readable_until_the_flush_commits(engine, buffer):
+    seen = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: seen.append(buffer.get(1)),
+    )
+
+    buffer.record(1, EVENING)
+    buffer.flush()
+
+    assert seen == [EVENING]
+    assert buffer.get(1) is None
+
+
+@pytest.mark.last_login
+def test_flush_invalidates_cached_responses_of_the_users(engine, buffer):
+    response_cache.set("get_user:1", "before the login", user_tags(1))
+    response_cache.set("get_user:2", "untouched", user_tags(2))
+
+    buffer.record(1, EVENING)
+    assert response_cache.get("get_user:1") == "before the login"
+
+    buffer.flush()
+
+    assert response_cache.get("get_user:1") is None
+    assert response_cache.get("get_user:2") == "untouched"
@@ -0,0 +1,115 @@
+import logging
+import tracemalloc
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.utils import memory
+from app.utils.memory import (
+    SnapshotStore,
+    allocation_budget,
+    diff_snapshots,
+    mapped_object_counts,
+    memory_report,
+    session_stats,
+)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+
+    with database.Session() as session:
+        user = User(username="user", email="user@example.com", password_hash="x")
+        user.notes = [Note(title=f"note {index}") for index in range(3)]
+        session.add(user)
+        session.commit()
+
+    return engine
+
+
+@pytest.fixture
+def tracing_allocations():
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+
+    yield
+
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+@pytest.mark.memory
+def test_session_stats_counts_identity_maps(engine):
+    before = session_stats()["live"]
+    leaked = database.Session()
+    notes = leaked.query(Note).all()
+    closed = database.Session()
+    closed.query(User).all()
+    closed.close()
+
+    stats = session_stats()
+
+    assert stats["live"] == before + 2
+    assert stats["in_transaction"] >= 1
+    assert 4 in stats["largest_identity_maps"]
+    assert stats["identity_mapped_by_type"]["Note"] >= len(notes)
+    assert stats["identity_mapped_by_type"]["User"] >= 1
+
+    leaked.close()
+
+
+@pytest.mark.memory
+def test_mapped_object_counts_include_detached_objects():
+    note = Note(title="detached")
+
+    assert mapped_object_counts()["Note"] >= 1
+    assert note.title == "detached"
+
+
+@pytest.mark.memory
+def test_memory_report():
+    report = memory_report()
+
+    assert set(report) == {"process", "sessions", "mapped_objects", "gc", "tracemalloc"}
+    assert report["process"]["max_rss_bytes"] > 0
+    assert report["gc"]["tracked_objects"] > 0
+
+
+@pytest.mark.memory
+def test_snapshot_diff_shows_new_allocations(tracing_allocations):
+    store = SnapshotStore(max_entries=2)
+    first = store.take()
+    retained = [bytearray(1024) for _ in range(200)]
+    second = store.take()
+
+    diff = diff_snapshots(store.get(first), store.get(second), limit=5)
+
+    assert diff["size_diff_bytes"] >= 200 * 1024
+    assert "test_memory.py" in diff["top"][0]["traceback"][0]
+    assert len(retained) == 200
+
+    store.take()
+    assert store.get(first) is None
+
+
+@pytest.mark.memory
+def test_allocation_budget_logs_offenders(tracing_allocations, caplog):
+    with caplog.at_level(logging.WARNING, logger=memory.__name__):
+        with allocation_budget("small", budget_kb=64):
+            bytearray(1024)
+        with allocation_budget("large", budget_kb=64):
+            bytearray(256 * 1024)
+        with allocation_budget("disabled", budget_kb=0):
+            bytearray(256 * 1024)
+
+    assert len(caplog.records) == 1
+    assert caplog.records[0].getMessage().startswith("Request large allocated")
@@ -0,0 +1,217 @@
+from functools import wraps
+
+import pytest
+from graphene import Int, List, Mutation, ObjectType, Schema, String
+from graphql import GraphQLError, graphql_sync
+from sqlalchemy import create_engine
+
+from app.utils import metrics
+from app.utils.metrics import (
+    Counter,
+    Histogram,
+    Metric,
+    instrument_resolvers,
+    record_errors,
+    record_operation,
+    registry,
+    resolver_label,
+    timed,
+    wrap_resolvers,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+class ItemObject(ObjectType):
+    id = Int()
+    label = String()
+
+    @staticmethod
+    def resolve_label(root, info):
+        return f"#{root['id']}"
+
+
+class Query(ObjectType):
+    get_items = List(ItemObject)
+    get_broken = String()
+
+    @staticmethod
+    def resolve_get_items(root, info):
+        return [{"id": 1}, {"id": 2}]
+
+    @staticmethod
+    def resolve_get_broken(root, info):
+        raise GraphQLError("Broken")
+
+
+class CreateItem(Mutation):
+    id = Int()
+
+    @staticmethod
+    def mutate(root, info):
+        return CreateItem(id=3)
+
+
+class Mutations(ObjectType):
+    create_item = CreateItem.Field()
+
+
+def build_schema(**kwargs):
+    schema = Schema(query=Query, mutation=Mutations).graphql_schema
+    instrument_resolvers(schema, **kwargs)
+    return schema
+
+
+@pytest.mark.metrics
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1))
+    histogram.observe(0.05, "/")
+    histogram.observe(0.1, "/")
+    histogram.observe(5, "/")
+
+    assert histogram.render() == (
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{route="/",le="0.1"} 2\n'
+        'latency_seconds_bucket{route="/",le="1"} 2\n'
+        'latency_seconds_bucket{route="/",le="+Inf"} 3\n'
+        'latency_seconds_sum{route="/"} 5.15\n'
+        'latency_seconds_count{route="/"} 3\n'
+    )
+
+
+@pytest.mark.metrics
+def test_counter_escapes_labels_and_caps_series():
+    counter = Counter("errors_total", "Errors", ["operation"], max_series=2)
+    counter.inc('say "hi"\n')
+    counter.inc("second", amount=2)
+    counter.inc("third")
+    counter.inc("fourth")
+
+    assert counter.render().splitlines()[2:] == [
+        'errors_total{operation="say \\"hi\\"\\n"} 1',
+        'errors_total{operation="second"} 2',
+        'errors_total{operation="other"} 2',
+    ]
+
+
+@pytest.mark.metrics
+def test_metrics_have_to_implement_their_samples():
+    class Gauge(Metric):
+        type = "gauge"
+
+        def _new_series(self):
+            return [0.0]
+
+    with pytest.raises(TypeError):
+        Gauge("temperature", "Temperature")
+
+
+@pytest.mark.metrics
+def test_resolver_label():
+    assert resolver_label(Query.resolve_get_items) == "Query.get_items"
+    assert resolver_label(CreateItem.mutate) == "CreateItem.mutate"
+    assert resolver_label(lambda root, info: None) == "<lambda>"
+    assert resolver_label(object()) is None
+
+
+@pytest.mark.metrics
+def test_root_resolvers_are_timed():
+    schema = build_schema()
+
+    result = graphql_sync(schema, "{ getItems { id label } getBroken }")
+    graphql_sync(schema, "mutation { createItem { id } }")
+
+    assert result.data["getItems"] == [
+        {"id": 1, "label": "#1"},
+        {"id": 2, "label": "#2"},
+    ]
+    duration = metrics.resolver_duration
+    assert duration.count("Query.get_items") == 1
+    assert duration.count("Query.get_broken") == 1
+    assert duration.count("CreateItem.mutate") == 1
+    assert duration.count("ItemObject.label") == 0
+    assert metrics.resolver_errors.value("Query.get_broken") == 1
+
+
+@pytest.mark.metrics
+def test_nested_resolvers_can_be_timed():
+    schema = build_schema(nested_resolvers=True)
+    instrument_resolvers(schema, nested_resolvers=True)
+
+    graphql_sync(schema, "{ getItems { label } }")
+
+    assert metrics.resolver_duration.count("ItemObject.label") == 2
+    assert metrics.resolver_duration.count("Query.get_items") == 1
+
+
+@pytest.mark.metrics
+def test_wrap_resolvers_skips_marked_resolvers():
+    schema = Schema(query=Query, mutation=Mutations).graphql_schema
+    wrapped = []
+
+    def wrap(resolver, label):
+        wrapped.append(label)
+
+        @wraps(resolver)
+        def wrapper(root, info, **args):
+            return resolver(root, info, **args)
+
+        wrapper.test_label = label
+        return wrapper
+
+    wrap_resolvers(schema, wrap, "test_label", nested_resolvers=True)
+    wrap_resolvers(schema, wrap, "test_label", nested_resolvers=True)
+    instrument_resolvers(schema, nested_resolvers=True)
+
+    assert sorted(wrapped) == [
+        "CreateItem.mutate",
+        "ItemObject.label",
+        "Query.get_broken",
+        "Query.get_items",
+    ]
+    assert graphql_sync(schema, "{ getItems { label } }").data == {
+        "getItems": [{"label": "#1"}, {"label": "#2"}]
+    }
+    assert metrics.resolver_duration.count("ItemObject.label") == 2
+
+
+@pytest.mark.metrics
+def test_operation_records_sql_statements_and_errors():
+    engine = create_engine("sqlite://")
+    metrics.install_sql_metrics()
+
+    with record_operation("Notes") as stats:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+            connection.exec_driver_sql("SELECT 2")
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 3")
+
+    record_errors("Notes", [GraphQLError("first"), GraphQLError("second")])
+    record_errors(None, [])
+
+    assert stats.sql_statements == 2
+    assert stats.sql_seconds > 0
+    assert metrics.operation_duration.count("Notes") == 1
+    assert metrics.operation_sql_statements.count("Notes") == 1
+    assert metrics.operation_errors.value("Notes") == 2
+    assert metrics.operation_errors.value("anonymous") == 0
+
+
+@pytest.mark.metrics
+def test_timed_decorator():
+    histogram = Histogram("work_seconds", "Work")
+
+    @timed(histogram)
+    def work(value):
+        return value * 2
+
+    assert work(2) == 4
+    assert histogram.count() == 1
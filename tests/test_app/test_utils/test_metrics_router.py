@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from graphql import GraphQLError
+
+from app.utils import export, metrics, metrics_router
+
+
+@pytest.fixture
+def client():
+    metrics.registry.clear()
+    metrics.operation_duration.observe(0.2, "Notes")
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    yield TestClient(app)
+    metrics.registry.clear()
+
+
+def authenticate(monkeypatch, is_admin):
+    monkeypatch.setattr(
+        export,
+        "get_authenticated_user",
+        lambda context: (SimpleNamespace(is_admin=is_admin), "token"),
+    )
+
+
+def reject(context):
+    raise GraphQLError("Cannot authenticate user")
+
+
+@pytest.mark.metrics
+def test_metrics_endpoint_renders_the_registry(client, monkeypatch):
+    authenticate(monkeypatch, is_admin=True)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert (
+        response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    )
+    assert 'graphql_operation_duration_seconds_count{operation="Notes"} 1' in (
+        response.text
+    )
+
+
+@pytest.mark.metrics
+def test_metrics_endpoint_is_restricted_to_admins(client, monkeypatch):
+    monkeypatch.setattr(export, "get_authenticated_user", reject)
+    assert client.get("/metrics").status_code == 401
+
+    authenticate(monkeypatch, is_admin=False)
+    assert client.get("/metrics").status_code == 403
+
+
+@pytest.mark.metrics
+def test_metrics_endpoint_accepts_the_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(export, "get_authenticated_user", reject)
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "scraper")
+
+    assert client.get("/metrics").status_code == 401
+    assert (
+        client.get("/metrics", headers={"Authorization": "Bearer other"}).status_code
+        == 401
+    )
+    assert (
+        client.get("/metrics", headers={"Authorization": "Bearer scraper"}).status_code
+        == 200
+    )
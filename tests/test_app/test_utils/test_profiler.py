@@ -0,0 +1,159 @@
+import asyncio
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from graphql import GraphQLError
+
+from app.utils import decorators
+from app.utils.profiler import (
+    PROFILE_ID_HEADER,
+    ProfileStore,
+    SamplingProfiler,
+    categorize,
+    frame_name,
+    profile_store,
+    profiled_response,
+    profiling_requested,
+)
+from app.utils.serialization import FastJSONResponse
+
+
+def code_in(path):
+    return compile("pass", path, "exec")
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.profiler
+def test_categorize_uses_innermost_known_frame():
+    resolver = code_in("/venv/site-packages/graphql/execution/execute.py")
+    query = code_in("/venv/site-packages/sqlalchemy/engine/base.py")
+    argon2 = code_in("/venv/site-packages/argon2/_password_hasher.py")
+    own = code_in("/srv/app/gql/queries.py")
+
+    assert categorize([query, resolver]) == "sqlalchemy"
+    assert categorize([own, argon2, resolver]) == "argon2"
+    assert categorize([own, resolver]) == "graphql"
+    assert categorize([own]) == "other"
+
+
+@pytest.mark.profiler
+def test_frame_name_shortens_paths():
+    assert frame_name(code_in("/venv/lib/site-packages/graphql/graphql.py")) == (
+        "graphql/graphql.py:<module>"
+    )
+    assert frame_name(code_in("/srv/app/gql/queries.py")) == (
+        "app/gql/queries.py:<module>"
+    )
+
+
+@pytest.mark.profiler
+def test_sampling_profiler_collects_folded_stacks():
+    with SamplingProfiler(interval_ms=1) as profiler:
+        busy(0.1)
+
+    summary = profiler.summary()
+    assert summary["samples"] > 0
+    assert summary["duration_ms"] >= 100
+    assert (
+        sum(c["samples"] for c in summary["breakdown"].values()) == summary["samples"]
+    )
+
+    line = profiler.folded().splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert stack.endswith("test_profiler.py:busy")
+    assert int(count) > 0
+
+
+@pytest.mark.profiler
+def test_sampling_profiler_excludes_interleaved_work():
+    def wait(seconds):
+        time.sleep(seconds)
+
+    async def other_request():
+        for _ in range(10):
+            wait(0.005)
+            await asyncio.sleep(0)
+
+    async def profiled_request():
+        with SamplingProfiler(interval_ms=1, frame=sys._getframe()) as profiler:
+            for _ in range(10):
+                wait(0.005)
+                await asyncio.sleep(0)
+        return profiler
+
+    async def scenario():
+        profiler, _ = await asyncio.gather(profiled_request(), other_request())
+        return profiler
+
+    profiler = asyncio.run(scenario())
+    summary = profiler.summary()
+
+    assert summary["samples"] > 0
+    assert summary["excluded_samples"] > 0
+    assert "other_request" not in profiler.folded()
+    assert all("profiled_request" in line for line in profiler.folded().splitlines())
+    assert sum(c["estimated_ms"] for c in summary["breakdown"].values()) < (
+        summary["duration_ms"]
+    )
+
+
+@pytest.mark.profiler
+def test_profile_store_keeps_latest_profiles():
+    store = ProfileStore(max_entries=2)
+    first = store.add("a 1\n")
+    second = store.add("b 1\n")
+    third = store.add("c 1\n")
+
+    assert store.get(first) is None
+    assert store.get(second) == "b 1\n"
+    assert store.get(third) == "c 1\n"
+
+
+@pytest.mark.profiler
+@pytest.mark.parametrize(
+    "header, is_admin, expected",
+    [("1", True, True), ("1", False, False), (None, True, False)],
+)
+def test_profiling_requested_only_by_admins(monkeypatch, header, is_admin, expected):
+    monkeypatch.setattr(
+        decorators,
+        "get_authenticated_user",
+        lambda context: (SimpleNamespace(is_admin=is_admin), "token"),
+    )
+    headers = {"X-Profile": header} if header else {}
+
+    assert profiling_requested(SimpleNamespace(headers=headers), {}) is expected
+
+
+@pytest.mark.profiler
+def test_profiling_requested_ignores_unauthenticated(monkeypatch):
+    def fail(context):
+        raise GraphQLError("Missing authentication token")
+
+    monkeypatch.setattr(decorators, "get_authenticated_user", fail)
+
+    assert not profiling_requested(SimpleNamespace(headers={"X-Profile": "1"}), {})
+
+
+@pytest.mark.profiler
+def test_profiled_response_attaches_profile():
+    with SamplingProfiler(interval_ms=1) as profiler:
+        busy(0.02)
+
+    response = profiled_response(FastJSONResponse({"data": {"ok": True}}), profiler)
+    body = json.loads(response.body)
+    profile = body["extensions"]["profile"]
+
+    assert body["data"] == {"ok": True}
+    assert response.headers[PROFILE_ID_HEADER] == profile["id"]
+    assert profile["download"] == f"/profiles/{profile['id']}"
+    assert profile_store.get(profile["id"]) == profiler.folded()
+    assert int(response.headers["content-length"]) == len(response.body)
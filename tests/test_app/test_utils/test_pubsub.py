@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.utils.pubsub import Broker, InProcessBroker, load_broker, note_channel
+
+
+@pytest.mark.pubsub
+def test_published_message_is_delivered_to_channel_subscribers():
+    async def scenario():
+        broker = InProcessBroker()
+        subscription = broker.subscribe(note_channel(1))
+        other = broker.subscribe(note_channel(2))
+
+        broker.publish(note_channel(1), "message")
+
+        assert await subscription.__anext__() == "message"
+        assert other._queue.empty()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.pubsub
+def test_slow_subscriber_is_dropped_after_draining_its_queue():
+    async def scenario():
+        broker = InProcessBroker(max_queue_size=2)
+        subscription = broker.subscribe(note_channel(1))
+
+        for message in range(3):
+            broker.publish(note_channel(1), message)
+
+        assert subscription.dropped
+        assert [message async for message in subscription] == [0, 1]
+        assert broker.stats()["dropped"] == 1
+        assert broker.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.pubsub
+def test_close_ends_iteration_and_unsubscribes():
+    async def scenario():
+        broker = InProcessBroker()
+        subscription = broker.subscribe(note_channel(1))
+        consumer = asyncio.create_task(subscription.__anext__())
+        await asyncio.sleep(0)
+
+        subscription.close()
+
+        with pytest.raises(StopAsyncIteration):
+            await consumer
+        assert broker.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.pubsub
+def test_load_broker_instantiates_configured_class():
+    assert isinstance(load_broker("app.utils.pubsub:InProcessBroker"), InProcessBroker)
+
+
+@pytest.mark.pubsub
+def test_brokers_have_to_implement_the_interface():
+    class PublishOnlyBroker(Broker):
+        def publish(self, channel, message):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnlyBroker()
@@ -0,0 +1,115 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from graphene import Schema
+from graphql import graphql_sync
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.gql.mutations import Mutation
+from app.gql.queries import Query
+from app.utils import metrics
+from app.utils.jwt import generate_jwt
+from app.utils.metrics import OperationStats, record_operation
+from app.utils.query_budget import QueryBudgetExceeded, assert_query_budget
+
+schema = Schema(query=Query, mutation=Mutation)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    metrics.install_sql_metrics()
+
+    with database.Session() as session:
+        for index in range(6):
+            user = User(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password_hash="x",
+                is_admin=index == 0,
+            )
+            user.notes = [Note(title=f"note {index}.{i}") for i in range(2)]
+            session.add(user)
+        session.commit()
+
+    return engine
+
+
+def execute(operation_name, query):
+    token = generate_jwt("user0@example.com")
+    request = SimpleNamespace(headers={"Authorization": f"Bearer {token}"}, scope={})
+
+    with record_operation(operation_name):
+        result = graphql_sync(
+            schema.graphql_schema, query, context_value={"request": request}
+        )
+
+    assert result.errors is None
+    return result.data
+
+
+@pytest.mark.query_budget
+def test_repeated_statements_fold_in_lists():
+    stats = OperationStats("getNotes")
+    stats.statements = {
+        "SELECT * FROM notes WHERE id IN (?, ?)": 3,
+        "SELECT * FROM notes WHERE id IN (?)": 2,
+        "SELECT * FROM users": 1,
+    }
+
+    assert stats.repeated_statements(5) == [
+        ("SELECT * FROM notes WHERE id IN (...)", 5)
+    ]
+
+
+@pytest.mark.query_budget
+def test_record_operation_logs_suspected_n_plus_one(engine, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SQL_N_PLUS_ONE_THRESHOLD", 3)
+
+    with caplog.at_level(logging.WARNING, logger=metrics.__name__):
+        with record_operation("getNotes"), engine.connect() as connection:
+            for note_id in range(3):
+                connection.execute(
+                    text("SELECT title FROM notes WHERE id = :id"), {"id": note_id}
+                )
+            connection.execute(text("SELECT count(*) FROM users"))
+
+    assert len(caplog.records) == 1
+    assert "operation getNotes: statement executed 3 times" in caplog.text
+    assert "SELECT title FROM notes WHERE id = ?" in caplog.text
+
+
+@pytest.mark.query_budget
+def test_projected_queries_stay_within_budget(engine, query_budget):
+    query_budget.expect("notes", 2)
+    query_budget.expect("users", 3)
+
+    execute("notes", "query notes { getAllNotes { id title owner { email } } }")
+    execute("users", "query users { getUsers { id notes { id title } } }")
+
+
+@pytest.mark.query_budget
+def test_assert_query_budget_reports_n_plus_one(engine):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with assert_query_budget("deep", 3):
+            execute("deep", "query deep { getAllNotes { id owner { notes { id } } } }")
+
+    message = str(error.value)
+    assert "Operation deep executed 8 SQL statements, its budget is 3" in message
+    assert "6 x SELECT notes.id" in message
+
+
+@pytest.mark.query_budget
+def test_assert_query_budget_requires_the_operation():
+    with pytest.raises(QueryBudgetExceeded, match="Operation notes was not executed"):
+        with assert_query_budget("notes", 2) as budget:
+            with budget.operation("other"):
+                pass
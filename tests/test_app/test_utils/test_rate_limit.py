@@ -0,0 +1,131 @@
+from types import SimpleNamespace
+
+import pytest
+from graphql import GraphQLError
+
+from app.utils import rate_limit
+from app.utils.rate_limit import (
+    InMemoryRateLimitBackend,
+    Rate,
+    RateLimitBackend,
+    RateLimiter,
+    client_ip,
+    load_backend,
+    parse_rate,
+)
+
+
+def context(ip="10.0.0.1"):
+    return {"request": SimpleNamespace(scope={"client": (ip, 5000)})}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_040.0)
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now.value)
+    return now
+
+
+@pytest.mark.rate_limit
+def test_parse_rate():
+    assert parse_rate("10/60") == Rate(10, 60.0)
+    assert parse_rate("5") == Rate(5, 1.0)
+    assert parse_rate("0") is None
+    assert parse_rate("") is None
+
+    with pytest.raises(ValueError):
+        parse_rate("0/60")
+
+
+@pytest.mark.rate_limit
+def test_backend_slides_counts_between_windows():
+    backend = InMemoryRateLimitBackend()
+
+    assert backend.increment("key", 60, 0) == (0, 1)
+    assert backend.increment("key", 60, 30) == (0, 2)
+    assert backend.increment("key", 60, 61) == (2, 1)
+    assert backend.increment("key", 60, 200) == (0, 1)
+
+
+@pytest.mark.rate_limit
+def test_backend_expires_and_evicts_keys():
+    backend = InMemoryRateLimitBackend(max_keys=2)
+
+    backend.increment("a", 60, 0)
+    backend.increment("b", 60, 0)
+    backend.increment("c", 60, 0)
+    assert backend.stats() == {"keys": 2, "evicted": 1}
+    assert backend.increment("a", 60, 1) == (0, 1)
+
+    backend.increment("d", 60, 180)
+    assert backend.stats()["keys"] == 1
+
+
+@pytest.mark.rate_limit
+def test_load_backend():
+    backend = load_backend("app.utils.rate_limit:InMemoryRateLimitBackend")
+
+    assert isinstance(backend, InMemoryRateLimitBackend)
+
+
+@pytest.mark.rate_limit
+def test_backends_have_to_implement_the_interface():
+    class CountingBackend(RateLimitBackend):
+        def increment(self, key, window, now):
+            return 0, 1
+
+    with pytest.raises(TypeError):
+        CountingBackend()
+
+
+@pytest.mark.rate_limit
+def test_client_ip():
+    assert client_ip(context("192.0.2.1")) == "192.0.2.1"
+    assert client_ip({"request": SimpleNamespace(scope={})}) is None
+    assert client_ip(None) is None
+
+
+@pytest.mark.rate_limit
+def test_limiter_rejects_attempts_over_the_email_rate(clock):
+    limiter = RateLimiter(
+        "login", Rate(3, 60), None, backend=InMemoryRateLimitBackend(), enabled=True
+    )
+
+    for _ in range(3):
+        limiter.check(context(), "User@Example.com")
+
+    with pytest.raises(GraphQLError) as error:
+        limiter.check(context(), "user@example.com ")
+
+    assert error.value.extensions == {"code": "RATE_LIMITED", "retryAfter": 40}
+    limiter.check(context(), "other@example.com")
+
+    # A sixth of the previous window still counts: 4 / 6 + 1 attempts
+    clock.value += 70
+    limiter.check(context(), "user@example.com")
+
+
+@pytest.mark.rate_limit
+def test_limiter_rejects_attempts_over_the_ip_rate(clock):
+    limiter = RateLimiter(
+        "register", None, Rate(2, 60), backend=InMemoryRateLimitBackend(), enabled=True
+    )
+
+    limiter.check(context(), "a@example.com")
+    limiter.check(context(), "b@example.com")
+
+    with pytest.raises(GraphQLError):
+        limiter.check(context(), "c@example.com")
+
+    limiter.check(context("10.0.0.2"), "c@example.com")
+    limiter.check({}, "d@example.com")
+
+
+@pytest.mark.rate_limit
+def test_disabled_limiter_allows_everything():
+    limiter = RateLimiter(
+        "login", Rate(1, 60), Rate(1, 60), InMemoryRateLimitBackend(), enabled=False
+    )
+
+    for _ in range(3):
+        limiter.check(context(), "user@example.com")
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.utils import serialization
+
+
+@pytest.mark.serialization
+def test_dumps_serializes_datetimes_as_iso_strings():
+    created_at = datetime(2023, 11, 24, 12, 30, 15, 123456)
+    body = serialization.dumps({"createdAt": created_at, "title": "zażółć"})
+
+    assert json.loads(body) == {
+        "createdAt": created_at.isoformat(),
+        "title": "zażółć",
+    }
+
+
+@pytest.mark.serialization
+def test_dumps_without_orjson_falls_back_to_stdlib(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    created_at = datetime(2023, 11, 24, 12, 30)
+
+    assert serialization.dumps({"data": [1, created_at]}) == (
+        b'{"data":[1,"2023-11-24T12:30:00"]}'
+    )
+
+
+@pytest.mark.serialization
+def test_fast_json_response_renders_compact_json():
+    response = serialization.FastJSONResponse({"data": {"id": 1}})
+
+    assert json.loads(response.body) == {"data": {"id": 1}}
+    assert response.headers["content-type"] == "application/json"
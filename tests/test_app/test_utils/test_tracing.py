@@ -0,0 +1,214 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from graphene import Schema
+from graphql import graphql_sync
+from sqlalchemy import create_engine, text
+
+from app.gql.queries import Query
+from app.utils import tracing
+from app.utils.jwt import generate_jwt
+from app.utils.tracing import (
+    SPAN_KIND_CLIENT,
+    SPAN_KIND_SERVER,
+    STATUS_ERROR,
+    BatchSpanProcessor,
+    JSONFileExporter,
+    Span,
+    SpanExporter,
+    format_traceparent,
+    install_sql_tracing,
+    parse_traceparent,
+    trace_operation,
+    trace_resolvers,
+    traced,
+    tracer,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class ListExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(exporter, interval=60)
+    monkeypatch.setattr(tracer, "processor", processor)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+
+    yield exporter
+
+    processor.shutdown()
+
+
+def finished(exporter):
+    tracer.processor.flush()
+    return {span.name: span for span in exporter.spans}
+
+
+def context(traceparent=None):
+    headers = {"traceparent": traceparent} if traceparent else {}
+    return {"request": SimpleNamespace(headers=headers)}
+
+
+@pytest.mark.tracing
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (
+        TRACE_ID,
+        PARENT_ID,
+        True,
+    )
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")[2] is False
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("00-abc-def-01") is None
+    assert parse_traceparent(None) is None
+
+
+@pytest.mark.tracing
+def test_exporters_have_to_implement_export():
+    class SilentExporter(SpanExporter):
+        def shutdown(self):
+            pass
+
+    with pytest.raises(TypeError):
+        SilentExporter()
+
+
+@pytest.mark.tracing
+def test_operation_continues_incoming_trace(exporter):
+    with trace_operation("getNotes", context(f"00-{TRACE_ID}-{PARENT_ID}-01")) as root:
+        assert format_traceparent(root) == f"00-{TRACE_ID}-{root.span_id}-01"
+
+    span = finished(exporter)["graphql.operation getNotes"]
+    assert span.trace_id == TRACE_ID
+    assert span.parent_id == PARENT_ID
+    assert span.kind == SPAN_KIND_SERVER
+    assert span.end_ns >= span.start_ns
+
+
+@pytest.mark.tracing
+def test_unsampled_traces_record_no_spans(exporter):
+    hashed = traced("argon2.hash")(lambda: "hash")
+
+    with trace_operation("a", context(f"00-{TRACE_ID}-{PARENT_ID}-00")) as root:
+        assert root is None
+        assert hashed() == "hash"
+
+    tracer.sample_rate = 0.0
+    with trace_operation("b", context()) as root:
+        assert root is None
+
+    assert finished(exporter) == {}
+
+
+@pytest.mark.tracing
+def test_traced_functions_are_children_of_the_current_span(exporter):
+    @traced("hibp.range", SPAN_KIND_CLIENT)
+    def failing():
+        raise RuntimeError("unreachable")
+
+    assert traced("outside")(lambda: 1)() == 1
+
+    with trace_operation(None, context()) as root:
+        with pytest.raises(RuntimeError):
+            failing()
+
+    spans = finished(exporter)
+    assert set(spans) == {"graphql.operation anonymous", "hibp.range"}
+    assert spans["hibp.range"].parent_id == root.span_id
+    assert spans["hibp.range"].kind == SPAN_KIND_CLIENT
+    assert spans["hibp.range"].status == STATUS_ERROR
+    assert spans["hibp.range"].attributes["exception.type"] == "RuntimeError"
+
+
+@pytest.mark.tracing
+def test_sql_statements_are_traced(exporter):
+    install_sql_tracing()
+    engine = create_engine("sqlite://")
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with trace_operation("query", context()) as root:
+            connection.execute(text("SELECT 2"))
+            with pytest.raises(Exception):
+                connection.execute(text("SELECT * FROM missing"))
+
+    tracer.processor.flush()
+    spans = [span for span in exporter.spans if span.name == "SELECT"]
+    assert [span.attributes["db.statement"] for span in spans] == [
+        "SELECT 2",
+        "SELECT * FROM missing",
+    ]
+    assert all(span.parent_id == root.span_id for span in spans)
+    assert spans[0].attributes["db.system"] == "sqlite"
+    assert spans[1].status == STATUS_ERROR
+
+
+@pytest.mark.tracing
+def test_trace_resolvers(exporter):
+    schema = Schema(query=Query)
+    trace_resolvers(schema.graphql_schema)
+    trace_resolvers(schema.graphql_schema)
+    token = generate_jwt("nobody@example.com")
+    request = SimpleNamespace(headers={"Authorization": f"Bearer {token}"})
+
+    with trace_operation("getUsers", {"request": request}) as root:
+        result = graphql_sync(
+            schema.graphql_schema,
+            "query getUsers { getUsers { id } }",
+            context_value={"request": request},
+        )
+        tracing.record_span_errors(root, result.errors)
+
+    spans = finished(exporter)
+    resolver = spans["graphql.resolve Query.get_users"]
+    assert resolver.parent_id == root.span_id
+    assert resolver.attributes["graphql.field.name"] == "getUsers"
+    assert resolver.status == STATUS_ERROR
+    assert spans["graphql.operation getUsers"].status == STATUS_ERROR
+    assert {name for name in spans if name.startswith("graphql.")} == {
+        "graphql.operation getUsers",
+        "graphql.resolve Query.get_users",
+    }
+
+
+@pytest.mark.tracing
+def test_batch_processor_drops_spans_when_full():
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(exporter, batch_size=2, queue_size=3, interval=60)
+    processor._start = lambda: None
+
+    for index in range(5):
+        processor.on_end(Span(str(index), TRACE_ID))
+    processor.flush()
+
+    assert [span.name for span in exporter.spans] == ["0", "1", "2"]
+    assert processor.dropped == 2
+
+
+@pytest.mark.tracing
+def test_json_file_exporter_writes_otlp_requests(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    span = Span("argon2.verify", TRACE_ID, PARENT_ID, attributes={"attempt": 1})
+    span.end_ns = span.start_ns + 1
+
+    JSONFileExporter(str(path)).export([span])
+    JSONFileExporter(str(path)).export([span])
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    resource = json.loads(lines[0])["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["key"] == "service.name"
+    exported = resource["scopeSpans"][0]["spans"][0]
+    assert exported["traceId"] == TRACE_ID
+    assert exported["parentSpanId"] == PARENT_ID
+    assert exported["attributes"] == [{"key": "attempt", "value": {"intValue": "1"}}]
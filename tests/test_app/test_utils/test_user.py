@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.db import database
+from app.db.models import Base, Note, User
+from app.utils.jwt import generate_jwt
+from app.utils.user import get_authenticated_user
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'todo.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+
+    with database.Session() as session:
+        user = User(username="user", email="user@example.com", password_hash="x")
+        user.notes = [Note(title="note")]
+        session.add(user)
+        session.commit()
+
+    yield engine
+    engine.dispose()
+
+
+def context(email):
+    headers = {"Authorization": f"Bearer {generate_jwt(email)}"}
+    return {"request": SimpleNamespace(headers=headers, scope={})}
+
+
+@pytest.mark.user_utils
+def test_authentication_returns_the_connection_to_the_pool(engine):
+    user, _ = get_authenticated_user(context("user@example.com"))
+
+    assert engine.pool.checkedout() == 0
+    assert user.email == "user@example.com"
+    assert [note.title for note in user.notes] == ["note"]